@@ -0,0 +1,410 @@
+"""Regelwerk des Stock-Checks: Welche Produkte loesen eine Warnung aus?
+
+Bis 1.7.x wertete ``run_check`` jede Position einzeln aus: je Position ein
+``strptime`` auf das MHD und ein ``datetime.now()``, dazu Kategorie- und
+Lagerort-Filter als lineare Suche in Listen. Hier wird alles, was sich
+innerhalb eines Laufs nicht aendert, einmal vorab uebersetzt:
+
+- Filter werden zu ``frozenset``, Overrides zu einem Dict mit normalisierter
+  Produkt-ID
+- "heute" ist eine Tageszahl (``date.toordinal``), jede individuelle
+  Warnschwelle eine feste Grenz-Tageszahl
+- jedes MHD wird einmal je Lauf in eine Tageszahl uebersetzt und
+  zwischengespeichert -- eine Ablaufwelle hat viele gleiche Daten
+- der Bestand liegt nach MHD sortiert vor (``DueIndex``); jedes Produkt
+  wird mit seiner eigenen Warnschwelle zugeschnitten
+
+Danach ist die Auswertung einer Position nur noch Dict-Zugriff und
+Ganzzahlvergleich. Das Modul haengt weder an Flask noch an der Datenbank
+und laesst sich allein messen::
+
+    python alert_rules.py 50000
+"""
+
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time as time_of_day
+from heapq import heapify, heappop
+
+import sprache
+
+
+# Grocys MHD fuer "laeuft nie ab"
+_NIE = date(2999, 12, 31).toordinal()
+
+
+def _pid(wert):
+    """Produkt-IDs einheitlich als int -- Grocy liefert int, Overrides auch,
+    der Tracker speichert Text. Nicht-numerische IDs bleiben, wie sie sind."""
+    if isinstance(wert, int):
+        return wert
+    try:
+        return int(wert)
+    except (TypeError, ValueError):
+        return wert
+
+
+def _id_menge(roh):
+    """'1, 4,-2' -> frozenset({1, 4, -2}); leer = kein Filter."""
+    return frozenset(int(x) for x in (roh or '').split(',')
+                     if x.strip().lstrip('-').isdigit())
+
+
+class DueIndex:
+    """Bestandseintraege, sortiert nach Faelligkeit (Tageszahl des MHD).
+
+    Einmal aufgebaut, liefert ``bisect`` die Grenzen eines Zeitfensters in
+    O(log n): Alles vor heute ist ueberfaellig, alles bis zur weitesten
+    Warnschwelle kommt als "bald faellig" in Frage. Eintraege dahinter --
+    meist die grosse Mehrheit -- werden gar nicht erst angesehen.
+    """
+
+    def __init__(self, entries, ordinal):
+        paare = []
+        for entry in entries:
+            tag = ordinal(entry.get('best_before_date') or '')
+            if tag is not None:
+                paare.append((tag, entry))
+        paare.sort(key=lambda p: p[0])
+        self.days = [tag for tag, _ in paare]
+        self.entries = [entry for _, entry in paare]
+
+    def before(self, tag):
+        """Eintraege mit MHD vor ``tag``."""
+        return self.entries[:bisect_left(self.days, tag)]
+
+    def between(self, von, bis):
+        """(Tageszahl, Eintrag) mit ``von`` <= MHD <= ``bis``."""
+        links, rechts = bisect_left(self.days, von), bisect_right(self.days, bis)
+        return zip(self.days[links:rechts], self.entries[links:rechts])
+
+
+class AlertRules:
+    """Die fuer einen Lauf uebersetzten Regeln.
+
+    Entsteht mit ``AlertRules.compile(settings, overrides)``; ``evaluate``
+    liefert die Alerts im Format von ``run_check``, ``filter_repeats``
+    wendet das Wiederholungslimit an.
+    """
+
+    def __init__(self, *, lang, default_days, notify_expiring, notify_expired,
+                 notify_missing, allowed_groups, allowed_locations, overrides,
+                 repeat_limit, today):
+        self.lang = lang
+        self.default_days = default_days
+        self.notify_expiring = notify_expiring
+        self.notify_expired = notify_expired
+        self.notify_missing = notify_missing
+        self.allowed_groups = allowed_groups
+        self.allowed_locations = allowed_locations
+        self.repeat_limit = repeat_limit
+        self.today = today
+
+        # pid -> (Warnschwelle in Tagen, Grenz-Tageszahl oder None, Limit oder None)
+        self.overrides = {}
+        for pid, o in overrides.items():
+            days = o['custom_days_before_expiry']
+            grenze = today + days if days > 0 else None
+            self.overrides[pid] = (days, grenze, o.get('custom_repeat_limit'))
+
+        t = lambda key: sprache.t(key, lang=lang)
+        self._labels = {key: t(key) for key in (
+            'product_nr', 'unknown', 'use_by_date', 'expiry_date',
+            'use_by_since', 'expired_since', 'missing_amount')}
+        self._ordinals = {}
+
+    @classmethod
+    def compile(cls, settings, overrides, now=None):
+        """Uebersetzt Einstellungen und Produkt-Overrides fuer einen Lauf.
+
+        Args:
+            settings: Dict aus ``get_all_settings()``
+            overrides: Liste aus ``get_product_overrides()``
+            now: Zeitpunkt des Laufs (Tests); sonst jetzt
+        """
+        now = now or datetime.now()
+        return cls(
+            lang=settings.get('language', 'de'),
+            default_days=int(settings.get('default_days_before_expiry', 5)),
+            notify_expiring=settings.get('notify_expiring', '1') == '1',
+            notify_expired=settings.get('notify_expired', '1') == '1',
+            notify_missing=settings.get('notify_missing', '1') == '1',
+            allowed_groups=_id_menge(settings.get('notify_product_groups', '')),
+            allowed_locations=_id_menge(settings.get('notify_locations', '')),
+            overrides={_pid(o['product_id']): o for o in overrides},
+            repeat_limit=int(settings.get('notification_repeat_limit', '1')),
+            today=now.date().toordinal(),
+        )
+
+    # ── Bausteine ──────────────────────────────────────────────────────
+
+    def _ordinal(self, datum):
+        """MHD als Tageszahl, je Lauf einmal geparst; None bei Unlesbarem."""
+        try:
+            return self._ordinals[datum]
+        except KeyError:
+            try:
+                wert = date.fromisoformat(datum[:10]).toordinal()
+            except (TypeError, ValueError):
+                wert = None
+            self._ordinals[datum] = wert
+            return wert
+
+    def _is_filtered(self, item, override):
+        """Kategorie-/Lagerort-Filter. Ein eigenes Wiederholungslimit geht vor."""
+        if override is not None and override[2] is not None:
+            return False
+        product = item.get('product', item)
+        if self.allowed_groups:
+            pg = product.get('product_group_id')
+            if pg is not None and int(pg) not in self.allowed_groups:
+                return True
+        if self.allowed_locations:
+            loc = product.get('location_id')
+            if loc is not None and int(loc) not in self.allowed_locations:
+                return True
+        return False
+
+    def horizon(self, product_id):
+        """Warnschwelle eines Produkts in Tagen: eigene vor globaler."""
+        override = self.overrides.get(_pid(product_id))
+        if override is not None and override[0] > 0:
+            return override[0]
+        return self.default_days
+
+    def crossings(self, stock):
+        """Kuenftige Schwellen-Uebertritte des Bestands als Heap.
+
+        Ein Eintrag wechselt zweimal den Zustand: am Tag ``MHD - Schwelle``
+        wird er "bald faellig", am Tag nach dem MHD "ueberfaellig". Beides
+        steht schon im Bestand fest -- bis jemand in Grocy bucht. Der Heap
+        haelt (Tageszahl, Produkt-ID) mit dem naechsten Uebertritt oben.
+        Gefilterte und abgeschaltete Produkte loesen nie etwas aus und
+        fehlen deshalb.
+        """
+        heap = []
+        for entry in stock:
+            tag = self._ordinal(entry.get('best_before_date') or '')
+            if tag is None or tag >= _NIE:
+                continue
+            product_id = entry.get('product_id') or entry.get('product', {}).get('id')
+            override = self.overrides.get(_pid(product_id))
+            if override is not None and override[0] == 0:
+                continue
+            if self._is_filtered(entry, override):
+                continue
+            # IDs als Text, damit gleiche Tage im Heap vergleichbar bleiben
+            if self.notify_expiring:
+                heap.append((tag - self.horizon(product_id), str(product_id)))
+            if self.notify_expired:
+                heap.append((tag + 1, str(product_id)))
+        heapify(heap)
+        return heap
+
+    def next_crossing(self, stock, at=time_of_day(0, 0)):
+        """Zeitpunkt des naechsten Uebertritts nach heute -- oder None.
+
+        Args:
+            at: Uhrzeit, zu der an dem Tag geweckt wird
+        """
+        heap = self.crossings(stock)
+        while heap:
+            tag, _ = heappop(heap)
+            if tag > self.today:
+                return datetime.combine(date.fromordinal(tag), at)
+        return None
+
+    # ── Auswertung ─────────────────────────────────────────────────────
+
+    def volatile_from_stock(self, stock, missing_products=()):
+        """Baut aus ``/stock`` dasselbe Format wie ``/stock/volatile``.
+
+        ``/stock/volatile`` kennt nur **eine** Warnschwelle fuer alle
+        Produkte. Ein Produkt, das 30 Tage vorher melden soll, tauchte bei
+        einer globalen Schwelle von 5 Tagen nie in ``due_products`` auf --
+        das Override konnte das Fenster nur verkleinern, nie vergroessern.
+        Hier wird der ganze Bestand einmal geholt, nach MHD sortiert und je
+        Produkt mit dessen eigener Schwelle geschnitten. Fehlmengen kennt
+        ``/stock`` nicht; sie kommen weiter aus ``/stock/volatile``.
+        """
+        index = DueIndex(stock, self._ordinal)
+        overdue, expired = [], []
+        for entry in index.before(self.today):
+            due_type = entry.get('product', {}).get('due_type', 1)
+            (expired if due_type == 2 else overdue).append(entry)
+        weitester = max([self.default_days] + [o[0] for o in self.overrides.values()])
+        due = [entry for tag, entry in index.between(self.today, self.today + weitester)
+               if tag <= self.today + self.horizon(
+                   entry.get('product_id') or entry.get('product', {}).get('id'))]
+        return {'due_products': due, 'overdue_products': overdue,
+                'expired_products': expired, 'missing_products': list(missing_products)}
+
+    def evaluate(self, volatile):
+        """Alle Alerts eines Laufs aus der Antwort von ``/stock/volatile``."""
+        alerts = []
+        if self.notify_expiring:
+            self._expiring(volatile.get('due_products', []), alerts)
+        if self.notify_expired:
+            self._expired(volatile.get('overdue_products', []) +
+                          volatile.get('expired_products', []), alerts)
+        if self.notify_missing:
+            self._missing(volatile.get('missing_products', []), alerts)
+        return alerts
+
+    def _expiring(self, items, alerts):
+        labels = self._labels
+        for item in items:
+            product = item.get('product', {})
+            product_id = item.get('product_id') or product.get('id')
+            override = self.overrides.get(_pid(product_id))
+            if self._is_filtered(item, override):
+                continue
+            best_before = item.get('best_before_date', '')
+            if override is not None:
+                days, grenze, _ = override
+                if days == 0:
+                    continue  # Benachrichtigungen fuer dieses Produkt deaktiviert
+                if grenze is not None and best_before:
+                    # Positiver Wert: individuelle Warnschwelle pruefen
+                    ordinal = self._ordinal(best_before)
+                    if ordinal is not None and ordinal > grenze:
+                        continue
+                # -1: globalen Standard verwenden (kein zusaetzlicher Check)
+            label = labels['use_by_date'] if product.get('due_type', 1) == 2 else labels['expiry_date']
+            alerts.append({
+                'type': 'expiring',
+                'name': product.get('name', f"{labels['product_nr']} #{product_id}"),
+                'detail': f"{label}: {best_before}",
+                'product_id': str(product_id or ''),
+                'best_before': best_before,
+            })
+
+    def _expired(self, items, alerts):
+        labels = self._labels
+        for item in items:
+            product = item.get('product', {})
+            product_id = item.get('product_id') or product.get('id')
+            override = self.overrides.get(_pid(product_id))
+            if self._is_filtered(item, override):
+                continue
+            if override is not None and override[0] == 0:
+                continue
+            best_before = item.get('best_before_date', '')
+            label = labels['use_by_since'] if product.get('due_type', 1) == 2 else labels['expired_since']
+            alerts.append({
+                'type': 'expired',
+                'name': product.get('name', labels['unknown']),
+                'detail': f"{label}: {best_before}",
+                'product_id': str(product_id or ''),
+                'best_before': best_before,
+            })
+
+    def _missing(self, items, alerts):
+        labels = self._labels
+        for item in items:
+            product_id = item.get('id') or item.get('product_id') or item.get('product', {}).get('id')
+            override = self.overrides.get(_pid(product_id))
+            if self._is_filtered(item, override):
+                continue
+            if override is not None and override[0] == 0:
+                continue
+            alerts.append({
+                'type': 'missing',
+                'name': item.get('product', {}).get('name', item.get('name', labels['unknown'])),
+                'detail': f"{labels['missing_amount']}: {item.get('amount_missing', '?')}",
+                'product_id': str(product_id or ''),
+                'best_before': '',
+            })
+
+    def effective_repeat_limit(self, product_id):
+        """Wiederholungslimit eines Produkts: eigenes vor globalem (0 = unbegrenzt)."""
+        override = self.overrides.get(_pid(product_id))
+        if override is not None and override[2] is not None:
+            return override[2]
+        return self.repeat_limit
+
+    def filter_repeats(self, alerts, tracker):
+        """Entfernt Alerts, deren Wiederholungslimit fuer dieses MHD erreicht ist.
+
+        ``tracker`` ist das Dict aus ``get_tracker_entries()``.
+        """
+        behalten = []
+        for alert in alerts:
+            limit = self.effective_repeat_limit(alert['product_id'])
+            if limit > 0:
+                entry = tracker.get((alert['product_id'], alert['type']))
+                if (entry and entry['best_before_date'] == alert['best_before']
+                        and entry['sent_count'] >= limit):
+                    continue
+            behalten.append(alert)
+        return behalten
+
+
+# ── Inkrementeller Check ───────────────────────────────────────────────
+
+def alert_key(alert):
+    """Schluessel eines Alerts im Snapshot: (product_id, type, best_before)."""
+    return (alert['product_id'], alert['type'], alert['best_before'] or '')
+
+
+def diff_alerts(snapshot, alerts):
+    """Vergleicht die Alerts eines Checks mit dem letzten Stand.
+
+    Args:
+        snapshot: Dict aus ``database.get_alert_snapshot()``
+        alerts: Ergebnis von ``AlertRules.evaluate``
+
+    Returns:
+        dict mit 'new' und 'changed' (Alerts; geaendert heisst gleicher
+        Schluessel, anderer Text -- etwa eine neue Fehlmenge) und 'resolved'
+        (Schluessel, die nicht mehr im Alert-Zustand sind).
+    """
+    new, changed, gesehen = [], [], set()
+    for alert in alerts:
+        key = alert_key(alert)
+        if key in gesehen:
+            continue
+        gesehen.add(key)
+        alt = snapshot.get(key)
+        if alt is None:
+            new.append(alert)
+        elif alt['detail'] != alert['detail'] or alt['name'] != alert['name']:
+            changed.append(alert)
+    resolved = [key for key in snapshot if key not in gesehen]
+    return {'new': new, 'changed': changed, 'resolved': resolved}
+
+
+# ── Messung ────────────────────────────────────────────────────────────
+
+def synthetic_stock(anzahl, heute=None):
+    """Kuenstliche Antwort von ``/stock`` mit ``anzahl`` Eintraegen.
+
+    Die MHDs streuen von zehn Tagen ueberfaellig bis ein Jahr in die Zukunft.
+    """
+    heute = (heute or date.today()).toordinal()
+    return [{
+        'product_id': i,
+        'amount': 1,
+        'best_before_date': date.fromordinal(heute - 10 + i % 375).isoformat(),
+        'product': {'id': i, 'name': f'Produkt {i}', 'due_type': 1 + i % 2,
+                    'product_group_id': i % 12, 'location_id': i % 5},
+    } for i in range(anzahl)]
+
+
+def benchmark(anzahl=50000):
+    """Misst Index, Zuschnitt und Auswertung fuer ``anzahl`` Eintraege; Sekunden."""
+    stock = synthetic_stock(anzahl)
+    overrides = [{'product_id': i, 'custom_days_before_expiry': 30,
+                  'custom_repeat_limit': None} for i in range(0, anzahl, 7)]
+    settings = {'notify_product_groups': '1,2,3,4,5,6,7,8', 'notify_locations': '0,1,2,3'}
+    start = time.perf_counter()
+    regeln = AlertRules.compile(settings, overrides)
+    alerts = regeln.evaluate(regeln.volatile_from_stock(stock))
+    return time.perf_counter() - start, len(alerts)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    dauer, treffer = benchmark(n)
+    print(f"{n} Positionen, {treffer} Alerts: {dauer * 1000:.1f} ms")
@@ -132,6 +132,8 @@ _WEGE = [
     ('/log',       'api_get_log',   ('GET',)),
     ('/log',       'api_clear_log', ('DELETE',)),
     ('/check-now', 'api_check_now', ('POST',)),
+    ('/jobs',      'api_get_jobs',  ('GET',)),
+    ('/job-runs',  'api_get_job_runs', ('GET',)),
 
     # CalDAV
     ('/caldav/status',    'api_caldav_status',    ('GET',)),
@@ -172,6 +174,12 @@ def kanal_pruefen(channel_id):
     return current_app.view_functions['api_test_channel'](channel_id)
 
 
+@api_v1.route('/jobs/<int:job_id>', methods=['GET'])
+@zugang_pflicht
+def auftrag_stand(job_id):
+    return current_app.view_functions['api_get_job'](job_id)
+
+
 @api_v1.route('/bring/list-items', methods=['PUT'])
 @zugang_pflicht
 def bring_position_aendern():
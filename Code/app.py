@@ -1,29 +1,36 @@
 import json
 import logging
 import os
-from flask import Flask, render_template, request, jsonify
-from apscheduler.schedulers.background import BackgroundScheduler
+from flask import Flask, Response, render_template, request, jsonify
 
 import sprache
 from database import (
     init_db, get_all_settings, save_settings,
-    get_channels, get_channels_decrypted, save_channel, delete_channel,
+    get_channels, get_channel, get_channels_decrypted, save_channel, delete_channel,
     get_product_overrides, save_product_override, delete_product_override,
     get_log, clear_log, get_sync_map, clear_sync_map, add_log_entry,
-    save_receipt, get_receipts, get_receipt, update_receipt_status,
-    delete_receipt as db_delete_receipt, save_receipt_items, update_receipt_item,
-    get_receipt_item, get_product_mappings_dict, get_product_mappings,
+    get_receipts, get_receipt, update_receipt_status,
+    delete_receipt as db_delete_receipt, update_receipt_item,
+    get_receipt_item, get_product_mappings,
     save_product_mapping, delete_product_mapping, receipt_filepath_exists,
     get_bring_sync_map, clear_bring_sync_map, get_bring_overrides_list,
     save_bring_override, delete_bring_override,
+    get_outbox, retry_outbox_entry, get_job, get_jobs, get_job_runs,
 )
 from grocy_client import GrocyClient
-from notifiers import get_notifier
-from scheduler import run_check
-from caldav_sync import CalDAVSync, run_caldav_sync
-from bring_sync import BringSync, run_bring_sync, BringSyncError
+from notifiers import get_channel_notifier
+from caldav_sync import CalDAVSync
+from bring_sync import BringSync, BringSyncError
 from bring_runtime import invalidate_runtime
-from receipt_scanner import process_receipt, scan_receipt_folder
+from jobruns import summarize_runs
+import catalog
+import dashboard
+import events
+import http_cache
+from worker import (
+    get_role, scheduler_leader, apply_schedules, start_scheduler,
+    submit_job, wait_for_job, job_view,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 logger = logging.getLogger(__name__)
@@ -76,18 +83,6 @@ app = Flask(__name__)
 
 init_db()
 
-bg_scheduler = BackgroundScheduler(daemon=True)
-bg_scheduler.start()
-
-
-def schedule_check():
-    bg_scheduler.remove_all_jobs()
-    settings = get_all_settings()
-    hours = int(settings.get('check_interval_hours', 6))
-    if hours > 0:
-        bg_scheduler.add_job(run_check, 'interval', hours=hours, id='grocy_check', replace_existing=True)
-        logger.info(f"Check geplant: alle {hours} Stunden")
-
 
 @app.route('/')
 def index():
@@ -117,10 +112,10 @@ def api_save_settings():
     # damit keine Session mit veralteten Daten offen bleibt
     if any(k in data for k in ('bring_email', 'bring_password')):
         invalidate_runtime()
-    schedule_check()
-    schedule_caldav_sync()
-    schedule_bring_sync()
-    schedule_receipt_watch()
+    # Nur der Leader hat einen laufenden Scheduler; in allen anderen
+    # Prozessen holt ihn worker.watch_schedule_settings() nach
+    if scheduler_leader.is_leader:
+        apply_schedules()
     return jsonify({'ok': True})
 
 
@@ -135,23 +130,19 @@ def api_test_connection():
 
 @app.route('/api/status', methods=['GET'])
 def api_status():
+    """Dashboard aus der vorberechneten Antwort (``dashboard.py``); ``?fresh=1``
+    rechnet mit frischem Grocy-Abruf neu."""
     settings = get_all_settings()
     if not settings.get('grocy_url') or not settings.get('grocy_api_key'):
         return jsonify({'error': sprache.t('msg.grocy_missing')}), 400
     try:
-        client = GrocyClient()
-        days = int(settings.get('default_days_before_expiry', 5))
-        volatile = client.get_volatile_stock(due_soon_days=days)
-        stock = client.get_all_stock()
-        return jsonify({
-            'due_products': volatile.get('due_products', []),
-            'overdue_products': volatile.get('overdue_products', []),
-            'expired_products': volatile.get('expired_products', []),
-            'missing_products': volatile.get('missing_products', []),
-            'total_products': len(stock),
-        })
+        view = dashboard.read('status', fresh=request.args.get('fresh') == '1')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    info = dashboard.snapshot_info(view)
+    if http_cache.conditional(http_cache.etag('status', info), view['refreshed_at']):
+        return http_cache.not_modified()
+    return jsonify(dict(view['data'], snapshot=info))
 
 
 @app.route('/api/channels', methods=['GET'])
@@ -178,14 +169,11 @@ def api_delete_channel(channel_id):
 
 @app.route('/api/channels/<int:channel_id>/test', methods=['POST'])
 def api_test_channel(channel_id):
-    channels = get_channels_decrypted()
-    ch = next((c for c in channels if c['id'] == channel_id), None)
+    ch = get_channel(channel_id)
     if not ch:
         return jsonify({'ok': False, 'message': sprache.t('msg.channel_missing')}), 404
     try:
-        config = json.loads(ch['config_json']) if isinstance(ch['config_json'], str) else ch['config_json']
-        notifier = get_notifier(ch['type'], config)
-        notifier.test()
+        get_channel_notifier(ch).test()
         add_log_entry(None, 'test', ch['name'], sprache.t('log.test_sent'),
                       success=True, key='log.test_sent')
         return jsonify({'ok': True, 'message': sprache.t('msg.test_sent')})
@@ -200,44 +188,35 @@ def api_test_channel(channel_id):
 @app.route('/api/products', methods=['GET'])
 def api_get_products():
     """Liefert ALLE in Grocy definierten Produkte (nicht nur Produkte mit Bestand),
-    ergaenzt um Bestandsdaten und individuelle Override-Einstellungen."""
+    ergaenzt um Bestandsdaten und individuelle Override-Einstellungen.
+
+    Die Liste kommt aus dem Katalog der vorberechneten Antwort (``catalog.py``);
+    ``?fresh=1`` rechnet mit frischem Grocy-Abruf neu. Fuer grosse Bestaende
+    gibt es Suche (``q``, ``match``), Sortierung (``sort``), Seiten
+    (``limit``, ``cursor``) und eine Feldauswahl (``fields``) -- ohne diese
+    Parameter kommt wie bisher die ganze Liste.
+    """
     settings = get_all_settings()
-    overrides = {o['product_id']: o for o in get_product_overrides()}
-    products = []
-    if settings.get('grocy_url') and settings.get('grocy_api_key'):
-        try:
-            client = GrocyClient()
-            # Alle Produkte aus Grocy laden (unabhaengig vom Bestand)
-            all_prods = client.get_all_products()
-            # Bestandsdaten fuer Menge und MHD laden
-            stock_by_id = {}
-            try:
-                for item in client.get_all_stock():
-                    pid = item.get('product_id') or item.get('product', {}).get('id')
-                    if pid is not None:
-                        stock_by_id[pid] = item
-            except Exception:
-                pass
-            # Alphabetisch sortieren
-            all_prods.sort(key=lambda p: (p.get('name') or '').lower())
-            for prod in all_prods:
-                pid = prod.get('id')
-                name = prod.get('name', f'Produkt #{pid}')
-                stock_item = stock_by_id.get(pid)
-                override = overrides.get(pid)
-                # custom_days == -1 bedeutet "globalen Standard verwenden" (nur repeat gesetzt)
-                cdays = override['custom_days_before_expiry'] if override else None
-                products.append({
-                    'product_id': pid,
-                    'name': name,
-                    'amount': stock_item.get('amount', '-') if stock_item else '-',
-                    'best_before_date': stock_item.get('best_before_date', '') if stock_item else '',
-                    'custom_days': cdays if cdays is not None and cdays >= 0 else None,
-                    'custom_repeat_limit': override.get('custom_repeat_limit') if override else None,
-                })
-        except Exception as e:
-            return jsonify({'error': str(e)}), 500
-    return jsonify({'products': products, 'overrides': list(overrides.values())})
+    overrides = get_product_overrides()
+    if not settings.get('grocy_url') or not settings.get('grocy_api_key'):
+        return jsonify({'products': [], 'overrides': overrides, 'snapshot': None,
+                        'total': 0, 'next_cursor': None})
+    try:
+        abfrage = catalog.parse_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': sprache.t('msg.invalid_parameter', name=str(e))}), 400
+    try:
+        katalog, info = catalog.current(fresh=request.args.get('fresh') == '1')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    # Ein Cursor aus einer aelteren Liste zeigte auf verschobene Zeilen
+    if abfrage.pop('version', katalog.version) != katalog.version:
+        return jsonify({'error': sprache.t('msg.cursor_expired'),
+                        'cursor_expired': True}), 410
+    if http_cache.conditional(http_cache.etag('products', info, overrides, abfrage),
+                              info['refreshed_at']):
+        return http_cache.not_modified()
+    return jsonify(dict(katalog.query(**abfrage), overrides=overrides, snapshot=info))
 
 
 @app.route('/api/products/override', methods=['POST'])
@@ -254,6 +233,7 @@ def api_save_override():
             data['product_id'], data['product_name'],
             data['days'], repeat_limit=repeat_limit
         )
+    dashboard.refresh_overrides()
     return jsonify({'ok': True})
 
 
@@ -271,6 +251,7 @@ def api_grocy_stock_add():
             best_before_date=data.get('best_before_date') or None,
             price=data.get('price') or None,
         )
+        _dashboard_auffrischen()
         return jsonify({'ok': True, 'result': result})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -549,13 +530,115 @@ def api_clear_log():
     return jsonify({'ok': True})
 
 
-@app.route('/api/check-now', methods=['POST'])
-def api_check_now():
+@app.route('/api/outbox', methods=['GET'])
+def api_get_outbox():
+    """Wartende, laufende und gescheiterte Zustellungen."""
+    limit = request.args.get('limit', 100, type=int)
+    return jsonify(get_outbox(limit))
+
+
+@app.route('/api/outbox/<int:entry_id>/retry', methods=['POST'])
+def api_retry_outbox(entry_id):
+    """Stoesst eine gescheiterte Zustellung erneut an.
+
+    Der Request setzt nur die Zeile zurueck; zugestellt wird im Worker
+    (Auftrag ``outbox_delivery``) -- ein Kanal kann bis zu seiner Frist
+    brauchen.
+    """
+    if not retry_outbox_entry(entry_id):
+        return jsonify({'ok': False}), 404
+    return _auftrag_starten('outbox_delivery')
+
+
+def _dashboard_auffrischen():
+    """Nach einer Buchung in Grocy: Dashboard und Produktliste im Worker neu rechnen.
+
+    Der Auftrag holt frisch aus Grocy; laeuft schon einer, wird keiner
+    dazugelegt.
+    """
     try:
-        run_check()
-        return jsonify({'ok': True, 'message': sprache.t('msg.check_done')})
+        submit_job('dashboard_refresh')
     except Exception as e:
-        return jsonify({'ok': False, 'message': str(e)})
+        logger.warning(f"Dashboard-Auffrischung nicht abgelegt: {e}")
+
+
+def _auftrag_starten(kind, payload=None, fehler_status=200):
+    """Legt einen Hintergrund-Auftrag ab und antwortet sofort.
+
+    202 mit ``job_id``; Phase, Fortschritt und Ergebnis liefert
+    ``/api/jobs/<id>``. Laeuft derselbe Auftrag schon, kommt dessen ID zurueck
+    (``deduplicated``). Mit ``?wait=1`` -- und unter ``/api/v1``, dessen
+    Antworten feststehen -- wartet der Request wie bis 1.7.x auf das Ergebnis.
+    """
+    job_id, neu = submit_job(kind, payload)
+    warten = request.args.get('wait')
+    if warten is None:
+        warten = request.blueprint == 'api_v1'
+    else:
+        warten = warten.lower() in ('1', 'true', 'yes')
+    if not warten:
+        job = get_job(job_id)
+        return jsonify({'ok': True, 'job_id': job_id, 'status': job['status'],
+                        'deduplicated': not neu}), 202
+    try:
+        result = wait_for_job(job_id)
+    except Exception as e:
+        return jsonify({'ok': False, 'job_id': job_id, 'message': str(e),
+                        'error': str(e)}), fehler_status
+    # Ein Ergebnis darf selbst ``ok: false`` melden (Bon nicht lesbar)
+    antwort = dict({'ok': True}, **(result or {}), job_id=job_id)
+    return jsonify(antwort), (200 if antwort['ok'] else fehler_status)
+
+
+@app.route('/api/jobs', methods=['GET'])
+def api_get_jobs():
+    """Die juengsten Hintergrund-Auftraege (``?kind=`` filtert nach Art)."""
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    return jsonify([job_view(j) for j in get_jobs(limit, request.args.get('kind'))])
+
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def api_get_job(job_id):
+    """Stand eines Hintergrund-Auftrags: Status, Phase, Fortschritt, Ergebnis."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'ok': False}), 404
+    return jsonify(job_view(job))
+
+
+@app.route('/api/events', methods=['GET'])
+def api_events():
+    """Live-Meldungen fuer die Oberflaeche (Server-Sent Events, ``events.py``).
+
+    Alle offenen Tabs eines Prozesses teilen sich eine Abfrage; sind alle
+    Plaetze belegt, antwortet der Endpunkt mit 503 und die Seite faellt auf
+    einzelne Abfragen zurueck.
+    """
+    hub = events.get_hub()
+    try:
+        abo = hub.subscribe(request.headers.get('Last-Event-ID'))
+    except events.TooManySubscribers:
+        return jsonify({'error': sprache.t('msg.events_busy')}), 503
+    return Response(events.stream(hub, abo), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/job-runs', methods=['GET'])
+def api_get_job_runs():
+    """Laufzeiten der Hintergrund-Jobs je Phase (``?job=`` filtert).
+
+    ``runs`` sind die juengsten Laeufe, ``summary`` verdichtet bis zu 500
+    Laeufe je Job: mittlere und laengste Dauer, Mittel je Phase.
+    """
+    job = request.args.get('job') or None
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'runs': get_job_runs(limit, job),
+                    'summary': summarize_runs(get_job_runs(500, job))})
+
+
+@app.route('/api/check-now', methods=['POST'])
+def api_check_now():
+    return _auftrag_starten('check')
 
 
 @app.route('/api/caldav/status', methods=['GET'])
@@ -613,12 +696,7 @@ def api_caldav_calendars():
 
 @app.route('/api/caldav/sync-now', methods=['POST'])
 def api_caldav_sync_now():
-    try:
-        sync = CalDAVSync()
-        stats = sync.sync_all()
-        return jsonify({'ok': True, 'message': sprache.t('msg.sync_done'), 'stats': stats})
-    except Exception as e:
-        return jsonify({'ok': False, 'message': str(e)})
+    return _auftrag_starten('caldav_sync')
 
 
 @app.route('/api/caldav/map', methods=['GET', 'DELETE'])
@@ -629,17 +707,6 @@ def api_caldav_map():
     return jsonify(get_sync_map())
 
 
-def schedule_caldav_sync():
-    settings = get_all_settings()
-    bg_scheduler.remove_job('caldav_sync', jobstore='default')  if bg_scheduler.get_job('caldav_sync') else None
-    if settings.get('caldav_sync_enabled', '0') == '1':
-        minutes = int(settings.get('caldav_sync_interval_minutes', 30))
-        if minutes > 0:
-            bg_scheduler.add_job(run_caldav_sync, 'interval', minutes=minutes,
-                                 id='caldav_sync', replace_existing=True)
-            logger.info(f"CalDAV Sync geplant: alle {minutes} Minuten")
-
-
 # ── Bring!-Endpunkte ─────────────────────────────────────────────────
 
 @app.route('/api/bring/status', methods=['GET'])
@@ -694,23 +761,8 @@ def api_bring_lists():
 
 @app.route('/api/bring/sync-now', methods=['POST'])
 def api_bring_sync_now():
-    try:
-        sync = BringSync()
-        stats = sync.sync_all()
-        werte = {'added': stats['added'], 'updated': stats['updated'],
-                 'removed': stats['removed'], 'errors': stats['errors']}
-        msg = sprache.t('log.bring_sync', **werte)
-        add_log_entry(None, 'bring_sync', 'Bring!', msg,
-                      success=stats['errors'] == 0,
-                      key='log.bring_sync', args=werte)
-        return jsonify({'ok': True, 'message': msg, 'stats': stats})
-    except BringSyncError as e:
-        add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
-        return jsonify({'ok': False, 'message': str(e)})
-    except Exception as e:
-        logger.exception("Bring-Sync Fehler")
-        add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
-        return jsonify({'ok': False, 'message': str(e)})
+    # Protokolliert wird im Auftrag selbst (worker._job_bring_sync)
+    return _auftrag_starten('bring_sync')
 
 
 @app.route('/api/bring/map', methods=['GET', 'DELETE'])
@@ -998,18 +1050,6 @@ def api_save_bring_override():
     return jsonify({'ok': True})
 
 
-def schedule_bring_sync():
-    settings = get_all_settings()
-    if bg_scheduler.get_job('bring_sync'):
-        bg_scheduler.remove_job('bring_sync', jobstore='default')
-    if settings.get('bring_sync_enabled', '0') == '1':
-        minutes = int(settings.get('bring_sync_interval_minutes', 30))
-        if minutes > 0:
-            bg_scheduler.add_job(run_bring_sync, 'interval', minutes=minutes,
-                                 id='bring_sync', replace_existing=True)
-            logger.info(f"Bring-Sync geplant: alle {minutes} Minuten")
-
-
 # ── Kassenbon-Endpunkte ──────────────────────────────────────────────
 
 @app.route('/api/receipts', methods=['GET'])
@@ -1047,37 +1087,9 @@ def api_upload_receipt():
 
     file.save(filepath)
 
-    try:
-        settings = get_all_settings()
-        threshold = int(settings.get('receipt_match_threshold', 70))
-        client = GrocyClient()
-        grocy_products = client.get_all_products()
-        mappings = get_product_mappings_dict()
-        result = process_receipt(filepath, grocy_products, mappings, threshold=threshold)
-
-        receipt_id = save_receipt(
-            filename=os.path.basename(filepath),
-            filepath=filepath,
-            status=result['status'],
-            extraction_method=result['extraction_method'],
-            store_name=result['parsed']['store_name'] if result['parsed'] else None,
-            receipt_date=result['parsed']['receipt_date'] if result['parsed'] else None,
-            total_amount=result['parsed']['total_amount'] if result['parsed'] else None,
-            raw_text=result['raw_text'],
-            error_message=result['error_message'],
-        )
-
-        if result['items']:
-            save_receipt_items(receipt_id, result['items'])
-
-        return jsonify({'ok': True, 'receipt_id': receipt_id, 'items_count': len(result['items'])})
-    except Exception as e:
-        logger.error(f"Fehler beim Verarbeiten des Kassenbons: {e}")
-        receipt_id = save_receipt(
-            filename=os.path.basename(filepath), filepath=filepath,
-            status='error', error_message=str(e),
-        )
-        return jsonify({'ok': False, 'error': str(e), 'receipt_id': receipt_id}), 500
+    # Texterkennung und Zuordnung laufen im Worker; der Request wartet nicht
+    # darauf -- mehrere Bons nacheinander hielten sonst je einen Thread fest
+    return _auftrag_starten('receipt_upload', {'filepath': filepath}, fehler_status=500)
 
 
 @app.route('/api/receipts/<int:receipt_id>', methods=['DELETE'])
@@ -1246,6 +1258,8 @@ def api_confirm_receipt(receipt_id):
     }
     if errors:
         result['errors'] = errors
+    if added or created:
+        _dashboard_auffrischen()
     return jsonify(result)
 
 
@@ -1272,55 +1286,14 @@ def api_reprocess_receipt(receipt_id):
     if not receipt:
         return jsonify({'error': sprache.t('msg.receipt_missing')}), 404
 
-    try:
-        settings = get_all_settings()
-        threshold = int(settings.get('receipt_match_threshold', 70))
-        client = GrocyClient()
-        grocy_products = client.get_all_products()
-        mappings = get_product_mappings_dict()
-        result = process_receipt(receipt['filepath'], grocy_products, mappings, threshold=threshold)
-
-        update_receipt_status(receipt_id, result['status'], result.get('error_message'))
-        if result['items']:
-            save_receipt_items(receipt_id, result['items'])
-
-        return jsonify({'ok': True, 'items_count': len(result['items'])})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return _auftrag_starten('receipt_reprocess', {'receipt_id': receipt_id},
+                            fehler_status=500)
 
 
-def run_receipt_watch():
-    """Wird vom Scheduler aufgerufen um den Kassenbon-Ordner zu scannen."""
-    try:
-        settings = get_all_settings()
-        folder = settings.get('receipt_watch_folder', '/app/receipts')
-        threshold = int(settings.get('receipt_match_threshold', 70))
-        client = GrocyClient()
-        grocy_products = client.get_all_products()
-        mappings = get_product_mappings_dict()
-        results = scan_receipt_folder(folder, grocy_products, mappings, threshold=threshold)
-        if results:
-            logger.info(f"Kassenbon-Scan: {len(results)} neue Bons verarbeitet")
-    except Exception as e:
-        logger.error(f"Kassenbon-Scan Fehler: {e}")
-
-
-def schedule_receipt_watch():
-    settings = get_all_settings()
-    if bg_scheduler.get_job('receipt_watch'):
-        bg_scheduler.remove_job('receipt_watch', jobstore='default')
-    if settings.get('receipt_watch_enabled', '0') == '1':
-        minutes = int(settings.get('receipt_watch_interval_minutes', 5))
-        if minutes > 0:
-            bg_scheduler.add_job(run_receipt_watch, 'interval', minutes=minutes,
-                                 id='receipt_watch', replace_existing=True)
-            logger.info(f"Kassenbon-Watch geplant: alle {minutes} Minuten")
-
-
-schedule_check()
-schedule_caldav_sync()
-schedule_bring_sync()
-schedule_receipt_watch()
+# Mit GROCYLINK_ROLE=web laufen Scheduler und Warteschlange ausschliesslich
+# in eigenen Worker-Prozessen (python -m worker)
+if get_role() == 'all':
+    scheduler_leader.run(start_scheduler)
 
 
 @app.route('/api/keys', methods=['GET'])
@@ -1367,6 +1340,9 @@ from api_v1 import api_v1 as _api_v1_blueprint
 app.config['APP_VERSION'] = APP_VERSION
 app.register_blueprint(_api_v1_blueprint)
 
+# ETag/304 und Kompression fuer /api und /api/v1 (siehe http_cache.py)
+http_cache.init_app(app)
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
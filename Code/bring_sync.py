@@ -28,11 +28,12 @@ from bring_runtime import get_runtime, BringRuntimeError
 
 import sprache
 from database import (
-    get_all_settings, get_bring_sync_map, upsert_bring_sync_entry,
-    delete_bring_sync_entry, clear_bring_sync_map, get_bring_overrides,
-    add_log_entry,
+    get_all_settings, get_bring_sync_map, apply_bring_sync_changes,
+    get_bring_overrides, add_log_entry,
 )
 from grocy_client import GrocyClient
+from grocy_snapshot import snapshot_data
+from jobruns import current_run, timed
 
 logger = logging.getLogger(__name__)
 
@@ -174,19 +175,32 @@ class BringSync:
                               item_uuid=str(uuid_lib.uuid4()))
         return {'name': clean_name, 'spec': clean_spec, 'list_uuid': target_uuid}
 
-    async def _async_sync_all(self, bring, list_uuid):
+    async def _async_sync_all(self, bring, list_uuid, lauf=None, upserts=None,
+                              deletes=None):
         """Gleicht die Bring-Liste an den Soll-Stand aus Grocy an.
 
         Ablauf: Soll bauen, Ist holen, Differenz als Aenderungsliste sammeln
-        und in moeglichst wenigen Requests schicken. Die Datenbank wird erst
-        nach erfolgreicher Uebertragung nachgezogen, damit die sync_map keine
-        Eintraege fuehrt, die es auf der Bring-Liste gar nicht gibt.
+        und in moeglichst wenigen Requests schicken. Die sync_map-Aenderungen
+        werden nur in ``upserts`` und ``deletes`` gesammelt (Listen des
+        Aufrufers) und als ``(stats, upserts, deletes)`` zurueckgegeben:
+        ``sync_all`` schreibt sie nach dem Lauf in einer Transaktion, im
+        aufrufenden Thread statt im Eventloop -- auch wenn ein spaeterer
+        Block scheitert. Es landen nur erfolgreich uebertragene Eintraege
+        darin, damit die sync_map nichts fuehrt, was es auf der Bring-Liste
+        gar nicht gibt.
         """
+        # Phasen fuer jobruns; der Abgleich selbst (3, 4) ist reine
+        # Speicherarbeit und bleibt ohne eigene Phase
+        lauf = lauf or current_run()
+
         # 1) Soll-Items aus Grocy bauen
-        target_items = self._build_target_items()
+        with lauf.phase('grocy_fetch'):
+            target_items = self._build_target_items()
+        lauf.count('target_items', len(target_items))
 
         # 2) Aktueller Stand auf der Bring-Liste
-        current = await bring.get_list(list_uuid)
+        with lauf.phase('remote_fetch'):
+            current = await bring.get_list(list_uuid)
         existing_purchase = list(current.items.purchase or [])
         by_uuid = {p.uuid: p for p in existing_purchase if getattr(p, 'uuid', None)}
         by_name = {p.itemId.lower(): p for p in existing_purchase}
@@ -195,6 +209,8 @@ class BringSync:
         seen_product_ids = set()
         stats = {'added': 0, 'updated': 0, 'skipped': 0, 'removed': 0, 'errors': 0}
         changes = []
+        upserts = [] if upserts is None else upserts
+        deletes = [] if deletes is None else deletes
 
         # 3) Soll-Items mit dem Ist abgleichen (noch ohne Requests)
         for item in target_items:
@@ -235,7 +251,7 @@ class BringSync:
                 else:
                     # Unveraendert: kein Request noetig, nur sync_map auffrischen
                     stats['skipped'] += 1
-                    upsert_bring_sync_entry(pid, purchase_uuid, bring_name, spec)
+                    upserts.append((pid, purchase_uuid, bring_name, spec))
 
         # 4) Auto-Remove: Items aus sync_map, die nicht mehr im Soll sind
         if self.settings.get('bring_auto_remove', '0') == '1':
@@ -251,19 +267,19 @@ class BringSync:
                     'operation': BRING_OP_REMOVE,
                 })
 
-        # 5) Aenderungen uebertragen und Datenbank nachziehen
-        for chunk in _chunked(changes, self.BATCH_CHUNK_SIZE):
-            applied = await self._apply_changes(bring, list_uuid, chunk, stats)
-            for change in applied:
-                if change['kind'] == 'removed':
-                    delete_bring_sync_entry(change['product_id'])
-                else:
-                    upsert_bring_sync_entry(
-                        change['product_id'], change['uuid'],
-                        change['name'], change['spec'],
-                    )
+        # 5) Aenderungen uebertragen, geglueckte fuer die sync_map vormerken
+        lauf.count('changes', len(changes))
+        with lauf.phase('remote_write'):
+            for chunk in _chunked(changes, self.BATCH_CHUNK_SIZE):
+                applied = await self._apply_changes(bring, list_uuid, chunk, stats)
+                for change in applied:
+                    if change['kind'] == 'removed':
+                        deletes.append(change['product_id'])
+                    else:
+                        upserts.append((change['product_id'], change['uuid'],
+                                        change['name'], change['spec']))
 
-        return stats
+        return stats, upserts, deletes
 
     async def _apply_changes(self, bring, list_uuid, chunk, stats):
         """Schickt einen Block Aenderungen und liefert die geglueckten zurueck.
@@ -330,9 +346,21 @@ class BringSync:
         list_uuid = self.settings.get('bring_list_uuid', '')
         if not list_uuid:
             raise BringSyncError("Keine Bring-Liste ausgewaehlt")
-        return self._execute(
-            lambda bring: self._async_sync_all(bring, list_uuid)
-        )
+        # Der Eventloop laeuft in einem eigenen Thread: den Lauf mitgeben
+        lauf = current_run()
+        upserts, deletes = [], []
+        try:
+            stats, _, _ = self._execute(
+                lambda bring: self._async_sync_all(bring, list_uuid, lauf,
+                                                   upserts, deletes)
+            )
+        finally:
+            # Was Bring schon angenommen hat, gehoert in die sync_map -- auch
+            # wenn ein spaeterer Block den Lauf abbricht
+            with lauf.phase('db_write'):
+                apply_bring_sync_changes(list(upserts), list(deletes))
+        lauf.count('errors', stats['errors'])
+        return stats
 
     def add_item_manual(self, name, spec='', list_uuid=None):
         if not name or not name.strip():
@@ -375,13 +403,13 @@ class BringSync:
 
         # Quantity-Units in einem Lookup zwischenspeichern
         try:
-            qu_map = {q['id']: q for q in self.grocy.get_quantity_units()}
+            qu_map = {q['id']: q for q in snapshot_data('quantity_units', 'bring_sync', self.grocy)}
         except Exception:
             qu_map = {}
 
         # Alle Produkte fuer Namen + QU-Defaults
         try:
-            products = self.grocy.get_all_products()
+            products = snapshot_data('products', 'bring_sync', self.grocy)
         except Exception as e:
             raise BringSyncError(f"Grocy-Produkte konnten nicht geladen werden: {e}")
         product_map = {p['id']: p for p in products}
@@ -389,7 +417,7 @@ class BringSync:
         items = []
         if source == 'shopping_list':
             try:
-                rows = self.grocy.get_shopping_list()
+                rows = snapshot_data('shopping_list', 'bring_sync', self.grocy)
             except Exception as e:
                 raise BringSyncError(f"Grocy-Shoppinglist konnte nicht geladen werden: {e}")
             for row in rows:
@@ -406,7 +434,7 @@ class BringSync:
                 items.append(self._mk_item(pid, product, amount, qu_id, qu_map, overrides))
         elif source == 'missing':
             try:
-                volatile = self.grocy.get_volatile_stock(due_soon_days=0)
+                volatile = snapshot_data('volatile', 'bring_sync', self.grocy, due_soon_days=0)
             except Exception as e:
                 raise BringSyncError(f"Grocy-Volatile-Stock konnte nicht geladen werden: {e}")
             for row in volatile.get('missing_products', []):
@@ -464,6 +492,7 @@ def _chunked(seq, size):
         yield seq[start:start + size]
 
 
+@timed('bring_sync')
 def run_bring_sync():
     """Scheduler-Entry-Point: fuehrt einen Sync aus, fasst Fehler in Logs zusammen."""
     settings = get_all_settings()
@@ -489,7 +518,9 @@ def run_bring_sync():
     except BringSyncError as e:
         logger.error(f"Bring-Sync Konfigurationsfehler: {e}")
         add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
+        current_run().fail(e)
     except Exception as e:
         logger.exception("Bring-Sync unerwarteter Fehler")
         add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
+        current_run().fail(e)
     return None
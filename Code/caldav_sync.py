@@ -4,11 +4,10 @@ from datetime import datetime
 import caldav
 from icalendar import Calendar, Todo
 
-from database import (
-    get_all_settings, get_sync_map, get_sync_entry,
-    get_sync_entry_by_uid, upsert_sync_entry
-)
+from database import get_all_settings, get_sync_map, upsert_sync_entries
 from grocy_client import GrocyClient
+from grocy_snapshot import get_snapshot, snapshot_data
+from jobruns import phase, count, current_run, timed
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +22,11 @@ class CalDAVSync:
         self.client = None
         self.calendar = None
         self.grocy = None
+        # Sync-Map-Schreibvorgaenge einer Phase, gesammelt fuer einen Commit
+        self._pending_map = []
+        # Sync-Map im Speicher, einmal je Lauf geladen (siehe _load_map)
+        self._map_by_key = {}
+        self._map_by_uid = {}
 
     def _build_url(self, url=None):
         url = url or self.settings.get('caldav_url', '')
@@ -108,29 +112,111 @@ class CalDAVSync:
         return [c.name for c in principal.calendars()]
 
     def sync_all(self):
-        self.connect()
+        # Phasen fuer jobruns: Verbindung, die drei Richtungen und je das
+        # Schreiben der Sync-Map
+        with phase('remote_connect'):
+            self.connect()
+        self._load_map()
         stats = {'tasks_synced': 0, 'chores_synced': 0, 'caldav_to_grocy': 0, 'errors': []}
 
         try:
-            self._sync_caldav_to_grocy(stats)
+            with phase('caldav_to_grocy'):
+                self._sync_caldav_to_grocy(stats)
         except Exception as e:
             logger.error(f"Fehler bei CalDAV->Grocy Sync: {e}")
             stats['errors'].append(f"CalDAV->Grocy: {e}")
+        finally:
+            with phase('db_write'):
+                self._flush_map()
+            # Nach Schreibzugriffen auf Grocy den Stand neu holen
+            if stats['caldav_to_grocy']:
+                get_snapshot().invalidate('tasks', 'chores')
 
         try:
-            self._sync_tasks_to_caldav(stats)
+            with phase('tasks_to_caldav'):
+                self._sync_tasks_to_caldav(stats)
         except Exception as e:
             logger.error(f"Fehler bei Task-Sync zu CalDAV: {e}")
             stats['errors'].append(f"Tasks->CalDAV: {e}")
+        finally:
+            with phase('db_write'):
+                self._flush_map()
 
         try:
-            self._sync_chores_to_caldav(stats)
+            with phase('chores_to_caldav'):
+                self._sync_chores_to_caldav(stats)
         except Exception as e:
             logger.error(f"Fehler bei Chore-Sync zu CalDAV: {e}")
             stats['errors'].append(f"Chores->CalDAV: {e}")
+        finally:
+            with phase('db_write'):
+                self._flush_map()
 
+        for name in ('tasks_synced', 'chores_synced', 'caldav_to_grocy'):
+            count(name, stats[name])
+        count('errors', len(stats['errors']))
         return stats
 
+    @staticmethod
+    def _map_key(grocy_type, grocy_id):
+        try:
+            return grocy_type, int(grocy_id)
+        except (TypeError, ValueError):
+            return grocy_type, grocy_id
+
+    def _load_map(self):
+        """Laedt die Sync-Map einmal je Lauf in zwei Dicts.
+
+        Bisher kostete jede Aufgabe und jedes VTODO eine eigene Abfrage
+        der Tabelle. Jetzt ist es ein Lookup im Speicher -- nach (Typ, ID)
+        und nach UID.
+        """
+        self._map_by_key = {}
+        self._map_by_uid = {}
+        for entry in get_sync_map():
+            self._map_by_key[self._map_key(entry['grocy_type'], entry['grocy_id'])] = entry
+            self._map_by_uid.setdefault(entry['caldav_uid'], entry)
+
+    def _entry(self, grocy_type, grocy_id):
+        return self._map_by_key.get(self._map_key(grocy_type, grocy_id))
+
+    def _entry_by_uid(self, uid):
+        return self._map_by_uid.get(uid)
+
+    def _remember(self, grocy_type, grocy_id, uid, status, summary=None, due=None, direction=''):
+        """Merkt einen Sync-Map-Eintrag vor; geschrieben wird am Ende der Phase.
+
+        Die Dicts im Speicher werden sofort nachgezogen, damit spaetere
+        Lookups im selben Lauf den neuen Stand sehen.
+        """
+        self._pending_map.append((grocy_type, grocy_id, uid, status, summary, due, direction))
+        key = self._map_key(grocy_type, grocy_id)
+        old = self._map_by_key.get(key)
+        if old and self._map_by_uid.get(old['caldav_uid']) is old:
+            del self._map_by_uid[old['caldav_uid']]
+        entry = {
+            'grocy_type': grocy_type, 'grocy_id': key[1], 'caldav_uid': uid,
+            'last_status': status, 'last_summary': summary, 'last_due': due,
+            'sync_direction': direction,
+        }
+        self._map_by_key[key] = entry
+        self._map_by_uid[uid] = entry
+
+    def _flush_map(self):
+        """Schreibt die vorgemerkten Eintraege einer Phase in einer Transaktion.
+
+        Ein Kalender mit 500 Aufgaben kostete bisher 500 Verbindungen und 500
+        fsyncs. Auch bei einem Abbruch mitten in der Phase wird geschrieben,
+        was bis dahin gelungen ist.
+        """
+        pending, self._pending_map = self._pending_map, []
+        if not pending:
+            return
+        try:
+            upsert_sync_entries(pending)
+        except Exception as e:
+            logger.error(f"Sync-Map konnte nicht geschrieben werden: {e}")
+
     def _task_to_vtodo(self, task, uid=None):
         cal = Calendar()
         cal.add('prodid', '-//Grocylink//CalDAV Sync//DE')
@@ -228,7 +314,7 @@ class CalDAVSync:
         return None, None
 
     def _sync_tasks_to_caldav(self, stats):
-        all_tasks = self.grocy.get_all_tasks_including_done()
+        all_tasks = snapshot_data('tasks', 'caldav_sync', self.grocy)
         logger.info(f"Synchronisiere {len(all_tasks)} Tasks zu CalDAV")
 
         for task in all_tasks:
@@ -236,7 +322,7 @@ class CalDAVSync:
                 task_id = task['id']
                 # UID aus Sync-Map lesen: CalDAV-importierte Tasks behalten ihre Original-UID,
                 # Grocy-native Tasks bekommen die berechnete Grocylink-UID
-                sync_entry = get_sync_entry('task', task_id)
+                sync_entry = self._entry('task', task_id)
                 uid = sync_entry['caldav_uid'] if sync_entry else f"{UID_TASK_PREFIX}{task_id}{UID_DOMAIN}"
                 is_done = str(task.get('done', '0')) == '1'
                 status = 'COMPLETED' if is_done else 'NEEDS-ACTION'
@@ -265,14 +351,14 @@ class CalDAVSync:
                     self.calendar.save_todo(vtodo_data)
                     logger.debug(f"Task {task_id} neu auf CalDAV angelegt")
 
-                upsert_sync_entry('task', task_id, uid, status, summary, due, direction='grocy→caldav')
+                self._remember('task', task_id, uid, status, summary, due, direction='grocy→caldav')
                 stats['tasks_synced'] += 1
             except Exception as e:
                 logger.error(f"Fehler bei Task {task.get('id')}: {e}")
                 stats['errors'].append(f"Task {task.get('id')}: {e}")
 
     def _sync_chores_to_caldav(self, stats):
-        chores = self.grocy.get_chores()
+        chores = snapshot_data('chores', 'caldav_sync', self.grocy)
         logger.info(f"Synchronisiere {len(chores)} Chores zu CalDAV")
 
         for chore in chores:
@@ -299,7 +385,7 @@ class CalDAVSync:
                     self.calendar.save_todo(vtodo_data)
                     logger.debug(f"Chore {chore_id} neu auf CalDAV angelegt")
 
-                upsert_sync_entry('chore', chore_id, uid, 'NEEDS-ACTION', summary, next_exec, direction='grocy→caldav')
+                self._remember('chore', chore_id, uid, 'NEEDS-ACTION', summary, next_exec, direction='grocy→caldav')
                 stats['chores_synced'] += 1
             except Exception as e:
                 logger.error(f"Fehler bei Chore {chore.get('chore_id', chore.get('id'))}: {e}")
@@ -314,7 +400,7 @@ class CalDAVSync:
             logger.error(f"Fehler beim Abrufen der VTODOs: {e}")
             return
 
-        all_tasks = {t['id']: t for t in self.grocy.get_all_tasks_including_done()}
+        all_tasks = {t['id']: t for t in snapshot_data('tasks', 'caldav_sync', self.grocy)}
 
         for item in results:
             try:
@@ -378,9 +464,9 @@ class CalDAVSync:
 
                         if changed:
                             new_due = caldav_due.dt.strftime('%Y-%m-%d') if caldav_due else task.get('due_date', '')
-                            upsert_sync_entry('task', task_id, uid, caldav_status,
-                                              caldav_summary or task.get('name', ''), new_due,
-                                              direction='caldav→grocy')
+                            self._remember('task', task_id, uid, caldav_status,
+                                           caldav_summary or task.get('name', ''), new_due,
+                                           direction='caldav→grocy')
                             stats['caldav_to_grocy'] += 1
 
                     elif uid.startswith(UID_CHORE_PREFIX) and uid.endswith(UID_DOMAIN):
@@ -391,11 +477,11 @@ class CalDAVSync:
                             continue
 
                         if caldav_status == 'COMPLETED':
-                            sync_entry = get_sync_entry('chore', chore_id)
+                            sync_entry = self._entry('chore', chore_id)
                             if sync_entry and sync_entry['last_status'] != 'COMPLETED':
                                 self.grocy.execute_chore(chore_id)
                                 logger.info(f"Chore {chore_id} in Grocy ausgefuehrt (CalDAV->Grocy)")
-                                upsert_sync_entry('chore', chore_id, uid, 'COMPLETED', direction='caldav→grocy')
+                                self._remember('chore', chore_id, uid, 'COMPLETED', direction='caldav→grocy')
                                 stats['caldav_to_grocy'] += 1
 
                     else:
@@ -405,7 +491,7 @@ class CalDAVSync:
                             continue
 
                         # Pruefen ob diese UID bereits synchronisiert wurde
-                        existing = get_sync_entry_by_uid(uid)
+                        existing = self._entry_by_uid(uid)
                         if existing:
                             continue
 
@@ -431,10 +517,10 @@ class CalDAVSync:
                         )
                         if duplicate:
                             # Original-UID merken, damit sie nicht erneut verarbeitet wird
-                            upsert_sync_entry('task', 0, uid,
-                                              caldav_status, caldav_summary,
-                                              task_data.get('due_date', ''),
-                                              direction='caldav→grocy (duplikat)')
+                            self._remember('task', 0, uid,
+                                           caldav_status, caldav_summary,
+                                           task_data.get('due_date', ''),
+                                           direction='caldav→grocy (duplikat)')
                             logger.info(f"Duplikat erkannt: '{caldav_summary}' existiert bereits in Grocy, uebersprungen")
                             continue
 
@@ -444,10 +530,10 @@ class CalDAVSync:
                             # Original CalDAV-UID in Sync-Map speichern.
                             # Kein UID-Update in CalDAV noetig: _sync_tasks_to_caldav liest
                             # die gespeicherte UID aus der Sync-Map und findet das VTODO direkt.
-                            upsert_sync_entry('task', new_task_id, uid,
-                                              caldav_status, caldav_summary,
-                                              task_data.get('due_date', ''),
-                                              direction='caldav→grocy')
+                            self._remember('task', new_task_id, uid,
+                                           caldav_status, caldav_summary,
+                                           task_data.get('due_date', ''),
+                                           direction='caldav→grocy')
 
                             if caldav_status == 'COMPLETED':
                                 self.grocy.complete_task(new_task_id)
@@ -460,6 +546,7 @@ class CalDAVSync:
                 stats['errors'].append(f"CalDAV->Grocy: {e}")
 
 
+@timed('caldav_sync')
 def run_caldav_sync():
     settings = get_all_settings()
     if settings.get('caldav_sync_enabled', '0') != '1':
@@ -471,4 +558,5 @@ def run_caldav_sync():
         return stats
     except Exception as e:
         logger.error(f"CalDAV Sync Fehler: {e}")
+        current_run().fail(e)
         return {'error': str(e)}
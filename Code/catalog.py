@@ -0,0 +1,233 @@
+"""Produktkatalog fuer ``/api/products``: Suche, Sortierung, Seiten, Felder.
+
+Bis 1.7.x lieferte ``/api/products`` immer alle Produkte auf einmal, und die
+Oberflaeche baute daraus die ganze Tabelle. Bei 10 000 Produkten sind das
+Megabytes JSON und ein Browser, der sekundenlang rechnet.
+
+Der Katalog liegt je Prozess im Speicher, gebaut aus der vorberechneten
+Produktliste (``dashboard.py``) und gueltig, solange deren Digest gleich
+bleibt. Ein Request liest dafuer nur die Versionszeile aus SQLite; Liste,
+Suchindex und Sortierungen entstehen einmal je neuem Stand.
+
+Parameter (alle optional, ohne sie bleibt die Antwort wie bisher):
+
+- ``q``: Suchbegriff. ``match=prefix`` (Standard) findet Namen, in denen
+  jedes Wort der Suche ein Wort beginnt ("mil" -> "Hafer-Milch",
+  "haf mil" ebenso);
+  ``match=fuzzy`` sucht unscharf (rapidfuzz) und ordnet nach Treffergenauigkeit
+- ``sort``: ``name``, ``amount``, ``best_before_date`` oder ``product_id``,
+  absteigend mit ``-`` davor; leere Werte stehen immer hinten
+- ``limit``: Produkte je Seite (hoechstens ``MAX_LIMIT``); ``cursor``: der
+  ``next_cursor`` der vorigen Seite. Er gilt nur fuer die Version der Liste,
+  aus der er stammt -- ist sie inzwischen neu berechnet, antwortet
+  ``/api/products`` mit 410 und der Client beginnt wieder bei Seite eins
+- ``fields``: kommagetrennte Auswahl aus ``FIELDS``
+"""
+
+import base64
+import binascii
+import bisect
+import json
+import re
+import threading
+
+import dashboard
+from database import get_materialized_view
+
+FIELDS = ('product_id', 'name', 'amount', 'best_before_date', 'custom_days',
+          'custom_repeat_limit')
+
+# Sortierschluessel -> Wert je Produkt; None steht hinten
+SORT_KEYS = {
+    'name': lambda p: (p.get('name') or '').lower(),
+    'amount': lambda p: p.get('amount') if isinstance(p.get('amount'), (int, float)) else None,
+    'best_before_date': lambda p: p.get('best_before_date') or None,
+    'product_id': lambda p: p.get('product_id'),
+}
+
+MATCH_MODES = ('prefix', 'fuzzy')
+
+MAX_LIMIT = 1000
+
+# Mindestwert (0..100) fuer einen unscharfen Treffer
+FUZZY_MIN_SCORE = 70
+
+_WORTGRENZE = re.compile(r'[\s\-_/,.;:()+&]+')
+
+
+def _woerter(name):
+    """Der ganze Name und jedes Wort darin -- Einstiege fuer die Praefixsuche."""
+    return {name} | {w for w in _WORTGRENZE.split(name) if w}
+
+
+def _cursor(version, offset):
+    roh = json.dumps([version, offset]).encode()
+    return base64.urlsafe_b64encode(roh).decode().rstrip('=')
+
+
+def _cursor_lesen(cursor):
+    """``next_cursor`` -> (Version der Liste, Offset)."""
+    try:
+        roh = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        version, offset = json.loads(roh)
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError
+        return version, offset
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('cursor')
+
+
+def parse_query(args):
+    """Prueft die Parameter eines Requests.
+
+    Returns:
+        dict fuer ``ProductCatalog.query`` -- leer ohne Parameter. Mit
+        ``cursor`` steht dessen Listenversion unter ``version``; sie gehoert
+        nicht in ``query``, sondern wird mit ``ProductCatalog.version``
+        verglichen.
+
+    Raises:
+        ValueError: mit dem Namen des ungueltigen Parameters
+    """
+    abfrage = {}
+    q = (args.get('q') or '').strip()
+    if q:
+        abfrage['q'] = q
+    if args.get('match'):
+        if args['match'] not in MATCH_MODES:
+            raise ValueError('match')
+        abfrage['match'] = args['match']
+    if args.get('sort'):
+        if args['sort'].lstrip('-') not in SORT_KEYS:
+            raise ValueError('sort')
+        abfrage['sort'] = args['sort']
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ValueError('limit')
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError('limit')
+        abfrage['limit'] = limit
+    if args.get('cursor'):
+        abfrage['version'], abfrage['offset'] = _cursor_lesen(args['cursor'])
+    if args.get('fields'):
+        felder = tuple(f.strip() for f in args['fields'].split(',') if f.strip())
+        if not felder or any(f not in FIELDS for f in felder):
+            raise ValueError('fields')
+        abfrage['fields'] = felder
+    return abfrage
+
+
+class ProductCatalog:
+    """Die Produktliste eines Standes mit Suchindex und Sortierungen."""
+
+    def __init__(self, products, version, digest=None):
+        self.products = products
+        self.version = version
+        self.digest = digest
+        self._namen = [(p.get('name') or '').lower() for p in products]
+        # (Wort, Index) sortiert: Praefixsuche per bisect statt Durchlauf
+        self._index = sorted((wort, i) for i, name in enumerate(self._namen)
+                             for wort in _woerter(name))
+        self._reihenfolgen = {}
+        self._lock = threading.Lock()
+
+    def order(self, sort='name'):
+        """Indizes aller Produkte in der Reihenfolge von ``sort`` (zwischengespeichert)."""
+        with self._lock:
+            if sort not in self._reihenfolgen:
+                absteigend, schluessel = sort.startswith('-'), SORT_KEYS[sort.lstrip('-')]
+                werte = [schluessel(p) for p in self.products]
+                gefuellt = sorted((i for i, w in enumerate(werte) if w is not None),
+                                  key=lambda i: (werte[i], i), reverse=absteigend)
+                leer = [i for i, w in enumerate(werte) if w is None]
+                self._reihenfolgen[sort] = gefuellt + leer
+            return self._reihenfolgen[sort]
+
+    def _praefix(self, q):
+        treffer = set()
+        for wort, i in self._index[bisect.bisect_left(self._index, (q, -1)):]:
+            if not wort.startswith(q):
+                break
+            treffer.add(i)
+        return treffer
+
+    def search_prefix(self, q):
+        """Indizes der Produkte, bei denen jedes Wort von ``q`` ein Wort des Namens beginnt."""
+        woerter = [w for w in _WORTGRENZE.split(q.lower()) if w]
+        if not woerter:
+            return set()
+        treffer = self._praefix(woerter[0])
+        for wort in woerter[1:]:
+            treffer &= self._praefix(wort)
+        return treffer
+
+    def search_fuzzy(self, q):
+        """Indizes unscharfer Treffer, der genaueste zuerst."""
+        from rapidfuzz import process, fuzz
+        treffer = process.extract(q.lower(), self._namen, scorer=fuzz.WRatio,
+                                  score_cutoff=FUZZY_MIN_SCORE, limit=None)
+        return [i for _, _, i in sorted(treffer, key=lambda t: (-t[1], t[2]))]
+
+    def query(self, q=None, match='prefix', sort=None, offset=0, limit=None, fields=None):
+        """Eine Seite der Liste.
+
+        Returns:
+            dict mit ``products``, ``total`` (Treffer insgesamt) und
+            ``next_cursor`` (None auf der letzten Seite)
+        """
+        if q and match == 'fuzzy' and sort is None:
+            reihe = self.search_fuzzy(q)
+        else:
+            reihe = self.order(sort or 'name')
+            if q:
+                treffer = (set(self.search_fuzzy(q)) if match == 'fuzzy'
+                           else self.search_prefix(q))
+                reihe = [i for i in reihe if i in treffer]
+        ende = len(reihe) if limit is None else offset + limit
+        seite = [self.products[i] for i in reihe[offset:ende]]
+        if fields:
+            seite = [{f: p.get(f) for f in fields} for p in seite]
+        return {
+            'products': seite,
+            'total': len(reihe),
+            'next_cursor': _cursor(self.version, ende) if ende < len(reihe) else None,
+        }
+
+
+_cache_lock = threading.Lock()
+_cache = None
+
+
+def current(fresh=False):
+    """Katalog des aktuellen Standes und dessen ``snapshot_info``.
+
+    Liest aus SQLite nur die Versionszeile; die Liste selbst nur, wenn sich
+    ihr Digest seit dem letzten Aufruf in diesem Prozess geaendert hat.
+    """
+    global _cache
+    meta = None if fresh else get_materialized_view('products', with_data=False)
+    if meta is None:
+        # Noch nichts vorberechnet oder ?fresh=1: im Aufruf rechnen
+        view = dashboard.read('products', fresh=fresh)
+        katalog = ProductCatalog(view['data'], view['version'], view['digest'])
+        with _cache_lock:
+            _cache = katalog
+        return katalog, dashboard.snapshot_info(view)
+    with _cache_lock:
+        katalog = _cache
+    if katalog is None or katalog.digest != meta['digest']:
+        # Stand und Zeitpunkte aus derselben Zeile wie die Liste
+        meta = get_materialized_view('products')
+        katalog = ProductCatalog(meta.pop('data'), meta['version'], meta['digest'])
+        with _cache_lock:
+            _cache = katalog
+    return katalog, dashboard.snapshot_info(meta)
+
+
+def clear():
+    """Verwirft den Katalog dieses Prozesses -- etwa zwischen Tests."""
+    global _cache
+    with _cache_lock:
+        _cache = None
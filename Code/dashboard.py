@@ -0,0 +1,187 @@
+"""Vorberechnete Antworten fuer Dashboard und Produktliste.
+
+Bis 1.7.x holte jeder Aufruf des Dashboards ``/stock/volatile`` und den
+kompletten ``/stock`` aus Grocy -- vom Bestand wurde nur ``len()`` gebraucht.
+Die Produktliste lud bei jedem Oeffnen alle Produkte und den ganzen Bestand,
+fuehrte beides mit den Overrides zusammen und sortierte neu. Jeder offene
+Tab kostete so mehrere Grocy-Requests.
+
+Jetzt baut der Worker beide Antworten im Job ``dashboard_refresh`` aus dem
+gemeinsamen Grocy-Stand (``grocy_snapshot.py``) und legt sie fertig in der
+Tabelle ``materialized_views`` ab. ``/api/status`` und ``/api/products``
+lesen nur noch diese eine Zeile -- auch im Webprozess, der den Snapshot des
+Workers nicht sieht.
+
+Jede Antwort traegt ihren Stand mit (``snapshot_info``): Version (steigt nur
+bei neuem Inhalt), Zeitpunkt des Grocy-Abrufs und Zeitpunkt der Berechnung.
+``?fresh=1`` rechnet im Request neu -- mit frischem Abruf aus Grocy -- und
+legt das Ergebnis gleich fuer alle ab. Fehlt noch eine
+Antwort oder passt sie nicht mehr zu den Einstellungen (anderer Vorlauf),
+wird ebenfalls im Request gerechnet.
+"""
+
+import logging
+
+from database import (
+    get_all_settings, get_product_overrides, save_materialized_view,
+    get_materialized_view,
+)
+from grocy_snapshot import get_snapshot
+from jobruns import phase, count
+
+logger = logging.getLogger(__name__)
+
+# Abstand der Neuberechnung im Worker. Grocy selbst wird hoechstens einmal
+# je Snapshot-Zyklus gefragt (grocy_snapshot.SNAPSHOT_MAX_AGE_SECONDS).
+DASHBOARD_REFRESH_SECONDS = 60
+
+VIEWS = ('status', 'products')
+
+# Name, unter dem die Zugriffe im Grocy-Snapshot erscheinen
+CONSUMER = 'dashboard'
+
+
+def _params(name, settings):
+    """Einstellungen, von denen eine Antwort abhaengt."""
+    if name == 'status':
+        return {'due_soon_days': int(settings.get('default_days_before_expiry', 5))}
+    return {}
+
+
+def build_status(due_soon_days, client=None, fresh=None):
+    """Dashboard: faellige, abgelaufene, fehlende Produkte und Bestandsgroesse.
+
+    Returns:
+        (Antwort, Zeitpunkt des aeltesten verwendeten Grocy-Abrufs)
+    """
+    snapshot = get_snapshot()
+    volatile = snapshot.get('volatile', CONSUMER, client, fresh=fresh,
+                            due_soon_days=due_soon_days)
+    stock = snapshot.get('stock', CONSUMER, client, fresh=fresh)
+    status = {
+        'due_products': volatile.data.get('due_products', []),
+        'overdue_products': volatile.data.get('overdue_products', []),
+        'expired_products': volatile.data.get('expired_products', []),
+        'missing_products': volatile.data.get('missing_products', []),
+        'total_products': len(stock.data),
+    }
+    return status, min(volatile.fetched_at, stock.fetched_at)
+
+
+def build_products(client=None, fresh=None):
+    """Alle Grocy-Produkte (nicht nur mit Bestand), alphabetisch, mit Menge und MHD.
+
+    Returns:
+        (Produktliste ohne Overrides, Zeitpunkt des aeltesten Grocy-Abrufs)
+    """
+    snapshot = get_snapshot()
+    produkte = snapshot.get('products', CONSUMER, client, fresh=fresh)
+    fetched_at = produkte.fetched_at
+    stock_by_id = {}
+    try:
+        stock = snapshot.get('stock', CONSUMER, client, fresh=fresh)
+        fetched_at = min(fetched_at, stock.fetched_at)
+        for item in stock.data:
+            pid = item.get('product_id') or item.get('product', {}).get('id')
+            if pid is not None:
+                stock_by_id[pid] = item
+    except Exception:
+        pass
+    products = []
+    for prod in sorted(produkte.data, key=lambda p: (p.get('name') or '').lower()):
+        pid = prod.get('id')
+        stock_item = stock_by_id.get(pid)
+        products.append({
+            'product_id': pid,
+            'name': prod.get('name', f'Produkt #{pid}'),
+            'amount': stock_item.get('amount', '-') if stock_item else '-',
+            'best_before_date': stock_item.get('best_before_date', '') if stock_item else '',
+        })
+    return products, fetched_at
+
+
+def apply_overrides(products, overrides=None):
+    """Setzt ``custom_days`` und ``custom_repeat_limit`` aus den Overrides."""
+    if overrides is None:
+        overrides = get_product_overrides()
+    by_id = {o['product_id']: o for o in overrides}
+    ergebnis = []
+    for prod in products:
+        override = by_id.get(prod['product_id'])
+        # custom_days == -1 bedeutet "globalen Standard verwenden" (nur repeat gesetzt)
+        cdays = override['custom_days_before_expiry'] if override else None
+        ergebnis.append(dict(
+            prod,
+            custom_days=cdays if cdays is not None and cdays >= 0 else None,
+            custom_repeat_limit=override.get('custom_repeat_limit') if override else None,
+        ))
+    return ergebnis
+
+
+def refresh(client=None, fresh=None):
+    """Berechnet Dashboard und Produktliste neu und legt beide ab.
+
+    Args:
+        client: ``GrocyClient`` (Standard: aus den Einstellungen)
+        fresh: an ``GrocySnapshot.get`` -- True holt in jedem Fall neu aus Grocy
+
+    Returns:
+        dict Name -> abgelegte Antwort (siehe ``database.get_materialized_view``)
+    """
+    settings = get_all_settings()
+    with phase('grocy_fetch'):
+        status, status_at = build_status(
+            _params('status', settings)['due_soon_days'], client, fresh)
+        products, products_at = build_products(client, fresh)
+    with phase('evaluate'):
+        products = apply_overrides(products)
+    count('products', len(products))
+    with phase('db_write'):
+        return {
+            'status': save_materialized_view('status', status, _params('status', settings),
+                                             status_at),
+            'products': save_materialized_view('products', products, {}, products_at),
+        }
+
+
+def refresh_overrides():
+    """Traegt geaenderte Overrides in die abgelegte Produktliste ein -- ohne Grocy."""
+    view = get_materialized_view('products')
+    if view is None:
+        return None
+    return save_materialized_view('products', apply_overrides(view['data']),
+                                  view['params'], view['fetched_at'])
+
+
+def read(name, fresh=False):
+    """Liefert die abgelegte Antwort ``name``; rechnet bei Bedarf im Aufruf neu.
+
+    Args:
+        name: ``status`` oder ``products``
+        fresh: True rechnet mit frischem Grocy-Abruf neu (``?fresh=1``)
+
+    Returns:
+        dict wie ``database.get_materialized_view`` plus ``live`` (im Aufruf
+        gerechnet)
+    """
+    if name not in VIEWS:
+        raise KeyError(f"Unbekannte Antwort: {name}")
+    view = None if fresh else get_materialized_view(name)
+    if view is not None and view['params'] == _params(name, get_all_settings()):
+        return dict(view, live=False)
+    return dict(refresh(fresh=True if fresh else None)[name], live=True)
+
+
+def snapshot_info(view):
+    """Stand einer Antwort fuer die Oberflaeche: Version und Zeitpunkte.
+
+    Bewusst ohne Alter in Sekunden: Die Antwort bleibt so Byte fuer Byte
+    gleich, solange die Version gleich bleibt -- Voraussetzung fuer ihren
+    ETag (``http_cache.py``). Das Alter ergibt sich aus ``fetched_at`` (UTC).
+    """
+    return {
+        'version': view['version'],
+        'fetched_at': view['fetched_at'],
+        'refreshed_at': view['refreshed_at'],
+        'live': view.get('live', False),
+    }
@@ -1,6 +1,7 @@
 import sqlite3
 import json
 import os
+from contextlib import contextmanager
 from crypto import (
     encrypt, decrypt, encrypt_channel_config, decrypt_channel_config,
     SENSITIVE_SETTINGS
@@ -16,6 +17,65 @@ def get_db():
     return conn
 
 
+@contextmanager
+def transaction():
+    """Klammert mehrere Schreibvorgaenge zu einer Transaktion.
+
+    Alles im ``with``-Block landet mit **einem** Commit in der Datei -- oder
+    gar nicht, wenn eine Ausnahme fliegt. Bis 1.7.x zahlte jeder Schritt eines
+    zusammengesetzten Vorgangs (Bon + Positionen, Tracker aufraeumen + hochzaehlen)
+    seine eigene Verbindung und seinen eigenen fsync, und ein Absturz
+    dazwischen hinterliess halbe Zustaende.
+
+        with transaction() as conn:
+            receipt_id = save_receipt(..., conn=conn)
+            save_receipt_items(receipt_id, items, conn=conn)
+
+    ``BEGIN IMMEDIATE`` holt die Schreibsperre gleich zu Beginn, damit ein
+    paralleler Schreiber nicht erst mitten im Block scheitert.
+    """
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _verbindung(conn=None):
+    """Die Verbindung einer laufenden Transaktion -- oder eine eigene.
+
+    Damit koennen Schreibfunktionen allein (eigener Commit) und innerhalb von
+    ``transaction()`` (Commit am Ende des Blocks) aufgerufen werden.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with transaction() as eigene:
+        yield eigene
+
+
+def executemany(sql, rows, conn=None):
+    """Fuehrt eine Anweisung fuer viele Parametersaetze aus.
+
+    Die Anweisung wird einmal vorbereitet und fuer jede Zeile neu gebunden;
+    ohne ``conn`` laeuft alles in einer eigenen Transaktion.
+
+    Returns:
+        Anzahl der betroffenen Zeilen.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with _verbindung(conn) as c:
+        return c.executemany(sql, rows).rowcount
+
+
 def init_db():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = get_db()
@@ -24,6 +84,9 @@ def init_db():
         conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
     except Exception:
         pass
+    # Greift nur bei einer frischen Datei, solange noch keine Tabelle steht.
+    # Bestehende Datenbanken stellt die Wartung einmalig um (run_maintenance).
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.executescript("""
         CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
@@ -78,6 +141,10 @@ def init_db():
             UNIQUE(grocy_type, grocy_id)
         );
 
+        -- CalDAV->Grocy sucht je VTODO nach der UID
+        CREATE INDEX IF NOT EXISTS idx_caldav_sync_map_uid
+            ON caldav_sync_map(caldav_uid);
+
         CREATE TABLE IF NOT EXISTS receipts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             filename TEXT NOT NULL,
@@ -147,6 +214,101 @@ def init_db():
             custom_name TEXT,
             custom_spec TEXT
         );
+
+        -- Ausgehende Benachrichtigungen: je Check und Kanal eine Zeile.
+        -- status: pending -> sending -> sent | dead; eine neuere Meldung fuer
+        -- denselben Kanal setzt noch wartende Zeilen auf superseded.
+        -- alerts_json haelt die Alerts des Checks fuer Tracker und Log,
+        -- diff_json die Zustandswechsel des inkrementellen Checks.
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id TEXT NOT NULL,
+            channel_id INTEGER NOT NULL,
+            channel_name TEXT NOT NULL,
+            title TEXT NOT NULL,
+            message TEXT NOT NULL,
+            alerts_json TEXT NOT NULL DEFAULT '[]',
+            diff_json TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL DEFAULT (datetime('now')),
+            claimed_at TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            sent_at TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+            ON notification_outbox(status, next_attempt_at);
+
+        -- Geplante Jobs des Schedulers (jobstore.py); next_run_time in UTC
+        CREATE TABLE IF NOT EXISTS scheduler_jobs (
+            id TEXT PRIMARY KEY,
+            next_run_time REAL,
+            job_state BLOB NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_scheduler_jobs_next_run
+            ON scheduler_jobs(next_run_time);
+
+        -- Auftraege der Weboberflaeche an den Worker-Prozess (worker.py)
+        CREATE TABLE IF NOT EXISTS job_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload_json TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            phase TEXT,
+            progress REAL,
+            result_json TEXT,
+            error TEXT,
+            worker TEXT,
+            source TEXT NOT NULL DEFAULT 'manual',
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            started_at TEXT,
+            finished_at TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_job_queue_status
+            ON job_queue(status, id);
+
+        -- Laufzeiten der Hintergrund-Jobs je Phase (jobruns.py)
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'schedule',
+            status TEXT NOT NULL DEFAULT 'ok',
+            error TEXT,
+            started_at TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            phases_json TEXT NOT NULL DEFAULT '{}',
+            counts_json TEXT NOT NULL DEFAULT '{}',
+            reads_json TEXT NOT NULL DEFAULT '[]'
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_job_runs_job
+            ON job_runs(job, id);
+
+        -- Vorberechnete Antworten fuer Dashboard und Produktliste (dashboard.py)
+        CREATE TABLE IF NOT EXISTS materialized_views (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 1,
+            digest TEXT NOT NULL,
+            params_json TEXT NOT NULL DEFAULT '{}',
+            data_json TEXT NOT NULL,
+            fetched_at TEXT,
+            refreshed_at TEXT NOT NULL
+        );
+
+        -- Letzter Alert-Stand fuer den inkrementellen Check
+        CREATE TABLE IF NOT EXISTS alert_snapshot (
+            product_id TEXT NOT NULL,
+            notification_type TEXT NOT NULL,
+            best_before_date TEXT NOT NULL DEFAULT '',
+            name TEXT NOT NULL DEFAULT '',
+            detail TEXT NOT NULL DEFAULT '',
+            since TEXT NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (product_id, notification_type, best_before_date)
+        );
     """)
     # Migrationen: fehlende Spalten nachträglich hinzufügen
     for migration in [
@@ -159,6 +321,9 @@ def init_db():
         # fuer Ausnahmetexte und fuer alles, was vor 1.7.0 geschrieben wurde.
         "ALTER TABLE notification_log ADD COLUMN message_key TEXT",
         "ALTER TABLE notification_log ADD COLUMN message_args TEXT",
+        "ALTER TABLE job_runs ADD COLUMN reads_json TEXT NOT NULL DEFAULT '[]'",
+        "ALTER TABLE job_queue ADD COLUMN source TEXT NOT NULL DEFAULT 'manual'",
+        "ALTER TABLE notification_outbox ADD COLUMN diff_json TEXT",
     ]:
         try:
             conn.execute(migration)
@@ -170,6 +335,10 @@ def init_db():
         'grocy_api_key': '',
         'default_days_before_expiry': '5',
         'check_interval_hours': '6',
+        # 'full': jeder Check meldet alles | 'incremental': nur Zustandswechsel
+        'check_mode': 'full',
+        # Weckruf am Tag eines Schwellen-Uebertritts (HH:MM, Ortszeit)
+        'event_check_time': '07:00',
         'notify_expiring': '1',
         'notify_expired': '1',
         'notify_missing': '1',
@@ -203,6 +372,8 @@ def init_db():
         'bring_source': 'shopping_list',  # 'shopping_list' | 'missing'
         'bring_sync_direction': 'grocy_to_bring',  # v1: nur unidirektional
         'bring_auto_remove': '0',
+        # Datenbank-Wartung (PRAGMA optimize, incremental_vacuum, quick_check)
+        'db_maintenance_interval_hours': '24',
     }
     for key, value in defaults.items():
         conn.execute(
@@ -239,6 +410,78 @@ def _check_encryption_integrity():
         conn.close()
 
 
+def run_maintenance():
+    """Pflegt die SQLite-Datei: Statistiken, Freiplatz, Integritaet.
+
+    Das Log der Oberflaeche und geloeschte Kassenbons hinterlassen freie
+    Seiten, die ohne VACUUM nie an das Dateisystem zurueckgehen, und ohne
+    ANALYZE plant SQLite mit Statistiken vom ersten Tag.
+
+    Ablauf:
+    1. Steht die Datei noch nicht auf ``auto_vacuum=INCREMENTAL`` (alles, was
+       vor dieser Version angelegt wurde), wird sie einmalig per VACUUM
+       umgestellt. Danach genuegt ``incremental_vacuum``.
+    2. ``PRAGMA optimize`` aktualisiert die Statistiken; gab es noch nie
+       welche, laeuft einmal ANALYZE.
+    3. ``incremental_vacuum`` gibt die freien Seiten zurueck.
+    4. ``quick_check`` prueft die Struktur (ohne Index-Abgleich, daher schnell).
+
+    Returns:
+        dict mit ``duration_ms``, ``reclaimed_bytes``, ``size_before``,
+        ``size_after``, ``integrity`` (``'ok'`` oder die erste Meldung) und
+        ``converted`` (True, wenn die Datei umgestellt wurde).
+    """
+    import logging
+    import time
+    logger = logging.getLogger(__name__)
+    start = time.monotonic()
+
+    def _groesse(conn):
+        return (conn.execute("PRAGMA page_count").fetchone()[0]
+                * conn.execute("PRAGMA page_size").fetchone()[0])
+
+    conn = get_db()
+    try:
+        size_before = _groesse(conn)
+        converted = False
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            converted = True
+        hat_statistik = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()
+        if not hat_statistik:
+            conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+        # Gibt je Schritt eine Seite frei. execute() macht nur einen Schritt,
+        # executescript() laeuft bis zum Ende durch.
+        conn.executescript("PRAGMA incremental_vacuum;")
+        pruefung = [r[0] for r in conn.execute("PRAGMA quick_check").fetchall()]
+        size_after = _groesse(conn)
+    finally:
+        conn.close()
+
+    result = {
+        'duration_ms': int((time.monotonic() - start) * 1000),
+        'reclaimed_bytes': max(size_before - size_after, 0),
+        'size_before': size_before,
+        'size_after': size_after,
+        'integrity': pruefung[0] if pruefung else 'ok',
+        'converted': converted,
+    }
+    if result['integrity'] != 'ok':
+        logger.error(f"Datenbank-Integritaetspruefung meldet: {'; '.join(pruefung[:5])}")
+    logger.info(
+        f"Datenbank-Wartung: {result['duration_ms']} ms, "
+        f"{result['reclaimed_bytes']} Bytes freigegeben "
+        f"({size_before} -> {size_after})"
+        + (", auf auto_vacuum=INCREMENTAL umgestellt" if converted else "")
+    )
+    return result
+
+
 def get_setting(key):
     conn = get_db()
     row = conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
@@ -285,6 +528,15 @@ def get_channels():
     return [dict(r) for r in rows]
 
 
+def get_channel(channel_id):
+    """Ein Kanal wie in ``get_channels()`` -- Konfiguration verschluesselt."""
+    conn = get_db()
+    row = conn.execute("SELECT * FROM notification_channels WHERE id = ?",
+                       (channel_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+
 def get_channels_decrypted():
     channels = get_channels()
     for ch in channels:
@@ -311,6 +563,8 @@ def save_channel(channel):
         )
     conn.commit()
     conn.close()
+    if channel.get('id'):
+        _notifier_verwerfen(channel['id'])
 
 
 def delete_channel(channel_id):
@@ -318,6 +572,17 @@ def delete_channel(channel_id):
     conn.execute("DELETE FROM notification_channels WHERE id = ?", (channel_id,))
     conn.commit()
     conn.close()
+    _notifier_verwerfen(channel_id)
+
+
+def _notifier_verwerfen(channel_id):
+    """Gibt den zwischengespeicherten Notifier eines Kanals frei.
+
+    Der Import steht im Aufruf, damit ``database`` nicht beim Laden
+    ``requests`` und die ganze Versandschicht mitzieht.
+    """
+    from notifiers import invalidate_notifier
+    invalidate_notifier(int(channel_id))
 
 
 def get_product_overrides():
@@ -348,7 +613,7 @@ def delete_product_override(product_id):
 
 
 def add_log_entry(product_name, notification_type, channel_name, message,
-                  success=True, key=None, args=None):
+                  success=True, key=None, args=None, conn=None):
     """Schreibt einen Eintrag ins Log der Oberflaeche.
 
     Args:
@@ -362,29 +627,33 @@ def add_log_entry(product_name, notification_type, channel_name, message,
     die dann eingestellt ist. Wer die Sprache wechselt, sieht auch alte
     Eintraege in der neuen Sprache.
     """
-    conn = get_db()
-    conn.execute(
-        "INSERT INTO notification_log (product_name, notification_type, "
-        "channel_name, message, success, message_key, message_args) "
-        "VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (product_name, notification_type, channel_name, message,
-         1 if success else 0, key,
-         json.dumps(args, ensure_ascii=False) if args else None)
-    )
-    conn.commit()
-    conn.close()
+    with _verbindung(conn) as c:
+        c.execute(
+            "INSERT INTO notification_log (product_name, notification_type, "
+            "channel_name, message, success, message_key, message_args) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (product_name, notification_type, channel_name, message,
+             1 if success else 0, key,
+             json.dumps(args, ensure_ascii=False) if args else None)
+        )
 
 
-def get_log(limit=100, lang=None):
+def get_log(limit=100, lang=None, after_id=None):
     """Log-Eintraege, uebersetzt in die eingestellte Sprache.
 
     Eintraege ohne Schluessel (Ausnahmetexte, Altbestand vor 1.7.0) kommen
     unveraendert zurueck: Ein deutscher Fehlertext ist besser als gar keiner.
+    ``after_id`` liefert nur Eintraege, die nach diesem angelegt wurden.
     """
     conn = get_db()
-    rows = conn.execute(
-        "SELECT * FROM notification_log ORDER BY timestamp DESC LIMIT ?", (limit,)
-    ).fetchall()
+    if after_id is not None:
+        rows = conn.execute(
+            "SELECT * FROM notification_log WHERE id > ? ORDER BY timestamp DESC LIMIT ?",
+            (after_id, limit)).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT * FROM notification_log ORDER BY timestamp DESC LIMIT ?", (limit,)
+        ).fetchall()
     conn.close()
 
     import sprache
@@ -431,30 +700,7 @@ def get_sync_map():
     return result
 
 
-def get_sync_entry(grocy_type, grocy_id):
-    conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM caldav_sync_map WHERE grocy_type = ? AND grocy_id = ?",
-        (grocy_type, grocy_id)
-    ).fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-
-def get_sync_entry_by_uid(caldav_uid):
-    conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM caldav_sync_map WHERE caldav_uid = ?",
-        (caldav_uid,)
-    ).fetchone()
-    conn.close()
-    return dict(row) if row else None
-
-
-def upsert_sync_entry(grocy_type, grocy_id, caldav_uid, status, summary=None, due=None, direction=''):
-    conn = get_db()
-    conn.execute(
-        """INSERT INTO caldav_sync_map (grocy_type, grocy_id, caldav_uid, last_status, last_summary, last_due, last_synced, sync_direction)
+_SYNC_UPSERT_SQL = """INSERT INTO caldav_sync_map (grocy_type, grocy_id, caldav_uid, last_status, last_summary, last_due, last_synced, sync_direction)
            VALUES (?, ?, ?, ?, ?, ?, datetime('now'), ?)
            ON CONFLICT(grocy_type, grocy_id) DO UPDATE SET
              caldav_uid=excluded.caldav_uid,
@@ -462,11 +708,20 @@ def upsert_sync_entry(grocy_type, grocy_id, caldav_uid, status, summary=None, du
              last_summary=excluded.last_summary,
              last_due=excluded.last_due,
              last_synced=datetime('now'),
-             sync_direction=excluded.sync_direction""",
-        (grocy_type, grocy_id, caldav_uid, status, summary, due, direction)
-    )
-    conn.commit()
-    conn.close()
+             sync_direction=excluded.sync_direction"""
+
+
+def upsert_sync_entry(grocy_type, grocy_id, caldav_uid, status, summary=None, due=None, direction=''):
+    upsert_sync_entries([(grocy_type, grocy_id, caldav_uid, status, summary, due, direction)])
+
+
+def upsert_sync_entries(entries, conn=None):
+    """Schreibt viele Sync-Map-Eintraege in einer Transaktion.
+
+    ``entries``: Tupel (grocy_type, grocy_id, caldav_uid, status, summary,
+    due, direction) -- dieselbe Reihenfolge wie bei ``upsert_sync_entry``.
+    """
+    return executemany(_SYNC_UPSERT_SQL, entries, conn=conn)
 
 
 def delete_sync_entry(grocy_type, grocy_id):
@@ -489,68 +744,545 @@ def get_tracker_entry(product_id, notification_type):
     return dict(row) if row else None
 
 
-def upsert_tracker_entry(product_id, notification_type, best_before_date):
+def get_tracker_entries():
+    """Alle Tracker-Eintraege als Dict: (product_id, notification_type) -> Eintrag."""
     conn = get_db()
-    existing = conn.execute(
-        "SELECT best_before_date, sent_count FROM notification_tracker WHERE product_id = ? AND notification_type = ?",
-        (str(product_id), notification_type)
-    ).fetchone()
-    if existing and existing['best_before_date'] == best_before_date:
+    rows = conn.execute("SELECT * FROM notification_tracker").fetchall()
+    conn.close()
+    return {(r['product_id'], r['notification_type']): dict(r) for r in rows}
+
+
+# Gleiches MHD: weiterzaehlen. Neues MHD: Zaehler beginnt von vorn. SQLite
+# wertet alle SET-Ausdruecke gegen die alte Zeile aus, der Vergleich sieht
+# also noch das bisherige Datum.
+_TRACKER_UPSERT_SQL = (
+    "INSERT INTO notification_tracker "
+    "(product_id, notification_type, best_before_date, sent_count, first_sent, last_sent) "
+    "VALUES (?, ?, ?, 1, datetime('now'), datetime('now')) "
+    "ON CONFLICT(product_id, notification_type) DO UPDATE SET "
+    "  sent_count = CASE WHEN best_before_date = excluded.best_before_date "
+    "               THEN sent_count + 1 ELSE 1 END, "
+    "  first_sent = CASE WHEN best_before_date = excluded.best_before_date "
+    "               THEN first_sent ELSE datetime('now') END, "
+    "  best_before_date = excluded.best_before_date, "
+    "  last_sent = datetime('now')"
+)
+
+
+def upsert_tracker_entry(product_id, notification_type, best_before_date, conn=None):
+    with _verbindung(conn) as c:
+        c.execute(_TRACKER_UPSERT_SQL,
+                  (str(product_id), notification_type, best_before_date))
+
+
+def cleanup_tracker(active_keys, conn=None):
+    """Entfernt Tracker-Eintraege fuer Produkte, die nicht mehr im Alert-Zustand sind."""
+    with _verbindung(conn) as c:
+        if not active_keys:
+            c.execute("DELETE FROM notification_tracker")
+            return
+        rows = c.execute("SELECT product_id, notification_type FROM notification_tracker").fetchall()
+        to_delete = [(r['product_id'], r['notification_type']) for r in rows
+                     if (r['product_id'], r['notification_type']) not in active_keys]
+        executemany(
+            "DELETE FROM notification_tracker WHERE product_id = ? AND notification_type = ?",
+            to_delete, conn=c)
+
+
+def update_tracker(active_keys, sent_alerts):
+    """Tracker nach einem Check fortschreiben -- in einer Transaktion.
+
+    Raeumt Eintraege ohne aktiven Alert ab und zaehlt die gesendeten hoch.
+    ``sent_alerts`` ist eine Liste von (product_id, notification_type,
+    best_before_date).
+    """
+    with transaction() as conn:
+        cleanup_tracker(active_keys, conn=conn)
+        executemany(_TRACKER_UPSERT_SQL,
+                    [(str(pid), ntype, bbd) for pid, ntype, bbd in sent_alerts],
+                    conn=conn)
+
+
+# ── Alert-Snapshot (inkrementeller Check) ─────────────────────────────
+
+def get_alert_snapshot():
+    """Letzter Alert-Stand: (product_id, type, best_before) -> Eintrag."""
+    conn = get_db()
+    rows = conn.execute("SELECT * FROM alert_snapshot").fetchall()
+    conn.close()
+    return {(r['product_id'], r['notification_type'], r['best_before_date']): dict(r)
+            for r in rows}
+
+
+def apply_alert_diff(diff, active_keys=None, conn=None):
+    """Schreibt die Zustandswechsel eines Checks in den Snapshot.
+
+    Args:
+        diff: Dict aus ``alert_rules.diff_alerts`` -- neue und geaenderte
+            Alerts werden eingetragen, erledigte Schluessel entfernt
+        active_keys: wenn angegeben, wird der Tracker im selben Zug
+            aufgeraeumt (Checks ohne Versand)
+    """
+    with _verbindung(conn) as c:
+        if active_keys is not None:
+            cleanup_tracker(active_keys, conn=c)
+        executemany(
+            "DELETE FROM alert_snapshot WHERE product_id = ? "
+            "AND notification_type = ? AND best_before_date = ?",
+            diff['resolved'], conn=c)
+        executemany(
+            "INSERT INTO alert_snapshot (product_id, notification_type, "
+            "best_before_date, name, detail) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(product_id, notification_type, best_before_date) DO UPDATE SET "
+            "  name = excluded.name, detail = excluded.detail",
+            [(a['product_id'], a['type'], a['best_before'] or '', a['name'], a['detail'])
+             for a in diff['new'] + diff['changed']], conn=c)
+
+
+def clear_alert_snapshot():
+    """Verwirft den Snapshot (Wechsel zurueck in den vollen Check)."""
+    conn = get_db()
+    leer = conn.execute("SELECT 1 FROM alert_snapshot LIMIT 1").fetchone() is None
+    conn.close()
+    if leer:
+        return  # der Regelfall -- ohne Schreibsperre und fsync
+    with transaction() as conn:
+        conn.execute("DELETE FROM alert_snapshot")
+
+
+# ── Benachrichtigungs-Outbox ──────────────────────────────────────────
+
+def enqueue_notifications(batch_id, channels, title, message, alerts, active_keys,
+                          diff=None):
+    """Legt die Meldung eines Checks fuer jeden Kanal in die Outbox.
+
+    Args:
+        channels: Liste von (channel_id, channel_name)
+        alerts: Liste von Dicts mit product_id, type, best_before, name, detail
+        active_keys: alle Alert-Schluessel des Checks -- fuer das Aufraeumen
+            des Trackers
+        diff: Zustandswechsel des inkrementellen Checks (siehe
+            ``apply_alert_diff``); wandern erst mit der ersten erfolgreichen
+            Zustellung in den Snapshot (``complete_outbox_entry``)
+
+    Noch wartende aeltere Zeilen derselben Kanaele werden ueberholt: Die neue
+    Meldung beschreibt den aktuellen Bestand, die alte waere nur noch ein
+    veralteter Zwischenstand. Zeilen, die gerade gesendet werden, bleiben
+    unberuehrt.
+    """
+    alerts_json = json.dumps(alerts, ensure_ascii=False)
+    diff_json = json.dumps(diff, ensure_ascii=False) if diff is not None else None
+    with transaction() as conn:
+        cleanup_tracker(active_keys, conn=conn)
+        if diff is None:
+            executemany(
+                "UPDATE notification_outbox SET status = 'superseded' "
+                "WHERE channel_id = ? AND status = 'pending'",
+                [(ch_id,) for ch_id, _ in channels], conn=conn)
+        # Inkrementell beschreibt jede Meldung nur ihre eigenen Wechsel; eine
+        # wartende aeltere ist kein Zwischenstand und bleibt stehen
+        executemany(
+            "INSERT INTO notification_outbox (batch_id, channel_id, channel_name, "
+            "title, message, alerts_json, diff_json) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(batch_id, ch_id, ch_name, title, message, alerts_json, diff_json)
+             for ch_id, ch_name in channels], conn=conn)
+
+
+def claim_due_outbox(stale_minutes=10):
+    """Reserviert die faelligen Zeilen -- hoechstens eine je Kanal.
+
+    Ein Kanal mit einer Zeile im Status ``sending`` bekommt keine zweite:
+    Damit sendet je Kanal immer nur ein Vorgang, auch ueber mehrere Prozesse
+    hinweg. Zeilen, die laenger als ``stale_minutes`` in ``sending`` haengen,
+    stammen von einem abgebrochenen Prozess und werden wieder freigegeben.
+    """
+    with transaction() as conn:
         conn.execute(
-            "UPDATE notification_tracker SET sent_count = sent_count + 1, last_sent = datetime('now') "
-            "WHERE product_id = ? AND notification_type = ?",
-            (str(product_id), notification_type)
-        )
-    else:
+            "UPDATE notification_outbox SET status = 'pending' "
+            "WHERE status = 'sending' AND claimed_at < datetime('now', ?)",
+            (f'-{int(stale_minutes)} minutes',))
+        rows = conn.execute(
+            "SELECT * FROM notification_outbox WHERE id IN ("
+            "  SELECT MIN(id) FROM notification_outbox"
+            "  WHERE status = 'pending' AND next_attempt_at <= datetime('now')"
+            "    AND channel_id NOT IN (SELECT channel_id FROM notification_outbox"
+            "                           WHERE status = 'sending')"
+            "  GROUP BY channel_id) ORDER BY id"
+        ).fetchall()
+        executemany(
+            "UPDATE notification_outbox SET status = 'sending', "
+            "claimed_at = datetime('now') WHERE id = ?",
+            [(r['id'],) for r in rows], conn=conn)
+    return [dict(r) for r in rows]
+
+
+def complete_outbox_entry(entry_id):
+    """Versand geglueckt: Zeile abschliessen, Log schreiben, Tracker zaehlen.
+
+    Der Tracker zaehlt einen Check einmal, nicht je Kanal -- also nur beim
+    ersten erfolgreich zugestellten Kanal des Checks. Dann wandern auch die
+    Zustandswechsel des inkrementellen Checks in den Snapshot: Scheitern
+    alle Kanaele, bleiben sie offen und der naechste Check meldet sie
+    erneut, statt sie stillschweigend zu verlieren. Alles in einer
+    Transaktion: Ein Absturz dazwischen laesst die Zeile in ``sending``,
+    sie wird spaeter erneut zugestellt statt doppelt gezaehlt.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT * FROM notification_outbox WHERE id = ?",
+                           (entry_id,)).fetchone()
+        if row is None:
+            return
         conn.execute(
-            "INSERT OR REPLACE INTO notification_tracker "
-            "(product_id, notification_type, best_before_date, sent_count, first_sent, last_sent) "
-            "VALUES (?, ?, ?, 1, datetime('now'), datetime('now'))",
-            (str(product_id), notification_type, best_before_date)
-        )
-    conn.commit()
+            "UPDATE notification_outbox SET status = 'sent', sent_at = datetime('now'), "
+            "attempts = attempts + 1, last_error = NULL WHERE id = ?", (entry_id,))
+        alerts = json.loads(row['alerts_json'] or '[]')
+        for a in alerts:
+            add_log_entry(a.get('name'), a.get('type'), row['channel_name'],
+                          a.get('detail'), success=True, conn=conn)
+        erste = conn.execute(
+            "SELECT COUNT(*) FROM notification_outbox "
+            "WHERE batch_id = ? AND status = 'sent'", (row['batch_id'],)).fetchone()[0] == 1
+        if erste:
+            executemany(_TRACKER_UPSERT_SQL,
+                        [(str(a['product_id']), a['type'], a.get('best_before', ''))
+                         for a in alerts], conn=conn)
+            if row['diff_json']:
+                apply_alert_diff(json.loads(row['diff_json']), conn=conn)
+
+
+def fail_outbox_entry(entry_id, error, retry_in=None, count_attempt=True):
+    """Versand gescheitert: neuer Versuch in ``retry_in`` Sekunden.
+
+    Ohne ``retry_in`` ist die Zeile endgueltig gescheitert (``dead``) und
+    bleibt zur Ansicht in der Outbox stehen. ``count_attempt=False`` fuer
+    Pausen, die der Dienst selbst verlangt hat (Sendegrenze) -- sie zaehlen
+    nicht gegen die Hoechstzahl an Versuchen.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT * FROM notification_outbox WHERE id = ?",
+                           (entry_id,)).fetchone()
+        if row is None:
+            return
+        if retry_in is None:
+            conn.execute(
+                "UPDATE notification_outbox SET status = 'dead', "
+                "attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (str(error), entry_id))
+            add_log_entry(None, 'error', row['channel_name'], str(error),
+                          success=False, key='log.outbox_dead',
+                          args={'attempts': row['attempts'] + 1, 'error': str(error)},
+                          conn=conn)
+        else:
+            conn.execute(
+                "UPDATE notification_outbox SET status = 'pending', "
+                "attempts = attempts + ?, last_error = ?, "
+                "next_attempt_at = datetime('now', ?) WHERE id = ?",
+                (1 if count_attempt else 0, str(error),
+                 f'+{int(retry_in)} seconds', entry_id))
+            add_log_entry(None, 'error', row['channel_name'], str(error),
+                          success=False, conn=conn)
+
+
+def get_outbox(limit=100):
+    """Offene und gescheiterte Zeilen der Outbox, neueste zuerst."""
+    conn = get_db()
+    rows = conn.execute(
+        "SELECT id, batch_id, channel_id, channel_name, title, status, attempts, "
+        "next_attempt_at, last_error, created_at FROM notification_outbox "
+        "WHERE status IN ('pending', 'sending', 'dead') "
+        "ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
     conn.close()
+    return [dict(r) for r in rows]
 
 
-def cleanup_tracker(active_keys):
-    """Entfernt Tracker-Eintraege fuer Produkte, die nicht mehr im Alert-Zustand sind."""
-    if not active_keys:
-        conn = get_db()
-        conn.execute("DELETE FROM notification_tracker")
-        conn.commit()
-        conn.close()
-        return
+def retry_outbox_entry(entry_id):
+    """Stellt eine gescheiterte Zeile erneut zu -- mit frischem Versuchszaehler."""
+    with transaction() as conn:
+        return conn.execute(
+            "UPDATE notification_outbox SET status = 'pending', attempts = 0, "
+            "next_attempt_at = datetime('now') WHERE id = ? AND status = 'dead'",
+            (entry_id,)).rowcount
+
+
+def purge_outbox(days=30):
+    """Entfernt abgeschlossene Zeilen, die aelter als ``days`` Tage sind."""
+    with transaction() as conn:
+        return conn.execute(
+            "DELETE FROM notification_outbox "
+            "WHERE status IN ('sent', 'superseded', 'dead') "
+            "AND created_at < datetime('now', ?)", (f'-{int(days)} days',)).rowcount
+
+
+# ── Job-Warteschlange ─────────────────────────────────────────────────
+
+def _job(row):
+    job = dict(row)
+    job['payload'] = json.loads(job.pop('payload_json') or '{}')
+    result = job.pop('result_json')
+    job['result'] = json.loads(result) if result else None
+    return job
+
+
+def enqueue_job(kind, payload=None, source='manual'):
+    """Legt einen Auftrag fuer den Worker ab.
+
+    Wartet oder laeuft schon ein Auftrag derselben Art mit denselben Daten,
+    wird kein zweiter angelegt -- ein doppelter Klick auf "Jetzt
+    synchronisieren" ergibt einen Sync, ebenso ein Klick waehrend des
+    geplanten Laufs. ``source`` (``manual`` oder ``schedule``) zaehlt dabei
+    nicht mit.
+
+    Returns:
+        (job_id, neu) -- ``neu`` ist False, wenn ein vorhandener Auftrag
+        zurueckkommt.
+    """
+    payload_json = json.dumps(payload or {}, ensure_ascii=False, sort_keys=True)
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT id FROM job_queue WHERE kind = ? AND payload_json = ? "
+            "AND status IN ('queued', 'running') ORDER BY id LIMIT 1",
+            (kind, payload_json)).fetchone()
+        if row:
+            return row['id'], False
+        return conn.execute(
+            "INSERT INTO job_queue (kind, payload_json, source) VALUES (?, ?, ?)",
+            (kind, payload_json, source)).lastrowid, True
+
+
+def claim_next_job(worker, stale_minutes=30):
+    """Reserviert den aeltesten wartenden Auftrag (oder liefert None).
+
+    Je Art laeuft hoechstens ein Auftrag: Arten mit einem laufenden Auftrag
+    werden uebersprungen, auch wenn der in einem anderen Worker laeuft.
+
+    Auftraege, die laenger als ``stale_minutes`` laufen, stammen von einem
+    abgestuerzten Worker. Sie gelten als gescheitert und werden nicht
+    wiederholt -- ein halb gelaufener Sync soll nicht doppelt laufen.
+    """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE job_queue SET status = 'failed', error = 'Worker abgebrochen', "
+            "finished_at = datetime('now') "
+            "WHERE status = 'running' AND started_at < datetime('now', ?)",
+            (f'-{int(stale_minutes)} minutes',))
+        row = conn.execute(
+            "SELECT * FROM job_queue WHERE status = 'queued' AND kind NOT IN ("
+            "  SELECT kind FROM job_queue WHERE status = 'running') "
+            "ORDER BY id LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE job_queue SET status = 'running', worker = ?, "
+            "started_at = datetime('now') WHERE id = ?", (worker, row['id']))
+        job = _job(row)
+        job['status'] = 'running'
+        return job
+
+
+def update_job_phase(job_id, phase, progress=None):
+    """Traegt Phase und Fortschritt (0..1 oder None) eines laufenden Auftrags ein."""
+    with transaction() as conn:
+        conn.execute("UPDATE job_queue SET phase = ?, progress = ? WHERE id = ?",
+                     (phase, progress, job_id))
+
+
+def finish_job(job_id, result=None, error=None):
+    """Schliesst einen Auftrag ab: ``done`` mit Ergebnis oder ``failed``."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE job_queue SET status = ?, result_json = ?, error = ?, "
+            "progress = CASE WHEN ? IS NULL THEN 1 ELSE progress END, "
+            "finished_at = datetime('now') WHERE id = ?",
+            ('failed' if error is not None else 'done',
+             json.dumps(result, ensure_ascii=False, default=str)
+             if result is not None else None,
+             str(error) if error is not None else None,
+             str(error) if error is not None else None, job_id))
+
+
+def get_job(job_id):
+    conn = get_db()
+    row = conn.execute("SELECT * FROM job_queue WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    return _job(row) if row else None
+
+
+def get_jobs(limit=20, kind=None):
+    """Die juengsten Auftraege, neueste zuerst."""
+    conn = get_db()
+    if kind:
+        rows = conn.execute("SELECT * FROM job_queue WHERE kind = ? ORDER BY id DESC LIMIT ?",
+                            (kind, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM job_queue ORDER BY id DESC LIMIT ?",
+                            (limit,)).fetchall()
+    conn.close()
+    return [_job(r) for r in rows]
+
+
+def purge_jobs(days=7):
+    """Entfernt abgeschlossene Auftraege, die aelter als ``days`` Tage sind."""
+    with transaction() as conn:
+        return conn.execute(
+            "DELETE FROM job_queue WHERE status IN ('done', 'failed') "
+            "AND created_at < datetime('now', ?)", (f'-{int(days)} days',)).rowcount
+
+
+# ── Job-Laufzeiten ────────────────────────────────────────────────────
+
+def save_job_run(run):
+    """Speichert einen Lauf aus ``jobruns.JobRun.as_dict()``."""
+    with transaction() as conn:
+        return conn.execute(
+            "INSERT INTO job_runs (job, source, status, error, started_at, "
+            "duration_ms, phases_json, counts_json, reads_json) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run['job'], run['source'], run['status'], run['error'], run['started_at'],
+             run['duration_ms'], json.dumps(run['phases']),
+             json.dumps(run['counts']), json.dumps(run.get('reads', [])))).lastrowid
+
+
+def get_job_runs(limit=50, job=None):
+    """Die juengsten Laeufe, neueste zuerst (``job`` filtert)."""
+    conn = get_db()
+    if job:
+        rows = conn.execute("SELECT * FROM job_runs WHERE job = ? ORDER BY id DESC LIMIT ?",
+                            (job, limit)).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM job_runs ORDER BY id DESC LIMIT ?",
+                            (limit,)).fetchall()
+    conn.close()
+    runs = []
+    for row in rows:
+        run = dict(row)
+        run['phases'] = json.loads(run.pop('phases_json') or '{}')
+        run['counts'] = json.loads(run.pop('counts_json') or '{}')
+        run['reads'] = json.loads(run.pop('reads_json') or '[]')
+        runs.append(run)
+    return runs
+
+
+def get_change_marks():
+    """Merkmale, an denen die Live-Meldungen (``events.py``) Aenderungen erkennen.
+
+    Eine Verbindung, nur Index- und Aggregatabfragen -- laeuft im Sekundentakt.
+
+    Returns:
+        dict mit ``log`` und ``runs`` (hoechste ID), ``views`` (Name ->
+        [Version, Abrufzeit]), ``caldav`` und ``bring`` (Stand des Abgleichs)
+        und ``jobs`` (ID -> [Status, Phase, Fortschritt] der offenen und eben
+        beendeten Auftraege)
+    """
     conn = get_db()
-    rows = conn.execute("SELECT product_id, notification_type FROM notification_tracker").fetchall()
-    to_delete = [(r['product_id'], r['notification_type']) for r in rows
-                 if (r['product_id'], r['notification_type']) not in active_keys]
-    for pid, ntype in to_delete:
+    try:
+        log = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notification_log").fetchone()[0]
+        runs = conn.execute("SELECT COALESCE(MAX(id), 0) FROM job_runs").fetchone()[0]
+        views = {r['name']: [r['version'], r['fetched_at']] for r in conn.execute(
+            "SELECT name, version, fetched_at FROM materialized_views")}
+        caldav = dict(conn.execute(
+            "SELECT COALESCE(SUM(grocy_type = 'task'), 0) AS tasks_synced, "
+            "COALESCE(SUM(grocy_type = 'chore'), 0) AS chores_synced, "
+            "COUNT(*) AS total_synced, MAX(last_synced) AS last_sync "
+            "FROM caldav_sync_map").fetchone())
+        bring = dict(conn.execute(
+            "SELECT COUNT(*) AS items_synced, MAX(last_synced) AS last_sync "
+            "FROM bring_sync_map").fetchone())
+        jobs = {r['id']: [r['status'], r['phase'], r['progress']] for r in conn.execute(
+            "SELECT id, status, phase, progress FROM job_queue "
+            "WHERE status IN ('queued', 'running') "
+            "   OR finished_at >= datetime('now', '-2 minutes')")}
+    finally:
+        conn.close()
+    return {'log': log, 'runs': runs, 'views': views, 'caldav': caldav,
+            'bring': bring, 'jobs': jobs}
+
+
+def purge_job_runs(days=30):
+    """Entfernt Laeufe, die aelter als ``days`` Tage sind."""
+    with transaction() as conn:
+        return conn.execute("DELETE FROM job_runs WHERE started_at < datetime('now', ?)",
+                            (f'-{int(days)} days',)).rowcount
+
+
+# ── Vorberechnete Antworten (dashboard.py) ────────────────────────────
+
+def _materialized_view(row):
+    view = dict(row)
+    view['params'] = json.loads(view.pop('params_json') or '{}')
+    if 'data_json' in view:
+        view['data'] = json.loads(view.pop('data_json'))
+    return view
+
+
+def save_materialized_view(name, data, params=None, fetched_at=None):
+    """Legt eine vorberechnete Antwort ab und liefert sie samt Version.
+
+    Die Version steigt nur, wenn sich der Inhalt geaendert hat;
+    ``refreshed_at`` und ``fetched_at`` (Stand der Grocy-Daten) werden
+    immer aktualisiert.
+    """
+    import hashlib
+    data_json = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(data_json.encode('utf-8')).hexdigest()[:16]
+    with transaction() as conn:
         conn.execute(
-            "DELETE FROM notification_tracker WHERE product_id = ? AND notification_type = ?",
-            (pid, ntype)
-        )
-    if to_delete:
-        conn.commit()
+            "INSERT INTO materialized_views (name, version, digest, params_json, "
+            "data_json, fetched_at, refreshed_at) VALUES (?, 1, ?, ?, ?, ?, datetime('now')) "
+            "ON CONFLICT(name) DO UPDATE SET "
+            "  version = version + (digest != excluded.digest), "
+            "  digest = excluded.digest, params_json = excluded.params_json, "
+            "  data_json = excluded.data_json, fetched_at = excluded.fetched_at, "
+            "  refreshed_at = excluded.refreshed_at",
+            (name, digest, json.dumps(params or {}, sort_keys=True), data_json, fetched_at))
+        row = conn.execute("SELECT * FROM materialized_views WHERE name = ?",
+                           (name,)).fetchone()
+    return _materialized_view(row)
+
+
+def get_materialized_view(name, with_data=True):
+    """Die abgelegte Antwort ``name`` -- oder None, wenn es noch keine gibt.
+
+    ``with_data=False`` liest nur Version, Digest und Zeitpunkte -- fuer
+    Zwischenspeicher, die den Inhalt nur bei neuer Version brauchen.
+    """
+    spalten = '*' if with_data else \
+        'name, version, digest, params_json, fetched_at, refreshed_at'
+    conn = get_db()
+    row = conn.execute(f"SELECT {spalten} FROM materialized_views WHERE name = ?",
+                       (name,)).fetchone()
     conn.close()
+    return _materialized_view(row) if row else None
 
 
 # ── Kassenbon-Funktionen ──────────────────────────────────────────────
 
 def save_receipt(filename, filepath, status='pending_review', extraction_method=None,
                  store_name=None, receipt_date=None, total_amount=None, raw_text=None,
-                 error_message=None):
-    conn = get_db()
-    cursor = conn.execute(
-        """INSERT INTO receipts (filename, filepath, status, extraction_method,
-           store_name, receipt_date, total_amount, raw_text, error_message)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (filename, filepath, status, extraction_method, store_name, receipt_date,
-         total_amount, raw_text, error_message)
-    )
-    receipt_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return receipt_id
+                 error_message=None, conn=None):
+    with _verbindung(conn) as c:
+        cursor = c.execute(
+            """INSERT INTO receipts (filename, filepath, status, extraction_method,
+               store_name, receipt_date, total_amount, raw_text, error_message)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (filename, filepath, status, extraction_method, store_name, receipt_date,
+             total_amount, raw_text, error_message)
+        )
+        return cursor.lastrowid
+
+
+def save_receipt_with_items(items, **receipt):
+    """Legt Bon und Positionen in einer Transaktion an. Liefert die Bon-ID.
+
+    Ein Absturz zwischen beiden Schritten hinterliess bisher einen Bon ohne
+    Positionen, der als bereits verarbeitet galt und nie wieder angefasst wurde.
+    """
+    with transaction() as conn:
+        receipt_id = save_receipt(conn=conn, **receipt)
+        if items:
+            save_receipt_items(receipt_id, items, conn=conn)
+        return receipt_id
 
 
 def get_receipts():
@@ -577,51 +1309,53 @@ def get_receipt(receipt_id):
     return receipt
 
 
-def update_receipt_status(receipt_id, status, error_message=None):
-    conn = get_db()
-    if status == 'confirmed':
-        conn.execute(
-            "UPDATE receipts SET status = ?, confirmed_at = datetime('now') WHERE id = ?",
-            (status, receipt_id)
-        )
-    elif error_message:
-        conn.execute(
-            "UPDATE receipts SET status = ?, error_message = ? WHERE id = ?",
-            (status, error_message, receipt_id)
-        )
-    else:
-        conn.execute(
-            "UPDATE receipts SET status = ? WHERE id = ?",
-            (status, receipt_id)
-        )
-    conn.commit()
-    conn.close()
+def update_receipt_status(receipt_id, status, error_message=None, conn=None):
+    with _verbindung(conn) as c:
+        if status == 'confirmed':
+            c.execute(
+                "UPDATE receipts SET status = ?, confirmed_at = datetime('now') WHERE id = ?",
+                (status, receipt_id)
+            )
+        elif error_message:
+            c.execute(
+                "UPDATE receipts SET status = ?, error_message = ? WHERE id = ?",
+                (status, error_message, receipt_id)
+            )
+        else:
+            c.execute(
+                "UPDATE receipts SET status = ? WHERE id = ?",
+                (status, receipt_id)
+            )
+
+
+def reprocess_receipt_result(receipt_id, status, error_message, items):
+    """Status und neue Positionen eines erneut gelesenen Bons -- ein Commit."""
+    with transaction() as conn:
+        update_receipt_status(receipt_id, status, error_message, conn=conn)
+        if items:
+            save_receipt_items(receipt_id, items, conn=conn)
 
 
 def delete_receipt(receipt_id):
-    conn = get_db()
-    conn.execute("DELETE FROM receipt_items WHERE receipt_id = ?", (receipt_id,))
-    conn.execute("DELETE FROM receipts WHERE id = ?", (receipt_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM receipt_items WHERE receipt_id = ?", (receipt_id,))
+        conn.execute("DELETE FROM receipts WHERE id = ?", (receipt_id,))
 
 
-def save_receipt_items(receipt_id, items):
-    conn = get_db()
-    conn.execute("DELETE FROM receipt_items WHERE receipt_id = ?", (receipt_id,))
-    for item in items:
-        conn.execute(
+def save_receipt_items(receipt_id, items, conn=None):
+    with _verbindung(conn) as c:
+        c.execute("DELETE FROM receipt_items WHERE receipt_id = ?", (receipt_id,))
+        executemany(
             """INSERT INTO receipt_items (receipt_id, raw_name, quantity, unit_price,
                total_price, tax_category, matched_product_id, matched_product_name,
                match_score, match_source)
                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (receipt_id, item.get('raw_name', ''), item.get('quantity', 1),
-             item.get('unit_price'), item.get('total_price'), item.get('tax_category'),
-             item.get('matched_product_id'), item.get('matched_product_name'),
-             item.get('match_score'), item.get('match_source'))
-        )
-    conn.commit()
-    conn.close()
+            [(receipt_id, item.get('raw_name', ''), item.get('quantity', 1),
+              item.get('unit_price'), item.get('total_price'), item.get('tax_category'),
+              item.get('matched_product_id'), item.get('matched_product_name'),
+              item.get('match_score'), item.get('match_source'))
+             for item in items],
+            conn=c)
 
 
 def update_receipt_item(item_id, matched_product_id, matched_product_name,
@@ -731,31 +1465,50 @@ def get_bring_sync_entry(grocy_product_id):
     return dict(row) if row else None
 
 
-def upsert_bring_sync_entry(grocy_product_id, bring_item_uuid, bring_item_name, last_spec=None):
-    conn = get_db()
-    conn.execute(
-        """INSERT INTO bring_sync_map
+_BRING_UPSERT_SQL = """INSERT INTO bring_sync_map
            (grocy_product_id, bring_item_uuid, bring_item_name, last_spec, last_synced)
            VALUES (?, ?, ?, ?, datetime('now'))
            ON CONFLICT(grocy_product_id) DO UPDATE SET
              bring_item_uuid = excluded.bring_item_uuid,
              bring_item_name = excluded.bring_item_name,
              last_spec = excluded.last_spec,
-             last_synced = datetime('now')""",
-        (int(grocy_product_id), bring_item_uuid, bring_item_name, last_spec)
-    )
-    conn.commit()
-    conn.close()
+             last_synced = datetime('now')"""
 
 
-def delete_bring_sync_entry(grocy_product_id):
-    conn = get_db()
-    conn.execute(
+def upsert_bring_sync_entry(grocy_product_id, bring_item_uuid, bring_item_name,
+                            last_spec=None, conn=None):
+    upsert_bring_sync_entries(
+        [(grocy_product_id, bring_item_uuid, bring_item_name, last_spec)], conn=conn)
+
+
+def upsert_bring_sync_entries(entries, conn=None):
+    """Viele Eintraege (product_id, uuid, name, spec) mit einer Anweisung."""
+    return executemany(
+        _BRING_UPSERT_SQL,
+        [(int(pid), uuid, name, spec) for pid, uuid, name, spec in entries],
+        conn=conn)
+
+
+def delete_bring_sync_entry(grocy_product_id, conn=None):
+    delete_bring_sync_entries([grocy_product_id], conn=conn)
+
+
+def delete_bring_sync_entries(grocy_product_ids, conn=None):
+    return executemany(
         "DELETE FROM bring_sync_map WHERE grocy_product_id = ?",
-        (int(grocy_product_id),)
-    )
-    conn.commit()
-    conn.close()
+        [(int(pid),) for pid in grocy_product_ids], conn=conn)
+
+
+def apply_bring_sync_changes(upserts, deletes):
+    """Zieht die sync_map nach einem Bring-Sync nach -- ein Commit je Sync.
+
+    ``upserts``: Tupel (product_id, uuid, name, spec), ``deletes``: Produkt-IDs.
+    """
+    if not upserts and not deletes:
+        return
+    with transaction() as conn:
+        delete_bring_sync_entries(deletes, conn=conn)
+        upsert_bring_sync_entries(upserts, conn=conn)
 
 
 def clear_bring_sync_map():
@@ -0,0 +1,233 @@
+"""Live-Meldungen an die Oberflaeche (Server-Sent Events).
+
+Bis 1.7.x holte die Oberflaeche jeden Stand per REST ab -- beim Seitenwechsel,
+nach jedem Knopfdruck und im Sekundentakt, solange ein Auftrag lief. Jeder
+offene Tab fragte fuer sich.
+
+``/api/events`` haelt jetzt eine Verbindung offen und schickt Aenderungen,
+sobald sie in der Datenbank stehen:
+
+- ``dashboard``: neue vorberechnete Dashboard-Antwort (``dashboard.py``),
+  komplett mit ``snapshot``
+- ``products``: die Produktliste hat eine neue Version (nur der Stand, die
+  Liste selbst holt die Seite bei Bedarf)
+- ``log``: neue Log-Eintraege; ``reset`` nach dem Leeren
+- ``runs``: neue Job-Laeufe (``job_runs``)
+- ``sync``: Stand des CalDAV- und Bring-Abgleichs (Anzahl, letzter Abgleich)
+- ``jobs``: Auftraege, deren Status, Phase oder Fortschritt sich geaendert hat
+- ``resync``: Meldungen sind verloren gegangen, die Seite laedt neu
+
+Die Aenderungen schreibt der Worker -- oft in einem anderen Prozess. Deshalb
+fragt je Webprozess **ein** Thread die Merkmale aus
+``database.get_change_marks`` ab, berechnet bei einer Aenderung die Meldung
+einmal und verteilt den fertigen Text an alle offenen Verbindungen. Zehn Tabs
+kosten damit dieselbe Abfrage wie einer, und keiner fragt Grocy. Ohne
+Verbindung schlaeft der Thread nicht, er endet.
+
+Jede Meldung traegt eine ID aus Prozesskennung und Zaehler. Eine abgerissene
+Verbindung bekommt nach dem Wiederverbinden (``Last-Event-ID``) nachgereicht,
+was sie verpasst hat -- oder ``resync``, wenn das nicht mehr geht.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from database import (
+    get_change_marks, get_log, get_job_runs, get_job, get_materialized_view,
+)
+import dashboard
+from worker import job_view
+
+logger = logging.getLogger(__name__)
+
+# Takt, in dem der Verteiler nach Aenderungen sieht
+POLL_SECONDS = 1.0
+
+# Kommentarzeile gegen Proxys, die stille Verbindungen schliessen
+HEARTBEAT_SECONDS = 15
+
+# Nach dieser Zeit endet ein Stream; der Browser verbindet sich von selbst
+# neu und bekommt Verpasstes nachgereicht. Gibt den Gunicorn-Thread frei.
+STREAM_MAX_SECONDS = 300
+
+# Wartezeit des Browsers vor dem Wiederverbinden
+RETRY_MS = 3000
+
+# So viele Meldungen haelt der Verteiler zum Nachreichen vor
+HISTORY = 200
+
+# Jede Verbindung belegt einen Gunicorn-Thread (docker/entrypoint.sh:
+# GUNICORN_THREADS); darueber antwortet /api/events mit 503, die Seite
+# faellt auf Abfragen zurueck
+MAX_SUBSCRIBERS = int(os.environ.get('GROCYLINK_SSE_MAX_CLIENTS', 8))
+
+# Meldungen, die ein langsamer Client hoechstens zurueckliegen darf
+QUEUE_SIZE = 100
+
+
+class TooManySubscribers(Exception):
+    """Alle Plaetze fuer Live-Verbindungen sind belegt."""
+
+
+def _text(event_id, name, data):
+    return (f"id: {event_id}\nevent: {name}\n"
+            f"data: {json.dumps(data, ensure_ascii=False, default=str)}\n\n")
+
+
+class EventHub:
+    """Verteilt die Aenderungen der Datenbank an alle offenen Streams."""
+
+    def __init__(self, poll_seconds=POLL_SECONDS, max_subscribers=MAX_SUBSCRIBERS):
+        self.poll_seconds = poll_seconds
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._abos = set()
+        self._thread = None
+        self._marken = None
+        self._kennung = uuid.uuid4().hex[:8]
+        self._zaehler = 0
+        self._verlauf = deque(maxlen=HISTORY)  # (Zaehler, Text)
+
+    # ── Abonnenten ────────────────────────────────────────────────────
+
+    def subscribe(self, last_event_id=None):
+        """Meldet einen Stream an und liefert seine Warteschlange.
+
+        Raises:
+            TooManySubscribers: ``max_subscribers`` ist erreicht
+        """
+        abo = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            if len(self._abos) >= self.max_subscribers:
+                raise TooManySubscribers()
+            if self._marken is None:
+                # Ausgangsstand: was jetzt in der Datenbank steht, hat die
+                # Seite schon per REST geladen
+                self._marken = get_change_marks()
+            for text in self._nachzureichen(last_event_id):
+                abo.put_nowait(text)
+            self._abos.add(abo)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._laufen, name='sse-hub',
+                                                daemon=True)
+                self._thread.start()
+        return abo
+
+    def unsubscribe(self, abo):
+        with self._lock:
+            self._abos.discard(abo)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._abos)
+
+    def _nachzureichen(self, last_event_id):
+        if not last_event_id:
+            return []
+        kennung, _, zaehler = last_event_id.partition('-')
+        if kennung != self._kennung or not zaehler.isdigit():
+            # Anderer Prozess oder Neustart: Stand unbekannt
+            return [self._resync_text()]
+        zaehler = int(zaehler)
+        if self._verlauf and self._verlauf[0][0] > zaehler + 1:
+            return [self._resync_text()]
+        return [text for n, text in self._verlauf if n > zaehler]
+
+    def _resync_text(self):
+        return _text(f"{self._kennung}-{self._zaehler}", 'resync', {})
+
+    # ── Verteilen ─────────────────────────────────────────────────────
+
+    def publish(self, name, data):
+        """Verschickt eine Meldung an alle Streams; der Text entsteht einmal."""
+        with self._lock:
+            self._zaehler += 1
+            text = _text(f"{self._kennung}-{self._zaehler}", name, data)
+            self._verlauf.append((self._zaehler, text))
+            for abo in list(self._abos):
+                try:
+                    abo.put_nowait(text)
+                except queue.Full:
+                    # Client haengt hinterher: verwerfen und neu laden lassen
+                    while not abo.empty():
+                        abo.get_nowait()
+                    abo.put_nowait(self._resync_text())
+
+    def _laufen(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self._lock:
+                if not self._abos:
+                    self._thread = None
+                    self._marken = None
+                    return
+            try:
+                self.tick()
+            except Exception as e:
+                logger.warning(f"Live-Meldungen: Abfrage fehlgeschlagen: {e}")
+
+    def tick(self):
+        """Vergleicht die Merkmale mit dem letzten Stand und verschickt die Unterschiede."""
+        neu = get_change_marks()
+        alt, self._marken = self._marken or neu, neu
+        for name, data in self._unterschiede(alt, neu):
+            self.publish(name, data)
+
+    def _unterschiede(self, alt, neu):
+        views_alt, views_neu = alt['views'], neu['views']
+        if views_neu.get('status') != views_alt.get('status'):
+            view = get_materialized_view('status')
+            if view is not None:
+                yield 'dashboard', dict(view['data'], snapshot=dashboard.snapshot_info(view))
+        if views_neu.get('products') != views_alt.get('products'):
+            view = get_materialized_view('products')
+            if view is not None:
+                yield 'products', {'snapshot': dashboard.snapshot_info(view)}
+
+        if neu['log'] < alt['log']:
+            yield 'log', {'reset': True, 'entries': []}
+        elif neu['log'] > alt['log']:
+            yield 'log', {'reset': False, 'entries': get_log(limit=200, after_id=alt['log'])}
+
+        if neu['runs'] > alt['runs']:
+            yield 'runs', {'runs': [r for r in get_job_runs(50) if r['id'] > alt['runs']]}
+
+        if neu['caldav'] != alt['caldav'] or neu['bring'] != alt['bring']:
+            yield 'sync', {'caldav': neu['caldav'], 'bring': neu['bring']}
+
+        geaendert = [job_id for job_id, stand in neu['jobs'].items()
+                     if alt['jobs'].get(job_id) != stand]
+        jobs = [job_view(job) for job in map(get_job, sorted(geaendert)) if job]
+        if jobs:
+            yield 'jobs', {'jobs': jobs}
+
+
+def stream(hub, abo, max_seconds=STREAM_MAX_SECONDS, heartbeat=HEARTBEAT_SECONDS):
+    """Der Text eines Streams: Meldungen aus ``abo``, dazwischen Lebenszeichen."""
+    ende = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            rest = ende - time.monotonic()
+            if rest <= 0:
+                return
+            try:
+                yield abo.get(timeout=min(heartbeat, rest))
+            except queue.Empty:
+                yield ": ping\n\n"
+    finally:
+        hub.unsubscribe(abo)
+
+
+_hub = EventHub()
+
+
+def get_hub():
+    """Der Verteiler dieses Prozesses."""
+    return _hub
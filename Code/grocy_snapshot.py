@@ -0,0 +1,214 @@
+"""Ein Grocy-Abruf je Zyklus fuer alle Hintergrund-Jobs.
+
+Check, Weckruf-Abgleich, Bring-Sync, CalDAV-Sync und Kassenbon-Ordner bauen
+bis 1.7.x je ihren eigenen ``GrocyClient`` und holen Produkte, Bestand,
+Mengeneinheiten oder Aufgaben selbst -- oft innerhalb derselben Minute.
+Liegen die Jobs beieinander, fragt Grocylink denselben Stand vier Mal ab.
+
+Dieses Modul haelt je Grocy-Objekt (``stock``, ``products`` ...) den zuletzt
+geholten Stand. Wer innerhalb von ``SNAPSHOT_MAX_AGE_SECONDS`` danach fragt,
+bekommt ihn ohne neuen Request:
+
+    products = snapshot_data('products', 'bring_sync', client)
+
+- **Versioniert**: Jeder Stand traegt eine Versionsnummer, die nur steigt,
+  wenn sich der Inhalt geaendert hat (``digest``). Eine erneute Abfrage mit
+  gleichem Ergebnis behaelt die Version.
+- **Unveraenderlich**: Dicts und Listen im Stand werfen bei Schreibzugriffen
+  ``TypeError`` -- ein Job kann dem naechsten nichts unterschieben. Wer
+  aendern will, kopiert (``dict(p)``, ``list(rows)``).
+- **Nachvollziehbar**: Jeder Zugriff wird mit Job, Objekt, Version und "aus
+  dem Zwischenspeicher oder frisch" festgehalten -- im Speicher
+  (``reads()``) und beim Lauf in ``job_runs`` (Spalte ``reads_json``).
+- **Frisch auf Knopfdruck**: Auftraege aus der Oberflaeche ("Jetzt
+  pruefen") holen immer neu -- und frischen damit den Stand fuer alle auf.
+
+Der Stand lebt im Speicher des Prozesses, der die Jobs ausfuehrt (Leader
+bzw. Worker, siehe ``worker.py``). Wer selbst nach Grocy schreibt, ruft
+danach ``invalidate()`` fuer die betroffenen Objekte auf.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+from grocy_client import GrocyClient
+from jobruns import count, current_run
+
+logger = logging.getLogger(__name__)
+
+# Ein Zyklus: So lange gilt ein geholter Stand fuer alle Jobs. Entspricht
+# dem groessten Jitter der geplanten Jobs (worker.JOBS).
+SNAPSHOT_MAX_AGE_SECONDS = 120
+
+# So viele Zugriffe merkt sich ``reads()``
+READ_HISTORY = 200
+
+# Objekt -> Abruf ueber den GrocyClient (Parameter als Schluesselwoerter)
+ENTITIES = {
+    'stock': lambda client: client.get_all_stock(),
+    'volatile': lambda client, due_soon_days=5: client.get_volatile_stock(
+        due_soon_days=due_soon_days),
+    'products': lambda client: client.get_all_products(),
+    'quantity_units': lambda client: client.get_quantity_units(),
+    'product_groups': lambda client: client.get_product_groups(),
+    'locations': lambda client: client.get_locations(),
+    'shopping_list': lambda client: client.get_shopping_list(),
+    'tasks': lambda client: client.get_all_tasks_including_done(),
+    'chores': lambda client: client.get_chores(),
+}
+
+SnapshotView = namedtuple('SnapshotView', 'entity params version digest fetched_at data')
+
+
+def _nur_lesen(self, *args, **kwargs):
+    raise TypeError("Grocy-Snapshot ist unveraenderlich -- vorher kopieren")
+
+
+class _FrozenDict(dict):
+    __setitem__ = __delitem__ = __ior__ = _nur_lesen
+    clear = pop = popitem = setdefault = update = _nur_lesen
+
+
+class _FrozenList(list):
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _nur_lesen
+    append = extend = insert = pop = remove = clear = sort = reverse = _nur_lesen
+
+
+def _einfrieren(wert):
+    if isinstance(wert, dict):
+        return _FrozenDict((k, _einfrieren(v)) for k, v in wert.items())
+    if isinstance(wert, (list, tuple)):
+        return _FrozenList(_einfrieren(v) for v in wert)
+    return wert
+
+
+def _digest(daten):
+    roh = json.dumps(daten, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(roh.encode('utf-8')).hexdigest()[:16]
+
+
+def _jetzt():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class GrocySnapshot:
+    """Zwischenspeicher der Grocy-Objekte fuer einen Zyklus."""
+
+    def __init__(self, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._eintraege = {}   # (entity, params) -> (SnapshotView, monotonic)
+        self._quelle = None    # (url, api_key) des Standes
+        self._versionen = {}   # entity -> zuletzt vergebene Version
+        self._reads = deque(maxlen=READ_HISTORY)
+
+    def get(self, entity, consumer, client=None, fresh=None, **params):
+        """Liefert den Stand eines Objekts als ``SnapshotView``.
+
+        Args:
+            entity: Schluessel aus ``ENTITIES``
+            consumer: Name des lesenden Jobs (fuer ``reads()``)
+            client: ``GrocyClient`` fuer einen noetigen Abruf (Standard: aus
+                den Einstellungen)
+            fresh: True holt in jedem Fall neu; None (Standard) holt neu,
+                wenn ein Auftrag aus der Oberflaeche laeuft
+            **params: Parameter des Abrufs, etwa ``due_soon_days``
+        """
+        if entity not in ENTITIES:
+            raise KeyError(f"Unbekanntes Grocy-Objekt: {entity}")
+        client = client or GrocyClient()
+        if fresh is None:
+            fresh = getattr(current_run(), 'source', None) == 'manual'
+        key = (entity, tuple(sorted(params.items())))
+
+        with self._lock:
+            quelle = (getattr(client, 'url', None), getattr(client, 'api_key', None))
+            if quelle != self._quelle:
+                # Andere Grocy-Instanz oder neuer Schluessel: alles verwerfen
+                self._eintraege.clear()
+                self._quelle = quelle
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Je Objekt holt nur ein Thread; die anderen warten und nehmen dessen Stand
+        with key_lock:
+            eintrag = self._eintraege.get(key)
+            if (not fresh and eintrag is not None and eintrag[1] is not None
+                    and time.monotonic() - eintrag[1] < self.max_age):
+                self._gelesen(consumer, eintrag[0], False)
+                count('grocy_cache_hits')
+                return eintrag[0]
+            daten = ENTITIES[entity](client, **params)
+            digest = _digest(daten)
+            alt = eintrag[0] if eintrag else None
+            if alt is not None and alt.digest == digest:
+                view = alt._replace(fetched_at=_jetzt())
+            else:
+                view = SnapshotView(entity, dict(params), self._naechste_version(entity),
+                                    digest, _jetzt(), _einfrieren(daten))
+            with self._lock:
+                self._eintraege[key] = (view, time.monotonic())
+            self._gelesen(consumer, view, True)
+            count('grocy_fetches')
+            return view
+
+    def _naechste_version(self, entity):
+        with self._lock:
+            self._versionen[entity] = self._versionen.get(entity, 0) + 1
+            return self._versionen[entity]
+
+    def _gelesen(self, consumer, view, frisch):
+        self._reads.append({'consumer': consumer, 'entity': view.entity,
+                            'params': view.params, 'version': view.version,
+                            'fetched': frisch, 'at': _jetzt()})
+        # Dauerhaft mit dem Lauf in job_runs -- ueber Prozesse hinweg sichtbar
+        current_run().read(view.entity, view.version, frisch)
+
+    def invalidate(self, *entities):
+        """Erzwingt beim naechsten Zugriff einen neuen Abruf (ohne Angabe: alle).
+
+        Der alte Stand bleibt zum Vergleich: Bringt der Abruf denselben
+        Inhalt, bleibt auch die Version.
+        """
+        with self._lock:
+            for key, (view, _) in list(self._eintraege.items()):
+                if not entities or key[0] in entities:
+                    self._eintraege[key] = (view, None)
+
+    def clear(self):
+        """Verwirft jeden Stand samt Vergleichsbasis -- etwa zwischen Tests."""
+        with self._lock:
+            self._eintraege.clear()
+            self._quelle = None
+
+    def versions(self):
+        """Aktueller Stand je Objekt: Version, Digest, Abrufzeit, Alter, Umfang."""
+        jetzt = time.monotonic()
+        with self._lock:
+            return [{'entity': v.entity, 'params': v.params, 'version': v.version,
+                     'digest': v.digest, 'fetched_at': v.fetched_at,
+                     'age_seconds': round(jetzt - t, 1) if t is not None else None,
+                     'items': len(v.data) if hasattr(v.data, '__len__') else None}
+                    for v, t in self._eintraege.values()]
+
+    def reads(self, limit=50):
+        """Die juengsten Zugriffe, neueste zuerst."""
+        return list(self._reads)[::-1][:limit]
+
+
+_snapshot = GrocySnapshot()
+
+
+def get_snapshot():
+    """Der Snapshot dieses Prozesses."""
+    return _snapshot
+
+
+def snapshot_data(entity, consumer, client=None, **params):
+    """Kurzform fuer ``get_snapshot().get(...).data``."""
+    return _snapshot.get(entity, consumer, client, **params).data
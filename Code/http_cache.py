@@ -0,0 +1,155 @@
+"""Validatoren (ETag, Last-Modified, 304) und Kompression fuer ``/api``.
+
+Bis 1.7.x gingen alle JSON-Antworten ohne Validator und unkomprimiert
+hinaus: Produktliste, Log und Kassenbons kamen bei jedem Seitenwechsel
+vollstaendig neu -- fuer die App unter ``/api/v1`` im Mobilfunknetz der
+teuerste Teil.
+
+``init_app(app)`` haengt einen ``after_request`` an, der fuer alle
+JSON-Antworten unter ``/api/`` (also auch ``/api/v1/``)
+
+- bei GET und HEAD einen **starken** ETag setzt und bei passendem
+  ``If-None-Match`` (oder ``If-Modified-Since``, wo ein ``Last-Modified``
+  bekannt ist) mit 304 ohne Inhalt antwortet. ``Cache-Control: private,
+  no-cache`` laesst Browser und App jedes Mal nachfragen -- der Browser
+  schickt ``If-None-Match`` von selbst, ``static/app.js`` muss nichts tun.
+- Inhalte ab ``MIN_COMPRESS_BYTES`` mit gzip packt -- oder mit Brotli, wenn
+  das Paket ``brotli`` installiert ist und der Client es annimmt.
+
+Den ETag leitet der ``after_request`` aus dem fertigen Inhalt ab. Antworten
+aus einem versionierten Stand (Dashboard, Produktliste, ``dashboard.py``)
+kennen ihn schon vorher -- aus Version und Zeitpunkten. Sie melden ihn mit
+``conditional()`` und sparen sich bei einem Treffer auch das Zusammenbauen:
+
+    view = dashboard.read('status')
+    if http_cache.conditional(http_cache.etag('status', view['version'], ...),
+                              view['refreshed_at']):
+        return http_cache.not_modified()
+
+Das geht nur, wenn der Inhalt allein von diesen Teilen abhaengt -- sonst
+waere der ETag nicht stark.
+"""
+
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:  # optional; ohne Paket bleibt es bei gzip
+    brotli = None
+
+# Kleinere Antworten lohnen das Packen nicht (Kopfzeilen, CPU)
+MIN_COMPRESS_BYTES = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def etag(*teile):
+    """Starker ETag aus den Teilen, von denen eine Antwort abhaengt."""
+    roh = json.dumps(teile, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(roh.encode('utf-8')).hexdigest()[:20]
+
+
+def _zeitpunkt(wert):
+    """``YYYY-MM-DD HH:MM:SS`` (UTC, wie SQLite ``datetime('now')``) -> datetime."""
+    if not wert:
+        return None
+    if isinstance(wert, datetime):
+        return wert
+    return datetime.strptime(wert, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+
+
+def _aktuell(tag, last_modified=None):
+    """Hat der Client diesen Stand schon? ``If-None-Match`` geht vor."""
+    if request.if_none_match:
+        return any(request.if_none_match.contains_weak(t)
+                   for t in (tag, tag + '-gzip', tag + '-br'))
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(tag, last_modified=None):
+    """Legt ETag und Last-Modified der Antwort vorab fest.
+
+    Returns:
+        True, wenn der Client den Stand schon hat -- dann ``not_modified()``
+        zurueckgeben
+    """
+    g.http_etag = tag
+    g.http_last_modified = _zeitpunkt(last_modified)
+    return request.method in ('GET', 'HEAD') and _aktuell(tag, g.http_last_modified)
+
+
+def not_modified():
+    """Leere 304-Antwort; die Kopfzeilen setzt der ``after_request``."""
+    return '', 304
+
+
+def _kodierung():
+    annahme = request.accept_encodings
+    if brotli is not None and annahme['br']:
+        return 'br'
+    if annahme['gzip']:
+        return 'gzip'
+    return None
+
+
+def _packen(response):
+    kodierung = _kodierung()
+    if kodierung is None or 'Content-Encoding' in response.headers:
+        return
+    daten = response.get_data()
+    if len(daten) < MIN_COMPRESS_BYTES:
+        return
+    if kodierung == 'br':
+        response.set_data(brotli.compress(daten, quality=BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(daten, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = kodierung
+    # Jede Kodierung ist eine eigene Darstellung mit eigenem starken ETag
+    tag, schwach = response.get_etag()
+    if tag and not schwach:
+        response.set_etag(f'{tag}-{kodierung}')
+
+
+def _nach_request(response):
+    if not request.path.startswith('/api/') or response.direct_passthrough \
+            or response.is_streamed:
+        return response
+    if response.status_code == 304:
+        if g.get('http_etag'):
+            response.set_etag(g.http_etag)
+        if g.get('http_last_modified'):
+            response.last_modified = g.http_last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Accept-Encoding')
+        return response
+    if response.status_code != 200 or response.mimetype != 'application/json':
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if request.method in ('GET', 'HEAD'):
+        tag = g.get('http_etag') or hashlib.sha256(response.get_data()).hexdigest()[:20]
+        last_modified = g.get('http_last_modified')
+        response.set_etag(tag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        if _aktuell(tag, last_modified):
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Type', None)
+            return response
+    _packen(response)
+    return response
+
+
+def init_app(app):
+    """Meldet Validatoren und Kompression fuer ``/api`` an."""
+    app.after_request(_nach_request)
@@ -0,0 +1,242 @@
+"""Laufzeiten der Hintergrund-Jobs, aufgeteilt nach Phasen.
+
+Bis 1.7.x stand im Log nur, *dass* ein Check oder Sync lief. Wie lange er
+brauchte und wo die Zeit blieb -- beim Abruf aus Grocy, in der Auswertung,
+beim Schreiben in SQLite, bei CalDAV oder Bring! --, liess sich nur mit
+einem Profiler herausfinden.
+
+Jeder Lauf schreibt jetzt eine Zeile in ``job_runs``: Gesamtdauer, Dauer je
+Phase, ein paar Mengen (Bestandseintraege, Meldungen, Aenderungen) und ob er
+gescheitert ist. Die Jobs markieren ihre Phasen selbst::
+
+    @timed('caldav_sync')
+    def run_caldav_sync():
+        ...
+
+    with phase('grocy_fetch'):
+        stock = client.get_all_stock()
+    count('stock_entries', len(stock))
+
+Ausserhalb eines Laufs -- in Tests, in Requests der Oberflaeche -- sind
+``phase`` und ``count`` wirkungslos. Verschachtelte Phasen zaehlen
+exklusiv: Die Zeit einer inneren Phase fehlt in der aeusseren, die Summe
+aller Phasen ist also nie groesser als die Gesamtdauer. Was keiner Phase
+zugeordnet ist, steht als ``other`` im Lauf.
+
+Laeuft schon ein Lauf im Thread (etwa der Auftrag "Jetzt pruefen", der
+``run_check_job`` aufruft), haengt sich ein innerer ``job_run`` an den
+aeusseren an, statt eine zweite Zeile zu schreiben.
+"""
+
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+_lokal = threading.local()
+
+
+class JobRun:
+    """Ein Lauf eines Jobs: Phasen, Mengen, Ergebnis."""
+
+    def __init__(self, job, source='schedule', on_phase=None):
+        self.job = job
+        self.source = source
+        self.on_phase = on_phase
+        self.started_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self.phases = {}
+        self.counts = {}
+        self.reads = []
+        self.error = None
+        self._beginn = time.perf_counter()
+        self._dauer = None
+        self._stapel = []  # [name, Beginn des laufenden Abschnitts]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, progress=None):
+        """Misst einen Abschnitt; darf verschachtelt werden.
+
+        ``progress`` (0..1) geht nur an ``on_phase`` -- fuer die
+        Fortschrittsanzeige eines Auftrags aus der Oberflaeche.
+        """
+        with self._lock:
+            jetzt = time.perf_counter()
+            if self._stapel:
+                self._verbuchen(self._stapel[-1], jetzt)
+            self._stapel.append([name, jetzt])
+        if self.on_phase:
+            try:
+                self.on_phase(name, progress)
+            except Exception as e:
+                logger.debug(f"Phasenmeldung {name} fehlgeschlagen: {e}")
+        try:
+            yield self
+        finally:
+            with self._lock:
+                jetzt = time.perf_counter()
+                self._verbuchen(self._stapel.pop(), jetzt, neu=True)
+                if self._stapel:
+                    self._stapel[-1][1] = jetzt
+
+    def _verbuchen(self, eintrag, jetzt, neu=False):
+        name, beginn = eintrag
+        ms, n = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (ms + (jetzt - beginn) * 1000, n + (1 if neu else 0))
+
+    def count(self, name, n=1):
+        """Zaehlt eine Menge hoch (Eintraege, Meldungen, Requests ...)."""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def read(self, entity, version, fetched):
+        """Vermerkt, welchen Stand des Grocy-Snapshots der Lauf gelesen hat."""
+        with self._lock:
+            self.reads.append({'entity': entity, 'version': version, 'fetched': fetched})
+
+    def fail(self, error):
+        """Markiert den Lauf als gescheitert -- fuer Jobs, die Fehler selbst abfangen."""
+        self.error = str(error)
+
+    def finish(self):
+        if self._dauer is None:
+            self._dauer = (time.perf_counter() - self._beginn) * 1000
+        return self
+
+    def as_dict(self):
+        dauer = self._dauer if self._dauer is not None else \
+            (time.perf_counter() - self._beginn) * 1000
+        phases = {name: {'ms': round(ms, 1), 'calls': n}
+                  for name, (ms, n) in self.phases.items()}
+        rest = dauer - sum(ms for ms, _ in self.phases.values())
+        if self.phases and rest >= 1:
+            phases['other'] = {'ms': round(rest, 1), 'calls': 0}
+        return {
+            'job': self.job,
+            'source': self.source,
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'started_at': self.started_at,
+            'duration_ms': round(dauer, 1),
+            'phases': phases,
+            'counts': dict(self.counts),
+            'reads': list(self.reads),
+        }
+
+
+class _KeinLauf:
+    """Platzhalter ausserhalb eines Laufs: misst und speichert nichts."""
+
+    source = None
+
+    @contextmanager
+    def phase(self, name, progress=None):
+        yield self
+
+    def count(self, name, n=1):
+        pass
+
+    def read(self, entity, version, fetched):
+        pass
+
+    def fail(self, error):
+        pass
+
+
+_KEIN_LAUF = _KeinLauf()
+
+
+def current_run():
+    """Der Lauf dieses Threads -- oder ein Platzhalter, der nichts tut.
+
+    Code, der in einem anderen Thread weiterlaeuft (der Eventloop von
+    Bring!), holt sich den Lauf vorher und reicht ihn durch.
+    """
+    return getattr(_lokal, 'lauf', None) or _KEIN_LAUF
+
+
+def phase(name, progress=None):
+    """Kurzform fuer ``current_run().phase(name, progress)``."""
+    return current_run().phase(name, progress)
+
+
+def count(name, n=1):
+    """Kurzform fuer ``current_run().count(name, n)``."""
+    current_run().count(name, n)
+
+
+@contextmanager
+def job_run(job, source='schedule', on_phase=None):
+    """Misst einen Lauf und schreibt ihn danach in ``job_runs``."""
+    aeusserer = getattr(_lokal, 'lauf', None)
+    if aeusserer is not None:
+        yield aeusserer
+        return
+    lauf = JobRun(job, source, on_phase)
+    _lokal.lauf = lauf
+    try:
+        yield lauf
+    except Exception as e:
+        lauf.fail(e)
+        raise
+    finally:
+        _lokal.lauf = None
+        _speichern(lauf.finish())
+
+
+def timed(job, source='schedule'):
+    """Dekorator fuer geplante Jobs: jeder Aufruf wird ein Lauf.
+
+    ``functools.wraps`` behaelt Modul und Namen bei -- der Job-Store findet
+    die Funktion deshalb unter demselben Verweis wie vorher.
+    """
+    def dekorator(funktion):
+        @functools.wraps(funktion)
+        def huelle(*args, **kwargs):
+            with job_run(job, source):
+                return funktion(*args, **kwargs)
+        return huelle
+    return dekorator
+
+
+def _speichern(lauf):
+    from database import save_job_run
+    try:
+        save_job_run(lauf.as_dict())
+    except Exception as e:
+        # Die Messung darf den Job nie scheitern lassen
+        logger.warning(f"Laufzeit von {lauf.job} nicht gespeichert: {e}")
+
+
+def summarize_runs(runs):
+    """Verdichtet Laeufe je Job: Anzahl, Fehler, Dauer, Mittel je Phase.
+
+    Args:
+        runs: Zeilen aus ``database.get_job_runs``
+
+    Returns:
+        dict Job -> {'runs', 'errors', 'avg_ms', 'max_ms', 'last_run',
+        'phases': {Phase: mittlere ms}, 'slowest_phase'}
+    """
+    zusammen = {}
+    for run in runs:
+        s = zusammen.setdefault(run['job'], {
+            'runs': 0, 'errors': 0, 'avg_ms': 0.0, 'max_ms': 0.0,
+            'last_run': run['started_at'], 'phases': {}, 'slowest_phase': None})
+        s['runs'] += 1
+        s['errors'] += run['status'] == 'error'
+        s['avg_ms'] += run['duration_ms']
+        s['max_ms'] = max(s['max_ms'], run['duration_ms'])
+        s['last_run'] = max(s['last_run'], run['started_at'])
+        for name, werte in run['phases'].items():
+            s['phases'][name] = s['phases'].get(name, 0.0) + werte['ms']
+    for s in zusammen.values():
+        s['avg_ms'] = round(s['avg_ms'] / s['runs'], 1)
+        s['phases'] = {name: round(ms / s['runs'], 1) for name, ms in s['phases'].items()}
+        if s['phases']:
+            s['slowest_phase'] = max(s['phases'], key=s['phases'].get)
+    return zusammen
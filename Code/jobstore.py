@@ -0,0 +1,122 @@
+"""APScheduler-Jobs in der SQLite-Datenbank von Grocylink.
+
+Bis 1.7.x lagen die Jobs nur im Speicher: Jeder Neustart des Containers
+setzte die Uhr des 6-Stunden-Checks zurueck, und ein Weckruf fuer den
+naechsten Schwellen-Uebertritt ging verloren. APScheduler bringt einen
+``SQLAlchemyJobStore`` mit -- SQLAlchemy ist aber keine Abhaengigkeit des
+Projekts, und fuer eine Tabelle mit drei Spalten lohnt sie sich nicht.
+
+Dieser Store ist das Gegenstueck mit ``sqlite3``: gleiche Tabellenform
+(ID, naechster Lauf als UTC-Zeitstempel, gepickelter Job-Zustand), gleiche
+Semantik, dieselbe Datenbankdatei wie alles andere. Gepickelt wird nur der
+Zustand, den APScheduler selbst liefert; Funktionen stehen darin als Text
+(``modul:name``).
+"""
+
+import logging
+import pickle
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import get_db, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore(BaseJobStore):
+    """Job-Store in der Tabelle ``scheduler_jobs`` (siehe ``database.init_db``)."""
+
+    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        conn = get_db()
+        row = conn.execute(
+            "SELECT job_state FROM scheduler_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return self._reconstitute_job(row['job_state']) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?",
+                              (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        conn = get_db()
+        row = conn.execute(
+            "SELECT MIN(next_run_time) AS naechster FROM scheduler_jobs "
+            "WHERE next_run_time IS NOT NULL").fetchone()
+        conn.close()
+        return utc_timestamp_to_datetime(row['naechster'])
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        with transaction() as conn:
+            if conn.execute("SELECT 1 FROM scheduler_jobs WHERE id = ?",
+                            (job.id,)).fetchone():
+                raise ConflictingIdError(job.id)
+            conn.execute(
+                "INSERT INTO scheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                (job.id, datetime_to_utc_timestamp(job.next_run_time), self._state(job)))
+
+    def update_job(self, job):
+        with transaction() as conn:
+            geaendert = conn.execute(
+                "UPDATE scheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), self._state(job),
+                 job.id)).rowcount
+        if geaendert == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with transaction() as conn:
+            geloescht = conn.execute(
+                "DELETE FROM scheduler_jobs WHERE id = ?", (job_id,)).rowcount
+        if geloescht == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with transaction() as conn:
+            conn.execute("DELETE FROM scheduler_jobs")
+
+    # ── Hilfen ─────────────────────────────────────────────────────────
+
+    def _state(self, job):
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        state = pickle.loads(job_state)
+        state['jobstore'] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where='', params=()):
+        conn = get_db()
+        rows = conn.execute(
+            f"SELECT id, job_state FROM scheduler_jobs {where} ORDER BY next_run_time",
+            params).fetchall()
+        conn.close()
+        jobs, kaputt = [], []
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row['job_state']))
+            except Exception:
+                # Etwa eine umbenannte Funktion nach einem Update
+                logger.exception(f"Job {row['id']} laesst sich nicht laden -- wird entfernt")
+                kaputt.append((row['id'],))
+        if kaputt:
+            with transaction() as conn:
+                conn.executemany("DELETE FROM scheduler_jobs WHERE id = ?", kaputt)
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}>"
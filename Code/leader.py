@@ -0,0 +1,168 @@
+"""Genau ein Scheduler je Datenverzeichnis.
+
+``app.py`` startet den ``BackgroundScheduler`` beim Import. Mit Gunicorn
+``--preload`` laeuft er so im Master-Prozess, die Worker erben nur eine
+Kopie ohne Thread. Faellt ``--preload`` weg, importiert jeder Worker die App
+selbst -- und jeder fuehrt Check, CalDAV- und Bring-Sync in eigener Kopie
+aus. Dasselbe passiert mit zwei Containern auf demselben Volume.
+
+Dieses Modul waehlt den Prozess, der die Jobs ausfuehrt, ueber eine
+Dateisperre im Datenverzeichnis (``fcntl.lockf``):
+
+- Wer die Sperre bekommt, ist Leader und startet den Scheduler.
+- Alle anderen versuchen es alle ``RETRY_SECONDS`` erneut in einem
+  Daemon-Thread.
+- Stirbt der Leader, gibt der Kernel die Sperre frei -- auch bei ``kill -9``,
+  ohne Heartbeat und ohne Ablaufzeit. Der naechste Versuch eines anderen
+  Prozesses gewinnt.
+
+``lockf`` (POSIX-Satzsperre) statt ``flock`` mit Absicht: Die Sperre gehoert
+dem Prozess und wird bei ``fork`` nicht vererbt. Ein geforkter Worker haelt
+sie also nie versehentlich mit, und der Master bleibt Leader, solange er
+lebt.
+
+    leader = SchedulerLeader(os.path.join(data_dir, LOCK_FILENAME))
+    leader.run(start_scheduler)
+
+Statt eines festen Pfads darf auch eine Funktion uebergeben werden; sie wird
+erst beim Versuch aufgerufen, die Sperre zu holen. So gilt das
+Datenverzeichnis zum Zeitpunkt von ``run()``, nicht das beim Import.
+"""
+
+import logging
+import os
+import threading
+import weakref
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows, nur fuer die Entwicklung
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILENAME = 'scheduler.lock'
+
+# Abstand der Versuche eines Nicht-Leaders; zugleich die laengste Zeit ohne
+# Scheduler, nachdem der Leader gestorben ist
+RETRY_SECONDS = 5
+
+
+class SchedulerLeader:
+    """Dateisperre, die den einen Prozess mit Scheduler bestimmt."""
+
+    def __init__(self, path, retry_seconds=RETRY_SECONDS):
+        self._path = path
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self._fd = None
+        self._thread = None
+        self._stop = threading.Event()
+        _instanzen.add(self)
+
+    @property
+    def path(self):
+        """Pfad der Sperrdatei -- bei einer Funktion deren aktuelles Ergebnis."""
+        return self._path() if callable(self._path) else self._path
+
+    def try_acquire(self):
+        """Versucht einmal, Leader zu werden.
+
+        Returns:
+            True, wenn dieser Prozess (jetzt oder schon vorher) Leader ist.
+        """
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            # Ohne fcntl gibt es keine Sperre -- wie bis 1.7.x: jeder ist Leader
+            self.is_leader = True
+            return True
+        pfad = self.path
+        os.makedirs(os.path.dirname(pfad) or '.', exist_ok=True)
+        fd = os.open(pfad, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # PID des Leaders fuer die Fehlersuche in die Datei schreiben
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        self.is_leader = True
+        return True
+
+    def run(self, on_elected):
+        """Ruft ``on_elected`` auf, sobald dieser Prozess Leader ist.
+
+        Bekommt der Prozess die Sperre sofort, laeuft ``on_elected`` noch in
+        diesem Aufruf; sonst spaeter im Thread ``scheduler-leader``.
+
+        Returns:
+            True, wenn ``on_elected`` bereits gelaufen ist.
+        """
+        if self.try_acquire():
+            self._gewaehlt(on_elected)
+            return True
+        logger.info(f"Scheduler laeuft in Prozess {self.holder()}, "
+                    f"neuer Versuch alle {self.retry_seconds}s")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._warten, args=(on_elected,),
+            name='scheduler-leader', daemon=True)
+        self._thread.start()
+        return False
+
+    def _warten(self, on_elected):
+        while not self._stop.wait(self.retry_seconds):
+            if self.try_acquire():
+                self._gewaehlt(on_elected)
+                return
+
+    def _gewaehlt(self, on_elected):
+        logger.info(f"Prozess {os.getpid()} fuehrt den Scheduler")
+        try:
+            on_elected()
+        except Exception:
+            logger.exception("Start des Schedulers fehlgeschlagen")
+
+    def holder(self):
+        """PID des aktuellen Leaders laut Sperrdatei (oder None)."""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        """Gibt die Sperre ab und beendet einen wartenden Thread."""
+        self._stop.set()
+        if self._fd is not None:
+            os.close(self._fd)  # schliessen gibt die lockf-Sperre frei
+            self._fd = None
+        self.is_leader = False
+
+    def _nach_fork(self):
+        # Das Kind erbt Flag und Dateideskriptor, aber nicht die Sperre
+        # (und keinen Thread). Schliessen ist gefahrlos: Eine lockf-Sperre
+        # des Elternprozesses haengt nicht an diesem Deskriptor des Kindes.
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+        self._thread = None
+        self.is_leader = False
+
+
+_instanzen = weakref.WeakSet()
+
+
+def _nach_fork_im_kind():
+    for leader in list(_instanzen):
+        leader._nach_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_nach_fork_im_kind)
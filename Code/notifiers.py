@@ -1,13 +1,225 @@
+import atexit
+import html
 import smtplib
+import hashlib
 import json
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+logger = logging.getLogger(__name__)
+
+# Zeitlimit je Kanal beim Versand. Ein haengender SMTP-Server darf die
+# uebrigen Kanaele nicht aufhalten -- nach Ablauf gilt der Kanal als
+# gescheitert, der Check laeuft weiter.
+CHANNEL_DEADLINE_SECONDS = 30
+
+# Zeitlimit fuer Verbindungsaufbau und Antworten des SMTP-Servers
+SMTP_TIMEOUT_SECONDS = 20
+
+# Eine offene SMTP-Sitzung, die so lange unbenutzt war, wird vor dem Versand
+# per NOOP geprueft ...
+SMTP_NOOP_AFTER_SECONDS = 30
+
+# ... und nach so langer Ruhe geschlossen. Viele Server kappen ruhende
+# Verbindungen nach etwa fuenf Minuten.
+SMTP_IDLE_SECONDS = 120
+
+# Sendegrenzen je Anbieter und Zugang: (Nachrichten je Sekunde, Vorrat).
+# Werte aus den Dokumentationen der Dienste, mit etwas Abstand nach unten:
+# Telegram erlaubt je Bot etwa eine Nachricht pro Sekunde in denselben Chat,
+# ein Discord-Webhook 5 Requests in 2 Sekunden, ein Slack-Webhook eine
+# Nachricht pro Sekunde. Pushover und Gotify kennen keine kurze Grenze,
+# bekommen aber eine, damit ein Schwall nicht als 429 zurueckkommt.
+RATE_LIMITS = {
+    'telegram': (1.0, 3),
+    'discord': (2.5, 5),
+    'slack': (1.0, 1),
+    'pushover': (2.0, 5),
+    'gotify': (5.0, 10),
+}
+
+# Laenger wartet ein Versand nicht auf ein freies Token oder ein Retry-After.
+# Alles darueber geht als RateLimited an den Aufrufer zurueck (die Outbox
+# plant dann einen neuen Versuch), statt die Frist je Kanal aufzubrauchen.
+RATE_LIMIT_MAX_WAIT_SECONDS = 10
+
+
+class RateLimited(Exception):
+    """Der Dienst laesst erst nach ``retry_after`` Sekunden wieder Nachrichten zu."""
+
+    def __init__(self, retry_after, message=None):
+        self.retry_after = float(retry_after)
+        super().__init__(message or f"Sendegrenze erreicht, erneut in {self.retry_after:.0f}s")
+
+
+class TokenBucket:
+    """Token-Bucket: ``rate`` Tokens je Sekunde, hoechstens ``capacity`` auf Vorrat.
+
+    ``reserve()`` nimmt sofort ein Token und liefert die Wartezeit, bis es
+    tatsaechlich verfuegbar ist. Der Vorrat darf dabei negativ werden -- so
+    reihen sich gleichzeitige Versender hintereinander ein, statt alle im
+    selben Moment loszuschicken.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _auffuellen(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        with self._lock:
+            now = self.clock()
+            self._auffuellen(now)
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now, 0.0)
+
+    def block(self, seconds):
+        """Der Dienst hat eine Pause verlangt: bis dahin keine Tokens."""
+        with self._lock:
+            now = self.clock()
+            self._auffuellen(now)
+            self.blocked_until = max(self.blocked_until, now + float(seconds))
+            self.tokens = min(self.tokens, 0.0)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(provider, credential):
+    """Der Bucket eines Zugangs -- geteilt von allen Kanaelen mit demselben
+    Bot-Token oder Webhook. Der Zugang selbst wird nur als Hash gehalten."""
+    key = (provider, hashlib.sha256(str(credential).encode('utf-8')).hexdigest()[:16])
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(*RATE_LIMITS[provider])
+        return bucket
+
+
+def _retry_after(resp, default=1.0):
+    """Wartezeit aus einer 429-Antwort: Header, sonst Antworttext.
+
+    ``Retry-After`` kommt als Sekunden oder als HTTP-Datum; Discord schickt
+    zusaetzlich ``retry_after`` im JSON, Telegram ``parameters.retry_after``.
+    """
+    header = resp.headers.get('Retry-After')
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(header).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    try:
+        body = resp.json()
+    except ValueError:
+        return default
+    if isinstance(body, dict):
+        wert = body.get('retry_after') or (body.get('parameters') or {}).get('retry_after')
+        if wert is not None:
+            return float(wert)
+    return default
+
+
+def _beachte_discord_header(bucket, resp):
+    """Discord meldet den Restvorrat mit: ist er leer, selbst pausieren."""
+    remaining = resp.headers.get('X-RateLimit-Remaining')
+    reset_after = resp.headers.get('X-RateLimit-Reset-After')
+    if remaining is None or reset_after is None:
+        return
+    try:
+        if int(remaining) <= 0:
+            bucket.block(float(reset_after))
+    except ValueError:
+        pass
+
+
+def reserve_send(bucket):
+    """Wartezeit bis zum naechsten erlaubten Versand ueber ``bucket``.
+
+    Raises:
+        RateLimited: wenn sie laenger als ``RATE_LIMIT_MAX_WAIT_SECONDS`` waere.
+    """
+    delay = bucket.reserve()
+    if delay > RATE_LIMIT_MAX_WAIT_SECONDS:
+        raise RateLimited(delay)
+    return delay
+
+
+def check_response(provider, bucket, resp):
+    """Wertet eine Antwort aus: None, wenn sie angenommen wurde, sonst die
+    vom Dienst verlangte Pause in Sekunden (HTTP 429).
+
+    Andere Fehler wirft ``resp.raise_for_status()`` wie gewohnt.
+    """
+    _beachte_discord_header(bucket, resp)
+    if resp.status_code != 429:
+        resp.raise_for_status()
+        return None
+    wait_for = _retry_after(resp)
+    bucket.block(wait_for)
+    logger.warning(f"{provider}: Sendegrenze erreicht, Pause {wait_for:.1f}s")
+    return wait_for
+
+
+def rate_limited_post(provider, credential, url, session=None, **kwargs):
+    """``requests.post`` mit Sendegrenze je Anbieter und Zugang.
+
+    Wartet auf ein freies Token, beachtet ``Retry-After`` und die
+    Rate-Limit-Header von Discord und versucht es nach einem 429 einmal
+    erneut. Waere die Wartezeit laenger als ``RATE_LIMIT_MAX_WAIT_SECONDS``,
+    kommt ``RateLimited`` zurueck. Mit ``session`` laeuft der Request ueber
+    deren offene Verbindung statt ueber eine neue.
+    """
+    bucket = get_bucket(provider, credential)
+    for versuch in range(2):
+        delay = reserve_send(bucket)
+        if delay > 0:
+            time.sleep(delay)
+        resp = (session or requests).post(url, **kwargs)
+        wait_for = check_response(provider, bucket, resp)
+        if wait_for is None:
+            return resp
+    raise RateLimited(wait_for)
+
 
 class BaseNotifier:
     def __init__(self, config):
         self.config = config if isinstance(config, dict) else json.loads(config)
+        self._session = None
+
+    @property
+    def session(self):
+        """``requests.Session`` dieses Kanals -- haelt die TLS-Verbindung offen.
+
+        Erst beim ersten Versand angelegt; Mail-Kanaele brauchen keine.
+        """
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
+
+    def close(self):
+        """Gibt die Session frei (Kanal geaendert oder geloescht)."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
 
     def send(self, title, message):
         raise NotImplementedError
@@ -24,91 +236,337 @@ class BaseNotifier:
                          sprache.t('notify.test_body'))
 
 
+class _SmtpSitzung:
+    """Eine offene SMTP-Verbindung im Pool -- immer nur von einem Thread benutzt."""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+
+class SmtpPool:
+    """Haelt je (Host, Port, Benutzer, TLS) eine angemeldete SMTP-Verbindung offen.
+
+    Bis 1.7.x kostete jede Mail Verbindungsaufbau, EHLO, STARTTLS und Login
+    -- bei mehreren Mail-Kanaelen oder einer vollen Outbox dominierte der
+    TLS-Handshake die Versanddauer. Jetzt bleibt die Sitzung offen und
+    traegt beliebig viele Nachrichten:
+
+    - war sie laenger als ``SMTP_NOOP_AFTER_SECONDS`` unbenutzt, prueft ein
+      NOOP vor dem Versand, ob der Server sie noch haelt
+    - bricht sie beim Versand weg, wird einmal neu verbunden und erneut
+      gesendet
+    - nach ``SMTP_IDLE_SECONDS`` ohne Versand wird sie geschlossen, bevor der
+      Server sie von sich aus kappt
+    """
+
+    def __init__(self, factory=None, clock=time.monotonic):
+        # Erst beim Aufruf nachschlagen, damit Tests smtplib.SMTP umbiegen koennen
+        self.factory = factory
+        self.clock = clock
+        self._sitzungen = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _schluessel(cfg):
+        # Mit (gehashtem) Passwort: Nach einer Aenderung meldet sich eine neue
+        # Sitzung an, statt die mit den alten Daten weiterzuverwenden
+        kennwort = hashlib.sha256((cfg.get('password') or '').encode('utf-8')).hexdigest()[:16]
+        return (cfg['smtp_host'], int(cfg.get('smtp_port', 587)),
+                cfg.get('username') or '', kennwort, bool(cfg.get('use_tls', True)))
+
+    def _verbinden(self, cfg):
+        factory = self.factory or smtplib.SMTP
+        server = factory(cfg['smtp_host'], int(cfg.get('smtp_port', 587)),
+                         timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            server.ehlo()
+            if cfg.get('use_tls', True):
+                server.starttls()
+                server.ehlo()
+            if cfg.get('username') and cfg.get('password'):
+                server.login(cfg['username'], cfg['password'])
+        except Exception:
+            _smtp_schliessen(server)
+            raise
+        return server
+
+    def _lebt(self, sitzung):
+        if self.clock() - sitzung.last_used < SMTP_NOOP_AFTER_SECONDS:
+            return True
+        try:
+            return sitzung.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, cfg, from_addr, to_addrs, msg):
+        """Sendet ``msg`` ueber die Sitzung des Servers; verbindet bei Bedarf neu."""
+        self.close_idle()
+        key = self._schluessel(cfg)
+        with self._lock:
+            sitzung = self._sitzungen.setdefault(key, _SmtpSitzung())
+        with sitzung.lock:
+            for versuch in range(2):
+                if sitzung.server is not None and not self._lebt(sitzung):
+                    _smtp_schliessen(sitzung.server)
+                    sitzung.server = None
+                if sitzung.server is None:
+                    sitzung.server = self._verbinden(cfg)
+                try:
+                    sitzung.server.sendmail(from_addr, to_addrs, msg)
+                    sitzung.last_used = self.clock()
+                    return
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    fehler = e
+                except smtplib.SMTPResponseException as e:
+                    # 421: Der Server beendet die Sitzung -- neu verbinden
+                    if e.smtp_code != 421:
+                        raise
+                    fehler = e
+                _smtp_schliessen(sitzung.server)
+                sitzung.server = None
+                logger.info(f"SMTP-Sitzung zu {key[0]} abgebrochen, verbinde neu: {fehler}")
+            raise fehler
+
+    def close_idle(self):
+        """Schliesst Sitzungen, die laenger als ``SMTP_IDLE_SECONDS`` ruhen."""
+        grenze = self.clock() - SMTP_IDLE_SECONDS
+        with self._lock:
+            sitzungen = list(self._sitzungen.values())
+        for sitzung in sitzungen:
+            # Besetzte Sitzungen ueberspringen -- sie sind gerade nicht ruhig
+            if not sitzung.lock.acquire(blocking=False):
+                continue
+            try:
+                if sitzung.server is not None and sitzung.last_used < grenze:
+                    _smtp_schliessen(sitzung.server)
+                    sitzung.server = None
+            finally:
+                sitzung.lock.release()
+
+    def close_all(self):
+        with self._lock:
+            sitzungen = list(self._sitzungen.values())
+            self._sitzungen.clear()
+        for sitzung in sitzungen:
+            with sitzung.lock:
+                if sitzung.server is not None:
+                    _smtp_schliessen(sitzung.server)
+                    sitzung.server = None
+
+
+def _smtp_schliessen(server):
+    """QUIT, und wenn der Server schon weg ist, wenigstens den Socket zu."""
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        try:
+            server.close()
+        except OSError:
+            pass
+
+
+smtp_pool = SmtpPool()
+atexit.register(smtp_pool.close_all)
+
+
+def split_message(message, limit):
+    """Teilt eine Nachricht an Zeilengrenzen in Stuecke von hoechstens ``limit`` Zeichen.
+
+    Eine Warnung steht je Zeile -- so bleibt jede Warnung in einem Stueck.
+    Nur eine einzelne Zeile ueber dem Limit wird hart geteilt.
+    """
+    limit = max(int(limit), 1)
+    stuecke, aktuell, groesse = [], [], 0
+    for zeile in message.split('\n'):
+        while len(zeile) > limit:
+            if aktuell:
+                stuecke.append('\n'.join(aktuell))
+                aktuell, groesse = [], 0
+            stuecke.append(zeile[:limit])
+            zeile = zeile[limit:]
+        zusatz = len(zeile) + (1 if aktuell else 0)
+        if aktuell and groesse + zusatz > limit:
+            stuecke.append('\n'.join(aktuell))
+            aktuell, groesse = [zeile], len(zeile)
+        else:
+            aktuell.append(zeile)
+            groesse += zusatz
+    if aktuell or not stuecke:
+        stuecke.append('\n'.join(aktuell))
+    return stuecke
+
+
+def _teiltitel(title, nummer, anzahl):
+    """Titel eines Teilstuecks: 'Titel (2/3)' -- bei nur einem Stueck unveraendert."""
+    return title if anzahl == 1 else f"{title} ({nummer}/{anzahl})"
+
+
+# Platz, den der Zusatz ' (12/34)' im Titel eines Teilstuecks braucht
+_TEILTITEL_RESERVE = 8
+
+
 class EmailNotifier(BaseNotifier):
+    """Mail mit Text- und HTML-Teil -- ohne Laengengrenze, also immer eine Nachricht."""
+
     def send(self, title, message):
         cfg = self.config
-        msg = MIMEMultipart()
+        msg = MIMEMultipart('alternative')
         msg['From'] = cfg.get('from_email', cfg['username'])
         msg['To'] = cfg['to_email']
         msg['Subject'] = title
         msg.attach(MIMEText(message, 'plain', 'utf-8'))
+        msg.attach(MIMEText(self._html(title, message), 'html', 'utf-8'))
 
-        server = smtplib.SMTP(cfg['smtp_host'], int(cfg.get('smtp_port', 587)))
-        server.ehlo()
-        if cfg.get('use_tls', True):
-            server.starttls()
-        if cfg.get('username') and cfg.get('password'):
-            server.login(cfg['username'], cfg['password'])
-        server.sendmail(msg['From'], cfg['to_email'], msg.as_string())
-        server.quit()
+        smtp_pool.send(cfg, msg['From'], cfg['to_email'], msg.as_string())
         return True
 
+    @staticmethod
+    def _html(title, message):
+        zeilen = ''.join(f"<li>{html.escape(z)}</li>"
+                         for z in message.split('\n') if z.strip())
+        return (f"<html><body><h2>{html.escape(title)}</h2>"
+                f"<ul>{zeilen}</ul></body></html>")
+
+
+class HttpNotifier(BaseNotifier):
+    """Notifier, die eine Nachricht mit HTTP-POSTs abgeben.
+
+    ``build_requests`` beschreibt die Requests nur; abgeschickt werden sie
+    synchron ueber ``send`` (requests) oder asynchron ueber
+    ``notify_runtime`` (aiohttp) -- beide mit derselben Sendegrenze.
+
+    Ist die Nachricht laenger, als der Dienst annimmt, teilt
+    ``build_requests`` sie an Zeilengrenzen auf; die Teile gehen in ihrer
+    Reihenfolge und mit '(1/3)' im Titel hinaus. Bis 1.7.x lehnte Telegram
+    eine grosse Ablaufwelle mit mehr als 4096 Zeichen einfach ab -- und die
+    ganze Meldung war verloren.
+    """
+
+    provider = None
+
+    def build_requests(self, title, message):
+        """Liefert die Requests als Liste von (zugang, url, kwargs).
+
+        ``zugang`` bestimmt den Token-Bucket (siehe ``get_bucket``).
+        """
+        raise NotImplementedError
 
-class PushoverNotifier(BaseNotifier):
     def send(self, title, message):
-        resp = requests.post('https://api.pushover.net/1/messages.json', data={
-            'token': self.config['api_token'],
-            'user': self.config['user_key'],
-            'title': title,
-            'message': message,
-            'priority': int(self.config.get('priority', 0)),
-        }, timeout=10)
-        resp.raise_for_status()
+        for credential, url, kwargs in self.build_requests(title, message):
+            rate_limited_post(self.provider, credential, url,
+                              session=self.session, **kwargs)
         return True
 
 
-class TelegramNotifier(BaseNotifier):
-    def send(self, title, message):
-        text = f"<b>{title}</b>\n\n{message}"
-        resp = requests.post(
-            f"https://api.telegram.org/bot{self.config['bot_token']}/sendMessage",
-            json={
+class PushoverNotifier(HttpNotifier):
+    provider = 'pushover'
+    # Pushover: Nachricht hoechstens 1024 Zeichen, Titel 250
+    max_length = 1024
+
+    def build_requests(self, title, message):
+        teile = split_message(message, self.max_length)
+        return [(self.config['api_token'], 'https://api.pushover.net/1/messages.json', {
+            'data': {
+                'token': self.config['api_token'],
+                'user': self.config['user_key'],
+                'title': _teiltitel(title, i, len(teile))[:250],
+                'message': teil,
+                'priority': int(self.config.get('priority', 0)),
+            },
+            'timeout': 10,
+        }) for i, teil in enumerate(teile, 1)]
+
+
+class TelegramNotifier(HttpNotifier):
+    provider = 'telegram'
+    # Telegram: hoechstens 4096 Zeichen je Nachricht
+    max_length = 4096
+
+    def build_requests(self, title, message):
+        # Mit parse_mode HTML muessen <, > und & maskiert sein -- ein Produkt
+        # namens "Salz & Pfeffer" liess die Nachricht sonst scheitern
+        titel = html.escape(title, quote=False)
+        rahmen = len(f"<b>{titel}</b>\n\n") + _TEILTITEL_RESERVE
+        teile = split_message(html.escape(message, quote=False), self.max_length - rahmen)
+        url = f"https://api.telegram.org/bot{self.config['bot_token']}/sendMessage"
+        return [(self.config['bot_token'], url, {
+            'json': {
                 'chat_id': self.config['chat_id'],
-                'text': text,
+                'text': f"<b>{_teiltitel(titel, i, len(teile))}</b>\n\n{teil}",
                 'parse_mode': 'HTML',
             },
-            timeout=10
-        )
-        resp.raise_for_status()
-        return True
+            'timeout': 10,
+        }) for i, teil in enumerate(teile, 1)]
 
 
-class SlackNotifier(BaseNotifier):
-    def send(self, title, message):
-        resp = requests.post(
-            self.config['webhook_url'],
-            json={'text': f"*{title}*\n{message}"},
-            timeout=10
-        )
-        resp.raise_for_status()
-        return True
+class SlackNotifier(HttpNotifier):
+    provider = 'slack'
+    # Slack: Text eines Abschnitts hoechstens 3000 Zeichen, 50 Bloecke je
+    # Nachricht (einer davon ist die Ueberschrift), Ueberschrift 150 Zeichen
+    max_length = 3000
+    max_blocks = 50
 
+    def build_requests(self, title, message):
+        abschnitte = split_message(message, self.max_length)
+        je_nachricht = self.max_blocks - 1
+        gruppen = [abschnitte[i:i + je_nachricht]
+                   for i in range(0, len(abschnitte), je_nachricht)]
+        requests_ = []
+        for i, gruppe in enumerate(gruppen, 1):
+            teiltitel = _teiltitel(title, i, len(gruppen))
+            blocks = [{'type': 'header',
+                       'text': {'type': 'plain_text', 'text': teiltitel[:150]}}]
+            blocks += [{'type': 'section', 'text': {'type': 'mrkdwn', 'text': a}}
+                       for a in gruppe]
+            requests_.append((self.config['webhook_url'], self.config['webhook_url'], {
+                # 'text' ist der Rueckfall fuer Benachrichtigungen und alte Clients
+                'json': {'text': teiltitel, 'blocks': blocks},
+                'timeout': 10,
+            }))
+        return requests_
 
-class DiscordNotifier(BaseNotifier):
-    def send(self, title, message):
-        resp = requests.post(
-            self.config['webhook_url'],
-            json={'content': f"**{title}**\n{message}"},
-            timeout=10
-        )
-        resp.raise_for_status()
-        return True
 
+class DiscordNotifier(HttpNotifier):
+    provider = 'discord'
+    # Discord: je Embed-Beschreibung 4096 Zeichen, je Nachricht hoechstens
+    # 10 Embeds und 6000 Zeichen ueber alle Embeds, Embed-Titel 256
+    max_embed_length = 4096
+    max_message_length = 6000
 
-class GotifyNotifier(BaseNotifier):
-    def send(self, title, message):
-        resp = requests.post(
-            f"{self.config['server_url'].rstrip('/')}/message",
-            json={
+    def build_requests(self, title, message):
+        # Erst in Nachrichten zu je 6000 Zeichen teilen, dann jede in Embeds
+        # zu je 4096 -- so wenig Requests wie Discord zulaesst
+        titel_max = min(len(title) + _TEILTITEL_RESERVE, 256)
+        nachrichten = split_message(message, self.max_message_length - titel_max)
+        requests_ = []
+        for i, nachricht in enumerate(nachrichten, 1):
+            embeds = [{'description': teil}
+                      for teil in split_message(nachricht, self.max_embed_length)]
+            embeds[0]['title'] = _teiltitel(title, i, len(nachrichten))[:256]
+            requests_.append((self.config['webhook_url'], self.config['webhook_url'], {
+                'json': {'embeds': embeds},
+                'timeout': 10,
+            }))
+        return requests_
+
+
+class GotifyNotifier(HttpNotifier):
+    provider = 'gotify'
+
+    def build_requests(self, title, message):
+        # Gotify kennt keine Laengengrenze -- eine Nachricht, als Markdown
+        url = f"{self.config['server_url'].rstrip('/')}/message"
+        return [(self.config['app_token'], url, {
+            'json': {
                 'title': title,
                 'message': message,
                 'priority': int(self.config.get('priority', 5)),
             },
-            headers={'X-Gotify-Key': self.config['app_token']},
-            timeout=10
-        )
-        resp.raise_for_status()
-        return True
+            'headers': {'X-Gotify-Key': self.config['app_token']},
+            'timeout': 10,
+        })]
 
 
 NOTIFIER_CLASSES = {
@@ -126,3 +584,72 @@ def get_notifier(channel_type, config):
     if not cls:
         raise ValueError(f"Unbekannter Kanal-Typ: {channel_type}")
     return cls(config)
+
+
+class NotifierRegistry:
+    """Lebende Notifier je Kanal, gueltig solange sich dessen Konfiguration nicht aendert.
+
+    Bis 1.7.x entschluesselte jeder Versand alle Kanaele, serialisierte die
+    Konfiguration nach JSON und wieder zurueck und baute einen frischen
+    Notifier mit einmaligem ``requests.post`` -- also auch einen neuen
+    TLS-Handshake je Nachricht. Jetzt bleibt der Notifier samt Session
+    liegen. Schluessel ist die Kanal-ID, geprueft wird gegen einen Hash der
+    **gespeicherten** (verschluesselten) Konfiguration: Entschluesselt wird
+    nur, wenn sich an ihr etwas geaendert hat.
+
+    ``save_channel`` und ``delete_channel`` verwerfen den Eintrag sofort. In
+    anderen Prozessen (mehrere Gunicorn-Worker) faellt die Aenderung ueber
+    den Hash auf.
+    """
+
+    def __init__(self):
+        self._eintraege = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(channel):
+        roh = f"{channel['type']}\0{channel['config_json']}"
+        return hashlib.sha256(roh.encode('utf-8')).hexdigest()
+
+    def get(self, channel):
+        """Notifier zu einer Zeile aus ``get_channels()`` (Konfiguration verschluesselt)."""
+        fingerprint = self._hash(channel)
+        with self._lock:
+            eintrag = self._eintraege.get(channel['id'])
+            if eintrag is not None and eintrag[0] == fingerprint:
+                return eintrag[1]
+        from crypto import decrypt_channel_config
+        config = channel['config_json']
+        if isinstance(config, str):
+            config = json.loads(config)
+        notifier = get_notifier(channel['type'], decrypt_channel_config(config))
+        with self._lock:
+            alt = self._eintraege.get(channel['id'])
+            self._eintraege[channel['id']] = (fingerprint, notifier)
+        if alt is not None and alt[1] is not notifier:
+            alt[1].close()
+        return notifier
+
+    def invalidate(self, channel_id=None):
+        """Verwirft einen Kanal -- oder ohne Argument alle."""
+        with self._lock:
+            if channel_id is None:
+                alte = list(self._eintraege.values())
+                self._eintraege.clear()
+            else:
+                eintrag = self._eintraege.pop(channel_id, None)
+                alte = [eintrag] if eintrag else []
+        for _, notifier in alte:
+            notifier.close()
+
+
+notifier_registry = NotifierRegistry()
+
+
+def get_channel_notifier(channel):
+    """Der (wiederverwendete) Notifier fuer eine Kanalzeile aus der Datenbank."""
+    return notifier_registry.get(channel)
+
+
+def invalidate_notifier(channel_id=None):
+    notifier_registry.invalidate(channel_id)
@@ -0,0 +1,256 @@
+"""Asynchroner Versand der Benachrichtigungen auf einem dauerhaften Eventloop.
+
+Die Notifier sind synchron: Jeder Versand hielt bis 1.7.x einen Scheduler-
+oder Gunicorn-Thread fuer bis zu zehn Sekunden fest, und der gleichzeitige
+Versand brauchte je Kanal einen eigenen Thread. Dieses Modul folgt dem Muster
+von ``bring_runtime``: Ein Daemon-Thread haelt einen Eventloop am Laufen,
+darin lebt eine gemeinsame ``aiohttp.ClientSession`` mit Verbindungspool.
+Hunderte Zustellungen laufen so nebeneinander, ohne je einen Thread.
+
+- HTTP-Notifier (``notifiers.HttpNotifier``) beschreiben ihre Requests mit
+  ``build_requests``; abgeschickt werden sie hier mit aiohttp -- mit denselben
+  Token-Buckets und derselben 429-Behandlung wie der synchrone Weg.
+- Mail laeuft ueber den SMTP-Pool (``notifiers.smtp_pool``) im Executor des
+  Loops. ``aiosmtplib`` ist keine Abhaengigkeit des Projekts; der Pool haelt
+  die Sitzungen ohnehin offen, der Thread wartet nur auf den Server.
+
+Aufrufer bleiben synchron::
+
+    from notify_runtime import get_notify_runtime
+    future = get_notify_runtime().submit(notifier, title, message)
+    future.result(30)
+
+    ergebnisse = get_notify_runtime().deliver([(schluessel, notifier, title, message), ...])
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+
+import aiohttp
+import requests
+
+from notifiers import (
+    HttpNotifier, RateLimited, get_bucket, reserve_send, check_response,
+    CHANNEL_DEADLINE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Hoechstzahl gleichzeitig offener Verbindungen der gemeinsamen Session
+CONNECTION_LIMIT = 100
+
+# Hoechstzahl gleichzeitig laufender Zustellungen. Die Frist einer
+# Zustellung beginnt erst, wenn sie hier an der Reihe ist.
+MAX_CONCURRENT_SENDS = 200
+
+
+class _Antwort:
+    """Bereits gelesene aiohttp-Antwort mit der Schnittstelle von ``requests``.
+
+    ``notifiers.check_response`` wertet damit beide Wege gleich aus.
+    """
+
+    def __init__(self, status, headers, body):
+        self.status_code = status
+        self.headers = headers
+        self._body = body
+
+    def json(self):
+        return json.loads(self._body.decode('utf-8', 'replace'))
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            auszug = self._body[:200].decode('utf-8', 'replace')
+            raise requests.HTTPError(f"{self.status_code} Fehler: {auszug}")
+
+
+class NotifyRuntime:
+    """Haelt Eventloop und aiohttp-Session fuer den Versand."""
+
+    def __init__(self):
+        # Schuetzt das Hochfahren von Thread und Loop (aufrufende Threads)
+        self._thread_lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+        # Alles Folgende wird ausschliesslich im Loop-Thread angefasst
+        self._session = None
+        self._semaphore = None
+
+    # ── Loop-Verwaltung ────────────────────────────────────────────────
+
+    def _ensure_loop(self):
+        """Startet den Loop-Thread beim ersten Aufruf (und nach Shutdown)."""
+        with self._thread_lock:
+            if self._loop is not None and not self._loop.is_closed():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=self._run_loop, args=(loop,),
+                name='notify-runtime', daemon=True,
+            )
+            thread.start()
+            self._loop = loop
+            self._thread = thread
+            # Session und Semaphore gehoeren zum Loop und entstehen mit ihm neu
+            self._session = None
+            self._semaphore = None
+            logger.debug("Notify-Runtime: Eventloop gestartet")
+            return loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    # ── Versand (laeuft im Loop-Thread) ────────────────────────────────
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def _http_post(self, url, timeout=10, **kwargs):
+        """Schickt den Request ab und liest die Antwort vollstaendig."""
+        session = self._get_session()
+        async with session.post(url, timeout=aiohttp.ClientTimeout(total=timeout),
+                                **kwargs) as resp:
+            return _Antwort(resp.status, resp.headers, await resp.read())
+
+    async def _post_limited(self, provider, credential, url, kwargs):
+        bucket = get_bucket(provider, credential)
+        for versuch in range(2):
+            delay = reserve_send(bucket)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            resp = await self._http_post(url, **kwargs)
+            wait_for = check_response(provider, bucket, resp)
+            if wait_for is None:
+                return
+        raise RateLimited(wait_for)
+
+    async def _send_http(self, notifier, title, message):
+        # Teilstuecke nacheinander, damit sie in ihrer Reihenfolge ankommen
+        for credential, url, kwargs in notifier.build_requests(title, message):
+            await self._post_limited(notifier.provider, credential, url, kwargs)
+        return True
+
+    async def _send(self, notifier, title, message):
+        if isinstance(notifier, HttpNotifier):
+            return await self._send_http(notifier, title, message)
+        # Mail und alles ohne HTTP-Beschreibung: synchron im Executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, notifier.send, title, message)
+
+    async def _deliver_one(self, notifier, title, message, deadline):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._send(notifier, title, message), deadline)
+                error = None
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"Keine Antwort nach {deadline}s")
+            except Exception as e:
+                error = e
+            return {
+                'ok': error is None,
+                'error': error,
+                'duration_ms': int((time.monotonic() - start) * 1000),
+            }
+
+    async def _deliver_all(self, sends, deadline):
+        ergebnisse = await asyncio.gather(*(
+            self._deliver_one(notifier, title, message, deadline)
+            for _, notifier, title, message in sends))
+        return {key: ergebnis for (key, *_), ergebnis in zip(sends, ergebnisse)}
+
+    async def _close_session(self):
+        session = self._session
+        self._session = None
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"Notify-Runtime: Session-Close fehlgeschlagen: {e}")
+
+    # ── Oeffentliche, synchrone Schnittstelle ──────────────────────────
+
+    def submit(self, notifier, title, message):
+        """Stellt eine Nachricht zu, ohne zu warten.
+
+        Returns:
+            ``concurrent.futures.Future`` -- ``result()`` liefert True oder
+            wirft die Ausnahme des Versands.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._send(notifier, title, message), loop)
+
+    def deliver(self, sends, deadline=CHANNEL_DEADLINE_SECONDS):
+        """Stellt mehrere Nachrichten gleichzeitig zu und wartet auf alle.
+
+        Args:
+            sends: Liste von (schluessel, notifier, titel, nachricht)
+            deadline: Sekunden je Zustellung, gemessen ab deren Start.
+                Eine HTTP-Zustellung ueber der Frist wird abgebrochen; Mail
+                laeuft im Executor zu Ende, ihr Ergebnis wird verworfen.
+
+        Returns:
+            dict schluessel -> {'ok', 'error', 'duration_ms'}. ``error`` ist
+            die Ausnahme der Zustellung, bei Fristablauf ein ``TimeoutError``.
+        """
+        if not sends:
+            return {}
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._deliver_all(list(sends), deadline), loop)
+        # Jede Zustellung hat ihre eigene Frist; die Warteschlange vor der
+        # Semaphore kann die Gesamtdauer darueber hinaus verlaengern.
+        runden = -(-len(sends) // MAX_CONCURRENT_SENDS)
+        return future.result(deadline * runden + 5)
+
+    def shutdown(self):
+        """Faehrt Session und Loop herunter (Prozessende)."""
+        with self._thread_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), loop).result(10)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        logger.debug("Notify-Runtime: heruntergefahren")
+
+
+# ── Modul-Singleton ────────────────────────────────────────────────────
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_notify_runtime():
+    """Liefert den prozessweiten Runtime (Singleton)."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = NotifyRuntime()
+        return _runtime
+
+
+@atexit.register
+def _shutdown_runtime():
+    with _runtime_lock:
+        rt = _runtime
+    if rt is not None:
+        rt.shutdown()
@@ -0,0 +1,157 @@
+"""Zustellung der Benachrichtigungen ueber eine Outbox in der Datenbank.
+
+Bis 1.7.x sendete ``run_check`` selbst: Warf ein Kanal eine Ausnahme, stand
+ein Fehler im Log und die Meldung war verloren. Der Tracker wurde trotzdem
+hochgezaehlt, das Wiederholungslimit hielt den gescheiterten Versand also
+fuer erfolgreich.
+
+Jetzt legt der Check seine Meldung je Kanal in ``notification_outbox`` ab
+(``enqueue``), und ``deliver_outbox`` stellt zu:
+
+- je Kanal hoechstens ein Versand gleichzeitig, die Kanaele untereinander
+  parallel auf dem Eventloop von ``notify_runtime``
+- nach einem Fehler neuer Versuch mit exponentiell wachsendem Abstand;
+  nennt der Dienst selbst eine Pause (``RateLimited``), gilt diese
+- nach ``MAX_ATTEMPTS`` Versuchen bleibt die Zeile als ``dead`` stehen und
+  laesst sich ueber die Schnittstelle erneut anstossen
+- der Tracker zaehlt erst, wenn ein Kanal die Meldung tatsaechlich
+  angenommen hat
+
+Die Zustellung ist "mindestens einmal": Laeuft ein Kanal in die Frist und
+antwortet danach doch noch, kommt die Meldung beim naechsten Versuch ein
+zweites Mal an. Das ist der kleinere Schaden als eine verlorene Warnung.
+"""
+
+import logging
+import math
+import random
+import threading
+import uuid
+
+from notifiers import get_channel_notifier, RateLimited
+from notify_runtime import get_notify_runtime
+from database import (
+    get_channels, enqueue_notifications,
+    claim_due_outbox, complete_outbox_entry, fail_outbox_entry
+)
+
+logger = logging.getLogger(__name__)
+
+# Versuche je Zeile, bevor sie als gescheitert liegen bleibt
+MAX_ATTEMPTS = 8
+
+# Abstand vor dem ersten Wiederholungsversuch; verdoppelt sich je Versuch
+BACKOFF_BASE_SECONDS = 60
+
+# Obergrenze fuer den Abstand zwischen zwei Versuchen
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+# Abstand, in dem der Scheduler die Outbox leert
+DELIVERY_INTERVAL_SECONDS = 60
+
+# Runden je Aufruf von deliver_outbox -- jede Runde bedient je Kanal eine Zeile
+MAX_ROUNDS = 20
+
+# Verhindert, dass Check und Scheduler-Job die Outbox gleichzeitig leeren.
+# Zwischen Prozessen sorgt die Reservierung in der Datenbank dafuer.
+_drain_lock = threading.Lock()
+
+
+def backoff_seconds(attempts):
+    """Wartezeit nach dem ``attempts``-ten Fehlversuch, mit +-10 % Streuung.
+
+    Die Streuung verhindert, dass mehrere Zeilen eines ausgefallenen Dienstes
+    spaeter im selben Augenblick wieder anklopfen.
+    """
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+    return int(delay * random.uniform(0.9, 1.1))
+
+
+def enqueue(title, message, alerts, active_keys, diff=None):
+    """Legt die Meldung eines Checks fuer alle aktiven Kanaele ab.
+
+    ``diff`` (inkrementeller Check) wandert mit der ersten erfolgreichen
+    Zustellung in den Alert-Snapshot.
+
+    Returns:
+        Die Kennung des Checks (``batch_id``) oder None ohne aktive Kanaele.
+    """
+    channels = [(ch['id'], ch['name']) for ch in get_channels() if ch['enabled']]
+    if not channels:
+        logger.info("Keine aktiven Kanaele, nichts zuzustellen.")
+        return None
+    batch_id = uuid.uuid4().hex
+    enqueue_notifications(batch_id, channels, title, message, alerts, active_keys,
+                          diff=diff)
+    return batch_id
+
+
+def _fehlschlag(entry, error):
+    """Traegt einen Fehlversuch ein: neuer Termin oder endgueltig gescheitert."""
+    if isinstance(error, RateLimited):
+        # Der Dienst hat die Pause selbst genannt -- genau so lange warten,
+        # ohne den Versuch zu zaehlen
+        retry_in = max(int(math.ceil(error.retry_after)), 1)
+        logger.info(f"{entry['channel_name']}: Sendegrenze, neuer Versuch in {retry_in}s")
+        fail_outbox_entry(entry['id'], error, retry_in=retry_in, count_attempt=False)
+        return 'retry'
+    attempts = entry['attempts'] + 1
+    if attempts >= MAX_ATTEMPTS:
+        logger.error(f"Zustellung an {entry['channel_name']} nach {attempts} "
+                     f"Versuchen aufgegeben: {error}")
+        fail_outbox_entry(entry['id'], error)
+        return 'dead'
+    retry_in = backoff_seconds(attempts)
+    logger.warning(f"Zustellung an {entry['channel_name']} fehlgeschlagen "
+                   f"(Versuch {attempts}), neuer Versuch in {retry_in}s: {error}")
+    fail_outbox_entry(entry['id'], error, retry_in=retry_in)
+    return 'retry'
+
+
+def deliver_outbox():
+    """Stellt alle faelligen Zeilen zu.
+
+    Returns:
+        dict mit den Zaehlern ``sent``, ``retry`` und ``dead`` -- oder None,
+        wenn gerade ein anderer Aufruf die Outbox leert.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return None
+    stats = {'sent': 0, 'retry': 0, 'dead': 0}
+    try:
+        for _ in range(MAX_ROUNDS):
+            entries = claim_due_outbox()
+            if not entries:
+                break
+            # Verschluesselt lesen: Die Registry entschluesselt nur Kanaele,
+            # deren Konfiguration sich seit dem letzten Versand geaendert hat
+            channels = {ch['id']: ch for ch in get_channels()}
+            sends = []
+            for entry in entries:
+                ch = channels.get(entry['channel_id'])
+                if ch is None or not ch['enabled']:
+                    # Kanal geloescht oder abgeschaltet: nicht weiter versuchen
+                    fail_outbox_entry(entry['id'], 'Kanal nicht mehr aktiv')
+                    stats['dead'] += 1
+                    continue
+                try:
+                    notifier = get_channel_notifier(ch)
+                except Exception as e:
+                    # Unbekannter Typ, kaputte Konfiguration: wie ein Fehlversuch
+                    stats[_fehlschlag(entry, e)] += 1
+                    continue
+                sends.append((entry['id'], notifier, entry['title'], entry['message']))
+
+            by_id = {entry['id']: entry for entry in entries}
+            for entry_id, result in get_notify_runtime().deliver(sends).items():
+                entry = by_id[entry_id]
+                if result['ok']:
+                    complete_outbox_entry(entry_id)
+                    stats['sent'] += 1
+                    logger.info(f"Benachrichtigung via {entry['channel_name']} "
+                                f"gesendet ({result['duration_ms']} ms).")
+                else:
+                    stats[_fehlschlag(entry, result['error'])] += 1
+    finally:
+        _drain_lock.release()
+    return stats
@@ -3,6 +3,8 @@ import os
 import logging
 from datetime import datetime
 
+from jobruns import phase, count
+
 logger = logging.getLogger(__name__)
 
 
@@ -441,7 +443,7 @@ def process_receipt(filepath, grocy_products, mappings_dict, threshold=70):
 
 def scan_receipt_folder(folder_path, grocy_products, mappings_dict, threshold=70):
     """Scannt einen Ordner nach neuen PDF-Dateien und verarbeitet sie."""
-    from database import receipt_filepath_exists, save_receipt, save_receipt_items
+    from database import receipt_filepath_exists, save_receipt_with_items
 
     if not os.path.isdir(folder_path):
         logger.warning(f"Kassenbon-Ordner existiert nicht: {folder_path}")
@@ -459,25 +461,26 @@ def scan_receipt_folder(folder_path, grocy_products, mappings_dict, threshold=70
 
         logger.info(f"Verarbeite Kassenbon: {fname}")
         try:
-            result = process_receipt(filepath, grocy_products, mappings_dict, threshold)
-
-            receipt_id = save_receipt(
-                filename=result['filename'],
-                filepath=result['filepath'],
-                status=result['status'],
-                extraction_method=result['extraction_method'],
-                store_name=result['parsed']['store_name'] if result['parsed'] else None,
-                receipt_date=result['parsed']['receipt_date'] if result['parsed'] else None,
-                total_amount=result['parsed']['total_amount'] if result['parsed'] else None,
-                raw_text=result['raw_text'],
-                error_message=result['error_message'],
-            )
-
-            if result['items']:
-                save_receipt_items(receipt_id, result['items'])
+            with phase('ocr'):
+                result = process_receipt(filepath, grocy_products, mappings_dict, threshold)
+
+            with phase('db_write'):
+                receipt_id = save_receipt_with_items(
+                    result['items'],
+                    filename=result['filename'],
+                    filepath=result['filepath'],
+                    status=result['status'],
+                    extraction_method=result['extraction_method'],
+                    store_name=result['parsed']['store_name'] if result['parsed'] else None,
+                    receipt_date=result['parsed']['receipt_date'] if result['parsed'] else None,
+                    total_amount=result['parsed']['total_amount'] if result['parsed'] else None,
+                    raw_text=result['raw_text'],
+                    error_message=result['error_message'],
+                )
 
             result['receipt_id'] = receipt_id
             results.append(result)
+            count('receipts')
         except Exception as e:
             logger.error(f"Fehler bei Verarbeitung von {fname}: {e}")
 
@@ -1,16 +1,21 @@
-import json
 import logging
-from datetime import datetime, timedelta
+from datetime import time as time_of_day
 from grocy_client import GrocyClient
-from notifiers import get_notifier
+from grocy_snapshot import snapshot_data
+from alert_rules import AlertRules, diff_alerts
+from outbox import enqueue
+from jobruns import phase, count, current_run
 import sprache
 from database import (
-    get_all_settings, get_channels_decrypted, get_product_overrides,
-    add_log_entry, get_tracker_entry, upsert_tracker_entry, cleanup_tracker
+    get_all_settings, get_product_overrides, get_tracker_entries, cleanup_tracker,
+    get_alert_snapshot, apply_alert_diff, clear_alert_snapshot
 )
 
 logger = logging.getLogger(__name__)
 
+# Abstand des guenstigen Abgleichs fuer den Weckruf (siehe ``next_wakeup``)
+RESYNC_INTERVAL_MINUTES = 30
+
 
 # Die Texte stehen seit 1.7.0 in `sprache.py` -- dieselbe Tabelle bedient
 # jetzt auch die Antworten der Schnittstelle, die Testnachricht und das Log
@@ -20,7 +25,52 @@ def _t(lang, key, **werte):
     return sprache.t(key, lang=lang, **werte)
 
 
+def _weckzeit(settings):
+    """Uhrzeit der Weckrufe an Schwellentagen aus ``event_check_time`` (HH:MM)."""
+    try:
+        stunde, minute = settings.get('event_check_time', '07:00').split(':')
+        return time_of_day(int(stunde), int(minute))
+    except (ValueError, AttributeError):
+        return time_of_day(7, 0)
+
+
+def next_wakeup():
+    """Naechster Schwellen-Uebertritt, ohne zu pruefen oder zu senden.
+
+    Der guenstige Abgleich zwischen den Checks: ein Abruf des Bestands, kein
+    Tracker, keine Outbox. Faengt Buchungen in Grocy ab, die den naechsten
+    Uebertritt verschieben.
+
+    Returns:
+        ``datetime`` oder None (kein Uebertritt bekannt, Grocy nicht
+        erreichbar oder nicht eingerichtet)
+    """
+    settings = get_all_settings()
+    if not settings.get('grocy_url') or not settings.get('grocy_api_key'):
+        return None
+    rules = AlertRules.compile(settings, get_product_overrides())
+    try:
+        stock = snapshot_data('stock', 'check_resync',
+                              GrocyClient(settings['grocy_url'], settings['grocy_api_key']))
+    except Exception as e:
+        logger.error(f"Grocy API Fehler: {e}")
+        return None
+    return rules.next_crossing(stock, at=_weckzeit(settings))
+
+
 def run_check():
+    """Prueft den Bestand und legt faellige Meldungen in die Outbox.
+
+    Mit ``check_mode = incremental`` wird der Stand mit dem letzten Check
+    verglichen (Tabelle ``alert_snapshot``) und nur gemeldet, was neu oder
+    geaendert ist.
+
+    Returns:
+        dict mit 'alerts' (Anzahl neuer Meldungen) und 'next_wakeup'
+        (``datetime`` des naechsten Schwellen-Uebertritts oder None), im
+        inkrementellen Modus dazu 'new', 'changed' und 'resolved' --
+        oder None, wenn Grocy nicht erreichbar bzw. nicht eingerichtet ist.
+    """
     logger.info("Starte Grocy Stock-Check...")
     settings = get_all_settings()
     lang = settings.get('language', 'de')
@@ -31,159 +81,77 @@ def run_check():
         logger.warning("Grocy nicht konfiguriert, Check übersprungen.")
         return
 
-    default_days = int(settings.get('default_days_before_expiry', 5))
-    notify_expiring = settings.get('notify_expiring', '1') == '1'
-    notify_expired = settings.get('notify_expired', '1') == '1'
-    notify_missing = settings.get('notify_missing', '1') == '1'
+    # Einstellungen, Overrides und Filter einmal je Lauf uebersetzen; die
+    # Auswertung je Position ist danach nur noch Nachschlagen und Vergleichen
+    rules = AlertRules.compile(settings, get_product_overrides())
 
     client = GrocyClient(grocy_url, api_key)
 
+    # Den ganzen Bestand einmal holen und je Produkt mit dessen eigener
+    # Warnschwelle zuschneiden -- /stock/volatile kennt nur die globale.
+    # Fehlmengen liefert nur /stock/volatile.
     try:
-        volatile = client.get_volatile_stock(due_soon_days=default_days)
+        with phase('grocy_fetch'):
+            # Aus dem Grocy-Snapshot: Liegen Bring-Sync oder Weckruf-Abgleich
+            # im selben Zyklus, kostet der Bestand nur einen Abruf
+            stock = snapshot_data('stock', 'check', client)
+            missing = []
+            if rules.notify_missing:
+                missing = snapshot_data('volatile', 'check', client,
+                                        due_soon_days=rules.default_days
+                                        ).get('missing_products', [])
     except Exception as e:
         logger.error(f"Grocy API Fehler: {e}")
+        current_run().fail(e)
         return
+    count('stock_entries', len(stock))
 
-    # Overrides als vollstaendige Dicts laden (inkl. custom_repeat_limit)
-    overrides = {o['product_id']: o for o in get_product_overrides()}
-
-    # Kategorie- und Lagerort-Filter (leer = alle)
-    allowed_groups_raw = settings.get('notify_product_groups', '')
-    allowed_locations_raw = settings.get('notify_locations', '')
-    allowed_groups = [int(x) for x in allowed_groups_raw.split(',') if x.strip().lstrip('-').isdigit()]
-    allowed_locations = [int(x) for x in allowed_locations_raw.split(',') if x.strip().lstrip('-').isdigit()]
-
-    def _is_filtered(item, product_id):
-        """Gibt True zurueck wenn das Produkt durch Kategorie/Lagerort-Filter ausgeschlossen wird.
-        Produkte mit explizitem Per-Produkt-Wiederholungslimit umgehen den Filter (Vorrang-Regel)."""
-        override = overrides.get(product_id)
-        # Wenn ein individuelles Wiederholungslimit gesetzt ist, Filter umgehen
-        if override is not None and override.get('custom_repeat_limit') is not None:
-            return False
-        product = item.get('product', item)
-        if allowed_groups:
-            pg = product.get('product_group_id')
-            if pg is not None and int(pg) not in allowed_groups:
-                return True
-        if allowed_locations:
-            loc = product.get('location_id')
-            if loc is not None and int(loc) not in allowed_locations:
-                return True
-        return False
-
-    alerts = []
-
-    if notify_expiring:
-        for item in volatile.get('due_products', []):
-            product_id = item.get('product_id') or item.get('product', {}).get('id')
-            product = item.get('product', {})
-            product_name = product.get('name', f'{_t(lang, "product_nr")} #{product_id}')
-            best_before = item.get('best_before_date', '')
-
-            if _is_filtered(item, product_id):
-                continue
-
-            if product_id in overrides:
-                custom_days = overrides[product_id]['custom_days_before_expiry']
-                if custom_days == 0:
-                    continue  # Benachrichtigungen fuer dieses Produkt deaktiviert
-                if custom_days > 0 and best_before:
-                    # Positiver Wert: individuelle Wartschwelle pruefen
-                    try:
-                        exp_date = datetime.strptime(best_before, '%Y-%m-%d')
-                        if exp_date > datetime.now() + timedelta(days=custom_days):
-                            continue
-                    except ValueError:
-                        pass
-                # custom_days == -1: globalen Standard verwenden (kein zusaetzlicher Check)
-
-            due_type = product.get('due_type', 1)
-            date_label = _t(lang, 'use_by_date') if due_type == 2 else _t(lang, 'expiry_date')
-            alerts.append({
-                'type': 'expiring',
-                'name': product_name,
-                'detail': f"{date_label}: {best_before}",
-                'product_id': str(product_id or ''),
-                'best_before': best_before,
-            })
-
-    if notify_expired:
-        for item in volatile.get('overdue_products', []) + volatile.get('expired_products', []):
-            product_id = item.get('product_id') or item.get('product', {}).get('id')
-            product = item.get('product', {})
-            product_name = product.get('name', _t(lang, 'unknown'))
-            best_before = item.get('best_before_date', '')
-
-            if _is_filtered(item, product_id):
-                continue
-
-            if product_id in overrides and overrides[product_id]['custom_days_before_expiry'] == 0:
-                continue  # Benachrichtigungen fuer dieses Produkt deaktiviert
-
-            due_type = product.get('due_type', 1)
-            date_label = _t(lang, 'use_by_since') if due_type == 2 else _t(lang, 'expired_since')
-            alerts.append({
-                'type': 'expired',
-                'name': product_name,
-                'detail': f"{date_label}: {best_before}",
-                'product_id': str(product_id or ''),
-                'best_before': best_before,
-            })
-
-    if notify_missing:
-        for item in volatile.get('missing_products', []):
-            product_id = item.get('id') or item.get('product_id') or item.get('product', {}).get('id')
-            product_name = item.get('product', {}).get('name', item.get('name', _t(lang, 'unknown')))
-            amount_missing = item.get('amount_missing', '?')
-
-            if _is_filtered(item, product_id):
-                continue
-
-            if product_id in overrides and overrides[product_id]['custom_days_before_expiry'] == 0:
-                continue  # Benachrichtigungen fuer dieses Produkt deaktiviert
-
-            alerts.append({
-                'type': 'missing',
-                'name': product_name,
-                'detail': f"{_t(lang, 'missing_amount')}: {amount_missing}",
-                'product_id': str(product_id or ''),
-                'best_before': '',
-            })
-
-    if not alerts:
-        logger.info("Keine Warnungen gefunden.")
-        return
-
-    global_repeat_limit = int(settings.get('notification_repeat_limit', '1'))
+    with phase('evaluate'):
+        alerts = rules.evaluate(rules.volatile_from_stock(stock, missing))
+        # Wann der naechste Eintrag eine Schwelle ueberschreitet, steht schon
+        # im Bestand; der Aufrufer plant dafuer einen Weckruf ein
+        summary = {'alerts': 0,
+                   'next_wakeup': rules.next_crossing(stock, at=_weckzeit(settings))}
+    count('alerts_found', len(alerts))
 
-    # Tracker bereinigen: Eintraege fuer Produkte, die nicht mehr im Alert-Zustand sind, loeschen
     active_keys = {(a['product_id'], a['type']) for a in alerts}
-    cleanup_tracker(active_keys)
-
-    # Alerts nach Wiederholungslimit filtern
-    # Prioritaet: Per-Produkt-Limit > Globales Limit (0 = unbegrenzt)
-    filtered = []
-    for alert in alerts:
-        override = overrides.get(alert['product_id'])
-        # Effektives Limit bestimmen: Per-Produkt hat Vorrang
-        if override is not None and override.get('custom_repeat_limit') is not None:
-            effective_limit = override['custom_repeat_limit']
-        else:
-            effective_limit = global_repeat_limit
-        if effective_limit > 0:
-            entry = get_tracker_entry(alert['product_id'], alert['type'])
-            if entry and entry['best_before_date'] == alert['best_before'] and entry['sent_count'] >= effective_limit:
-                logger.debug(
-                    f"Wiederholungslimit ({effective_limit}) erreicht fuer "
-                    f"{alert['name']} ({alert['type']}), uebersprungen"
-                )
-                continue
-        filtered.append(alert)
-    alerts = filtered
+    diff = None
+    if settings.get('check_mode', 'full') == 'incremental':
+        # Nur Zustandswechsel gegenueber dem letzten Check melden: Tracker,
+        # Outbox und Log sehen nur, was neu, geaendert oder erledigt ist
+        with phase('evaluate'):
+            diff = diff_alerts(get_alert_snapshot(), alerts)
+        summary.update({k: len(v) for k, v in diff.items()})
+        if not any(diff.values()):
+            logger.info("Keine Zustandswechsel seit dem letzten Check.")
+            return summary
+        alerts = diff['new'] + diff['changed']
+        if not alerts:
+            with phase('db_write'):
+                apply_alert_diff(diff, active_keys)
+            logger.info(f"{len(diff['resolved'])} Warnungen erledigt, nichts zu melden.")
+            return summary
+    else:
+        with phase('db_write'):
+            clear_alert_snapshot()
+        if not alerts:
+            logger.info("Keine Warnungen gefunden.")
+            return summary
+
+    # Tracker einmal komplett lesen statt je Alert eine Abfrage. Hochgezaehlt
+    # wird erst bei erfolgreicher Zustellung aus der Outbox.
+    with phase('evaluate'):
+        alerts = rules.filter_repeats(alerts, get_tracker_entries())
 
     if not alerts:
+        # Eintraege fuer Produkte, die nicht mehr im Alert-Zustand sind, loeschen
+        with phase('db_write'):
+            if diff is not None:
+                apply_alert_diff(diff, active_keys)
+            else:
+                cleanup_tracker(active_keys)
         logger.info("Keine neuen Warnungen (Wiederholungslimit fuer alle Produkte erreicht).")
-        return
+        return summary
 
     type_labels = {
         'expiring': _t(lang, 'type_expiring'),
@@ -197,23 +165,19 @@ def run_check():
     title = _t(lang, 'title').replace('{count}', str(len(alerts)))
     message = "\n".join(lines)
 
-    channels = get_channels_decrypted()
-    for ch in channels:
-        if not ch['enabled']:
-            continue
-        try:
-            config = json.loads(ch['config_json']) if isinstance(ch['config_json'], str) else ch['config_json']
-            notifier = get_notifier(ch['type'], config)
-            notifier.send(title, message)
-            for a in alerts:
-                add_log_entry(a['name'], a['type'], ch['name'], a['detail'], success=True)
-            logger.info(f"Benachrichtigung via {ch['name']} gesendet.")
-        except Exception as e:
-            import traceback
-            error_detail = traceback.format_exc()
-            logger.error(f"Fehler bei Kanal {ch['name']}: {error_detail}")
-            add_log_entry(None, 'error', ch['name'], str(e), success=False)
-
-    # Tracker aktualisieren: gesendete Alerts zaehlen
-    for alert in alerts:
-        upsert_tracker_entry(alert['product_id'], alert['type'], alert['best_before'])
+    # Nicht mehr selbst senden, sondern in die Outbox legen: Ein gescheiterter
+    # Kanal wird dort spaeter erneut bedient, und der Tracker zaehlt erst,
+    # wenn die Meldung tatsaechlich angekommen ist. Verwaiste Tracker-Eintraege
+    # werden in derselben Transaktion entfernt. Der Diff wandert erst mit der
+    # ersten Zustellung in den Snapshot; ohne aktiven Kanal bleibt er stehen
+    # -- die Wechsel werden gemeldet, sobald es einen gibt. Zugestellt wird
+    # im Worker (Auftrag ``outbox_delivery``), der Check wartet auf keinen Kanal.
+    with phase('db_write'):
+        batch_id = enqueue(title, message, alerts, active_keys, diff=diff)
+        if batch_id is None:
+            cleanup_tracker(active_keys)
+    if batch_id is None:
+        return summary
+    summary['alerts'] = len(alerts)
+    count('alerts_sent', len(alerts))
+    return summary
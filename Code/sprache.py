@@ -54,6 +54,9 @@ TEXTE = {
         'msg.sync_done': 'Synchronisation abgeschlossen!',
         'msg.channel_missing': 'Kanal nicht gefunden',
         'msg.grocy_missing': 'Grocy nicht konfiguriert',
+        'msg.events_busy': 'Zu viele Live-Verbindungen',
+        'msg.invalid_parameter': 'Ungültiger Parameter: {name}',
+        'msg.cursor_expired': 'Die Liste wurde inzwischen neu berechnet, bitte von vorn laden',
         'msg.receipt_missing': 'Kassenbon nicht gefunden',
         'msg.no_file': 'Keine Datei hochgeladen',
         'msg.pdf_only': 'Nur PDF-Dateien erlaubt',
@@ -81,6 +84,7 @@ TEXTE = {
         'log.receipt_summary_skipped': ('{receipt}: {added} gebucht, {failed} '
                                         'fehlgeschlagen, {skipped} ohne '
                                         'Zuordnung übersprungen'),
+        'log.outbox_dead': 'Zustellung nach {attempts} Versuchen aufgegeben: {error}',
     },
     'en': {
         'expiry_date': 'Best before date',
@@ -100,6 +104,9 @@ TEXTE = {
         'msg.sync_done': 'Synchronisation completed!',
         'msg.channel_missing': 'Channel not found',
         'msg.grocy_missing': 'Grocy is not configured',
+        'msg.events_busy': 'Too many live connections',
+        'msg.invalid_parameter': 'Invalid parameter: {name}',
+        'msg.cursor_expired': 'The list has been recomputed since, please load it from the start',
         'msg.receipt_missing': 'Receipt not found',
         'msg.no_file': 'No file uploaded',
         'msg.pdf_only': 'Only PDF files are allowed',
@@ -125,6 +132,7 @@ TEXTE = {
         'log.receipt_summary_skipped': ('{receipt}: {added} booked, {failed} '
                                         'failed, {skipped} skipped without '
                                         'assignment'),
+        'log.outbox_dead': 'Delivery given up after {attempts} attempts: {error}',
     },
 }
 
@@ -86,32 +86,130 @@ async function api(url, method = 'GET', body = null) {
     return resp.json();
 }
 
+// Hintergrund-Auftraege: Der POST liefert sofort eine Auftrags-ID, Phase und
+// Ergebnis kommen ueber den Live-Stream (Meldung "jobs") oder /api/jobs/<id>.
+// Liefert das Ergebnis in der Form der alten synchronen Antwort ({ok, message, ...}).
+const jobWaiters = {};
+
+function waitForJobEvent(jobId, ms) {
+    return new Promise(resolve => {
+        const timer = setTimeout(() => { delete jobWaiters[jobId]; resolve(null); }, ms);
+        jobWaiters[jobId] = job => { clearTimeout(timer); resolve(job); };
+    });
+}
+
+async function runJob(url) {
+    return followJob(await api(url, 'POST'));
+}
+
+// Wartet auf einen schon gestarteten Auftrag (Antwort 202 mit job_id)
+async function followJob(start) {
+    if (!start.job_id || start.status === undefined) return start;
+    for (;;) {
+        // Mit Live-Stream meldet sich der Auftrag selbst; die seltene Abfrage
+        // faengt eine Meldung ab, die vor dem Warten eintraf
+        const live = liveEvents && liveEvents.readyState === EventSource.OPEN;
+        const job = await waitForJobEvent(start.job_id, live ? 5000 : 1000)
+            || await api('/api/jobs/' + start.job_id);
+        if (job.status === 'done') return Object.assign({ ok: true }, job.result);
+        if (job.status === 'failed') return { ok: false, message: job.error, error: job.error };
+    }
+}
+
+// Live-Meldungen (/api/events): ein Stream je Tab. Der Server rechnet jede
+// Aenderung einmal fuer alle Tabs; die Seite zeichnet nur neu, was sichtbar
+// ist. Ohne Stream (alle Plaetze belegt) bleibt es beim Abfragen.
+let liveEvents = null;
+
+function activePage() {
+    const el = document.querySelector('.page.active');
+    return el ? el.id.replace('page-', '') : null;
+}
+
+function onLive(name, handler) {
+    liveEvents.addEventListener(name, e => {
+        try { handler(JSON.parse(e.data)); } catch (err) { console.error(name, err); }
+    });
+}
+
+function connectEvents() {
+    if (!window.EventSource) return;
+    liveEvents = new EventSource('/api/events');
+    onLive('dashboard', data => { if (activePage() === 'dashboard') renderDashboard(data); });
+    onLive('products', () => { if (activePage() === 'products') loadProducts(); });
+    onLive('log', data => {
+        if (!window._logData) return;  // Log noch nie geoeffnet: laedt beim Oeffnen
+        window._logData = data.reset ? [] : data.entries.concat(window._logData).slice(0, 200);
+        if (activePage() === 'log') renderLog();
+    });
+    onLive('runs', () => { if (activePage() === 'log') loadJobRuns(); });
+    onLive('sync', renderSyncStatus);
+    onLive('jobs', data => data.jobs.forEach(job => {
+        const waiter = jobWaiters[job.id];
+        if (waiter && (job.status === 'done' || job.status === 'failed')) {
+            delete jobWaiters[job.id];
+            waiter(job);
+        }
+    }));
+    onLive('resync', () => { const page = activePage(); if (page) loadPageData(page); });
+}
+
+function renderSyncStatus(data) {
+    const setSync = (id, value) => {
+        const el = document.getElementById(id);
+        if (el) el.textContent = value;
+    };
+    const setLast = (id, last, never) => {
+        const el = document.getElementById(id);
+        if (!el) return;
+        el.textContent = last || t(never);
+        el.style.fontSize = last ? '.9em' : '';
+    };
+    setSync('caldavTasks', data.caldav.tasks_synced || 0);
+    setSync('caldavChores', data.caldav.chores_synced || 0);
+    setLast('caldavLastSync', data.caldav.last_sync, 'cal.never');
+    setSync('bringItems', data.bring.items_synced || 0);
+    setLast('bringLastSync', data.bring.last_sync, 'bring.never');
+}
+
 // Dashboard
-async function loadDashboard() {
+// Die Antwort kommt vorberechnet aus dem Worker; fresh=true holt neu aus Grocy
+function fmtSnapshotTime(snapshot) {
+    if (!snapshot || !snapshot.fetched_at) return '-';
+    const d = new Date(snapshot.fetched_at.replace(' ', 'T') + 'Z');
+    return d.toLocaleTimeString(currentLang === 'en' ? 'en-US' : 'de-DE');
+}
+
+async function loadDashboard(fresh) {
     try {
-        const data = await api('/api/status');
-        if (data.error) {
-            document.getElementById('statExpiring').textContent = '-';
-            document.getElementById('statExpired').textContent = '-';
-            document.getElementById('statMissing').textContent = '-';
-            document.getElementById('statTotal').textContent = '-';
-            toast(data.error, 'error');
-            return;
-        }
-        document.getElementById('statExpiring').textContent = (data.due_products || []).length;
-        document.getElementById('statExpired').textContent = (data.overdue_products || []).length + (data.expired_products || []).length;
-        document.getElementById('statMissing').textContent = (data.missing_products || []).length;
-        document.getElementById('statTotal').textContent = data.total_products || 0;
-
-        fillProductTable('tableDue', data.due_products || [], ['name', 'amount', 'best_before_date']);
-        const expired = (data.overdue_products || []).concat(data.expired_products || []);
-        fillProductTable('tableExpired', expired, ['name', 'amount', 'best_before_date']);
-        fillMissingTable('tableMissing', data.missing_products || []);
+        renderDashboard(await api('/api/status' + (fresh ? '?fresh=1' : '')));
     } catch (e) {
         toast(t('dash.load_error') + ': ' + e.message, 'error');
     }
 }
 
+function renderDashboard(data) {
+    document.getElementById('dashFreshness').textContent = data.snapshot
+        ? t('dash.as_of').replace('{time}', fmtSnapshotTime(data.snapshot)) : '';
+    if (data.error) {
+        document.getElementById('statExpiring').textContent = '-';
+        document.getElementById('statExpired').textContent = '-';
+        document.getElementById('statMissing').textContent = '-';
+        document.getElementById('statTotal').textContent = '-';
+        toast(data.error, 'error');
+        return;
+    }
+    document.getElementById('statExpiring').textContent = (data.due_products || []).length;
+    document.getElementById('statExpired').textContent = (data.overdue_products || []).length + (data.expired_products || []).length;
+    document.getElementById('statMissing').textContent = (data.missing_products || []).length;
+    document.getElementById('statTotal').textContent = data.total_products || 0;
+
+    fillProductTable('tableDue', data.due_products || [], ['name', 'amount', 'best_before_date']);
+    const expired = (data.overdue_products || []).concat(data.expired_products || []);
+    fillProductTable('tableExpired', expired, ['name', 'amount', 'best_before_date']);
+    fillMissingTable('tableMissing', data.missing_products || []);
+}
+
 function fillProductTable(tableId, items, fields) {
     const tbody = document.querySelector('#' + tableId + ' tbody');
     if (!items.length) {
@@ -175,7 +273,7 @@ async function submitAddStock() {
         });
         toast(t('dash.stock_added'), 'success');
         closeAddStockModal();
-        loadDashboard();
+        loadDashboard(true);
     } catch (e) {
         toast(t('dash.stock_error') + ': ' + e.message, 'error');
     }
@@ -183,10 +281,10 @@ async function submitAddStock() {
 
 async function checkNow() {
     toast(t('dash.check_running'), 'info');
-    const data = await api('/api/check-now', 'POST');
+    const data = await runJob('/api/check-now');
     if (data.ok) {
         toast(data.message, 'success');
-        loadDashboard();
+        loadDashboard(true);
     } else {
         toast(data.message || t('gen.error'), 'error');
     }
@@ -346,21 +444,16 @@ async function testChannel(id) {
 }
 
 // Products
-async function loadProducts() {
-    try {
-        const data = await api('/api/products');
-        if (data.error) { toast(data.error, 'error'); return; }
-        const tbody = document.querySelector('#tableProducts tbody');
-        const products = data.products || [];
-        if (!products.length) {
-            tbody.innerHTML = '<tr class="empty-row"><td colspan="5">' + esc(t('prod.no_products')) + '</td></tr>';
-            return;
-        }
-        tbody.innerHTML = products.map(p => {
-            const hasDays = p.custom_days !== undefined && p.custom_days !== null;
-            const hasRepeat = p.custom_repeat_limit !== undefined && p.custom_repeat_limit !== null;
-            const hasOverride = hasDays || hasRepeat;
-            return `
+// Seitenweise vom Server (Suche, Seiten: catalog.py) statt alle auf einmal
+const PRODUCTS_PAGE_SIZE = 100;
+let productsCursor = null;
+let productSearchTimer = null;
+
+function productRow(p) {
+    const hasDays = p.custom_days !== undefined && p.custom_days !== null;
+    const hasRepeat = p.custom_repeat_limit !== undefined && p.custom_repeat_limit !== null;
+    const hasOverride = hasDays || hasRepeat;
+    return `
             <tr>
                 <td>${esc(p.name)}</td>
                 <td>${p.amount !== '-' && p.amount !== null ? p.amount : '-'}</td>
@@ -383,7 +476,37 @@ async function loadProducts() {
                     ${hasOverride ? '<button class="btn btn-sm btn-secondary" onclick="removeProductOverride(' + p.product_id + ')">' + esc(t('prod.reset')) + '</button>' : ''}
                 </td>
             </tr>`;
-        }).join('');
+}
+
+function searchProducts() {
+    clearTimeout(productSearchTimer);
+    productSearchTimer = setTimeout(() => loadProducts(), 250);
+}
+
+async function loadProducts(more = false) {
+    try {
+        const params = new URLSearchParams({ limit: PRODUCTS_PAGE_SIZE });
+        const q = (document.getElementById('productSearch').value || '').trim();
+        if (q) params.set('q', q);
+        if (more && productsCursor) params.set('cursor', productsCursor);
+        const data = await api('/api/products?' + params);
+        // Liste inzwischen neu berechnet: von vorn statt mit verschobenen Zeilen
+        if (data.cursor_expired) return loadProducts();
+        if (data.error) { toast(data.error, 'error'); return; }
+        const tbody = document.querySelector('#tableProducts tbody');
+        const products = data.products || [];
+        productsCursor = data.next_cursor || null;
+        document.getElementById('productsMore').style.display = productsCursor ? '' : 'none';
+        document.getElementById('productCount').textContent =
+            data.total ? t('prod.count').replace('{shown}', (more ? tbody.rows.length : 0) + products.length)
+                .replace('{total}', data.total) : '';
+        if (!more && !products.length) {
+            tbody.innerHTML = '<tr class="empty-row"><td colspan="5">' + esc(t(q ? 'prod.no_matches' : 'prod.no_products')) + '</td></tr>';
+            return;
+        }
+        const rows = products.map(productRow).join('');
+        if (more) tbody.insertAdjacentHTML('beforeend', rows);
+        else tbody.innerHTML = rows;
     } catch (e) {
         toast(t('gen.error') + ': ' + e.message, 'error');
     }
@@ -497,6 +620,59 @@ async function loadLog() {
         statusSelect.value = current;
     }
     renderLog();
+    loadJobRuns();
+}
+
+// Job-Laufzeiten: je Lauf die Phasen, nach Dauer sortiert -- die langsamste
+// steht vorn und ist hervorgehoben
+function fmtMs(ms) {
+    return ms >= 1000 ? (ms / 1000).toFixed(1) + ' s' : Math.round(ms) + ' ms';
+}
+
+function showRunError(id) {
+    showErrorDetail(t('runs.error_title'), (window._runErrors || {})[id] || t('log.no_details'));
+}
+
+async function loadJobRuns() {
+    try {
+        const data = await api('/api/job-runs');
+        const sumBody = document.querySelector('#tableJobRunSummary tbody');
+        const jobs = Object.keys(data.summary || {}).sort();
+        sumBody.innerHTML = jobs.length ? jobs.map(job => {
+            const s = data.summary[job];
+            const slow = s.slowest_phase ? `${esc(s.slowest_phase)} (${fmtMs(s.phases[s.slowest_phase])})` : '-';
+            return `<tr><td>${esc(job)}</td><td>${s.runs}</td><td>${fmtMs(s.avg_ms)}</td><td>${fmtMs(s.max_ms)}</td><td>${slow}</td><td>${s.errors}</td></tr>`;
+        }).join('') : '<tr class="empty-row"><td colspan="6">' + esc(t('runs.none')) + '</td></tr>';
+
+        const tbody = document.querySelector('#tableJobRuns tbody');
+        const runs = data.runs || [];
+        if (!runs.length) {
+            tbody.innerHTML = '<tr class="empty-row"><td colspan="7">' + esc(t('runs.none')) + '</td></tr>';
+            return;
+        }
+        window._runErrors = {};
+        tbody.innerHTML = runs.map(r => {
+            const phases = Object.entries(r.phases || {}).sort((a, b) => b[1].ms - a[1].ms)
+                .map(([name, p], i) => (i === 0 ? '<strong>' : '') + esc(name) + ' ' + fmtMs(p.ms) + (i === 0 ? '</strong>' : ''))
+                .join(' · ');
+            const counts = Object.entries(r.counts || {}).map(([k, v]) => esc(k) + ': ' + v).join(', ');
+            const status = r.status === 'ok'
+                ? '<span style="color:var(--success)">' + esc(t('log.status_ok')) + '</span>'
+                : `<span style="color:var(--danger);cursor:pointer" title="${esc(t('log.click_details'))}" onclick="showRunError(${r.id})">${esc(t('log.status_error'))}</span>`;
+            if (r.status !== 'ok') window._runErrors[r.id] = r.error;
+            return `<tr>
+                <td>${esc(r.started_at)}</td>
+                <td>${esc(r.job)}</td>
+                <td>${esc(t('runs.source_' + r.source))}</td>
+                <td>${fmtMs(r.duration_ms)}</td>
+                <td>${phases || '-'}</td>
+                <td>${counts || '-'}</td>
+                <td>${status}</td>
+            </tr>`;
+        }).join('');
+    } catch (e) {
+        toast(t('gen.error') + ': ' + e.message, 'error');
+    }
 }
 
 function renderLog() {
@@ -607,6 +783,7 @@ async function loadSettings() {
     document.getElementById('setNotifyMissing').checked = s.notify_missing !== '0';
     document.getElementById('setVerifySsl').checked = s.grocy_verify_ssl !== '0';
     document.getElementById('setRepeatLimit').value = s.notification_repeat_limit !== undefined ? s.notification_repeat_limit : '1';
+    document.getElementById('setCheckIncremental').checked = s.check_mode === 'incremental';
     const langSel = document.getElementById('langSelect');
     if (langSel) langSel.value = currentLang;
     document.getElementById('setReceiptFolder').value = s.receipt_watch_folder || '/app/receipts';
@@ -707,6 +884,7 @@ async function saveSettings(e) {
         notify_missing: document.getElementById('setNotifyMissing').checked ? '1' : '0',
         grocy_verify_ssl: document.getElementById('setVerifySsl').checked ? '1' : '0',
         notification_repeat_limit: document.getElementById('setRepeatLimit').value,
+        check_mode: document.getElementById('setCheckIncremental').checked ? 'incremental' : 'full',
         notify_product_groups: getSelectedFilterIds('filterGroupsContainer'),
         notify_locations: getSelectedFilterIds('filterLocationsContainer'),
         receipt_watch_folder: document.getElementById('setReceiptFolder').value,
@@ -871,7 +1049,7 @@ async function saveCaldavSettings() {
 
 async function caldavSyncNow() {
     toast(t('cal.sync_running'), 'info');
-    const data = await api('/api/caldav/sync-now', 'POST');
+    const data = await runJob('/api/caldav/sync-now');
     if (data.ok) {
         let msg = data.message;
         if (data.stats) {
@@ -1304,7 +1482,7 @@ async function saveBringSettings() {
 
 async function bringSyncNow() {
     toast(t('bring.sync_running'), 'info');
-    const data = await api('/api/bring/sync-now', 'POST');
+    const data = await runJob('/api/bring/sync-now');
     if (data.ok) {
         let msg = data.message;
         toast(msg, 'success');
@@ -1414,7 +1592,7 @@ async function uploadReceipt(file) {
     toast(t('rcpt.uploading'), 'info');
     try {
         const resp = await fetch('/api/receipts/upload', { method: 'POST', body: formData });
-        const data = await resp.json();
+        const data = await followJob(await resp.json());
         if (data.ok) {
             toast(data.items_count + ' ' + t('rcpt.th_items'), 'success');
             loadReceipts();
@@ -1468,7 +1646,7 @@ async function openReceiptReview(receiptId) {
         // Grocy-Produkte laden fuer Dropdown
         if (!window._grocyProducts.length) {
             try {
-                const pdata = await api('/api/products');
+                const pdata = await api('/api/products?fields=product_id,name');
                 window._grocyProducts = (pdata.products || []).map(p => ({ id: p.product_id, name: p.name }));
             } catch(e) { /* ignore */ }
         }
@@ -1929,7 +2107,7 @@ async function deleteReceipt(id) {
 
 async function reprocessReceipt(id) {
     try {
-        const data = await api('/api/receipts/reprocess/' + id, 'POST');
+        const data = await runJob('/api/receipts/reprocess/' + id);
         if (data.ok) {
             toast(t('rcpt.reprocessed'), 'success');
             loadReceipts();
@@ -1968,6 +2146,7 @@ async function deleteMapping(id) {
 
 // Init
 loadDashboard();
+connectEvents();
 
 
 // ---------------------------------------------------------------------------
@@ -17,6 +17,8 @@ const I18N = {
     // Dashboard
     'dash.title': 'Dashboard',
     'dash.check_now': 'Jetzt prüfen',
+    'dash.reload': 'Neu laden',
+    'dash.as_of': 'Stand aus Grocy: {time}',
     'dash.expiring': 'Bald ablaufend',
     'dash.expired': 'Abgelaufen',
     'dash.missing': 'Unter Mindestbestand',
@@ -96,6 +98,10 @@ const I18N = {
     'prod.no_products': 'Keine Produkte gefunden. Bitte Grocy konfigurieren.',
     'prod.saved': 'Einstellungen gespeichert.',
     'prod.override_removed': 'Override entfernt.',
+    'prod.search': 'Produkt suchen...',
+    'prod.no_matches': 'Kein Produkt passt zur Suche.',
+    'prod.count': '{shown} von {total} Produkten',
+    'prod.load_more': 'Mehr laden',
 
     // Dashboard: Bestand hinzufügen
     'dash.th_action': 'Aktion',
@@ -122,6 +128,24 @@ const I18N = {
     'log.no_entries': 'Keine Log-Einträge vorhanden.',
     'log.click_details': 'Klicken für Details',
     'log.no_details': 'Keine Details verfügbar',
+    'runs.title': 'Job-Laufzeiten',
+    'runs.refresh': 'Aktualisieren',
+    'runs.none': 'Noch keine Läufe aufgezeichnet.',
+    'runs.th_time': 'Zeitpunkt',
+    'runs.th_job': 'Job',
+    'runs.th_source': 'Auslöser',
+    'runs.th_duration': 'Dauer',
+    'runs.th_phases': 'Phasen',
+    'runs.th_counts': 'Mengen',
+    'runs.th_status': 'Status',
+    'runs.th_runs': 'Läufe',
+    'runs.th_avg': 'Ø Dauer',
+    'runs.th_max': 'Max. Dauer',
+    'runs.th_slowest': 'Langsamste Phase (Ø)',
+    'runs.th_errors': 'Fehler',
+    'runs.source_schedule': 'Zeitplan',
+    'runs.source_manual': 'Manuell',
+    'runs.error_title': 'Fehler im Job-Lauf',
     'log.error_title': 'Fehlerdetails',
     // Log types
     'log.type_expiring': 'Ablaufend',
@@ -287,6 +311,7 @@ const I18N = {
     'set.notify_missing': 'Benachrichtigung bei Mindestbestand-Unterschreitung',
     'set.repeat_limit': 'Benachrichtigungswiederholung pro Produkt',
     'set.repeat_hint': '× pro Produkt und Alarmzustand (0 = immer, Standard: 1)',
+    'set.check_incremental': 'Nur Änderungen melden (neue, geänderte Warnungen seit dem letzten Check)',
     'set.filter_groups': 'Kategorien benachrichtigen (leer = alle)',
     'set.filter_locations': 'Lagerorte benachrichtigen (leer = alle)',
     'set.filter_loading': 'Laden...',
@@ -423,6 +448,8 @@ const I18N = {
     // Dashboard
     'dash.title': 'Dashboard',
     'dash.check_now': 'Check now',
+    'dash.reload': 'Reload',
+    'dash.as_of': 'Grocy data as of {time}',
     'dash.expiring': 'Expiring soon',
     'dash.expired': 'Expired',
     'dash.missing': 'Below minimum stock',
@@ -502,6 +529,10 @@ const I18N = {
     'prod.no_products': 'No products found. Please configure Grocy.',
     'prod.saved': 'Settings saved.',
     'prod.override_removed': 'Override removed.',
+    'prod.search': 'Search products...',
+    'prod.no_matches': 'No product matches the search.',
+    'prod.count': '{shown} of {total} products',
+    'prod.load_more': 'Load more',
 
     // Dashboard: add stock
     'dash.th_action': 'Action',
@@ -528,6 +559,24 @@ const I18N = {
     'log.no_entries': 'No log entries.',
     'log.click_details': 'Click for details',
     'log.no_details': 'No details available',
+    'runs.title': 'Job run times',
+    'runs.refresh': 'Refresh',
+    'runs.none': 'No runs recorded yet.',
+    'runs.th_time': 'Time',
+    'runs.th_job': 'Job',
+    'runs.th_source': 'Trigger',
+    'runs.th_duration': 'Duration',
+    'runs.th_phases': 'Phases',
+    'runs.th_counts': 'Counts',
+    'runs.th_status': 'Status',
+    'runs.th_runs': 'Runs',
+    'runs.th_avg': 'Avg. duration',
+    'runs.th_max': 'Max. duration',
+    'runs.th_slowest': 'Slowest phase (avg.)',
+    'runs.th_errors': 'Errors',
+    'runs.source_schedule': 'Schedule',
+    'runs.source_manual': 'Manual',
+    'runs.error_title': 'Job run error',
     'log.error_title': 'Error details',
     // Log types
     'log.type_expiring': 'Expiring',
@@ -693,6 +742,7 @@ const I18N = {
     'set.notify_missing': 'Notify when below minimum stock',
     'set.repeat_limit': 'Notification repeat per product',
     'set.repeat_hint': '× per product and alert state (0 = always, default: 1)',
+    'set.check_incremental': 'Only report changes (new or changed alerts since the last check)',
     'set.filter_groups': 'Notify categories (empty = all)',
     'set.filter_locations': 'Notify locations (empty = all)',
     'set.filter_loading': 'Loading...',
@@ -14,6 +14,11 @@ import pytest
 # Die Module liegen eine Ebene ueber diesem Verzeichnis
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# ``import app`` startet mit der Rolle ``all`` Scheduler und Warteschlange --
+# im Testlauf liefen dann echte Jobs gegen ``Code/data``. Tests, die den
+# Scheduler brauchen, starten ihn selbst.
+os.environ['GROCYLINK_ROLE'] = 'web'
+
 
 # ── Attrappen fuer die Antworttypen der Library ────────────────────────
 
@@ -138,3 +143,27 @@ def fake_bring(monkeypatch):
     # Gecachten Client verwerfen, damit der naechste Test frisch einloggt
     get_runtime().invalidate()
     FakeBring.reset()
+
+
+@pytest.fixture(autouse=True)
+def frischer_grocy_snapshot():
+    """Jeder Test beginnt ohne zwischengespeicherten Grocy-Stand.
+
+    Der Snapshot lebt je Prozess; ohne diesen Schritt saehe ein Test die
+    Grocy-Attrappe eines vorherigen.
+    """
+    from grocy_snapshot import get_snapshot
+    get_snapshot().clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def schluessel_im_tempverzeichnis(monkeypatch, tmp_path):
+    """Verschluesselte Einstellungen nutzen einen Schluessel im Temp-Verzeichnis.
+
+    Sonst legte der erste ``save_settings`` mit Grocy-Key oder Passwort einen
+    echten Fernet-Schluessel unter ``Code/data/.encryption_key`` an.
+    """
+    import crypto
+    monkeypatch.setattr(crypto, 'KEY_PATH', str(tmp_path / 'data' / '.encryption_key'))
+    yield
@@ -0,0 +1,152 @@
+"""Tests fuer das Regelwerk des Stock-Checks (``alert_rules``).
+
+Ohne Grocy und ohne Datenbank: Einstellungen, Overrides und die Antwort von
+``/stock/volatile`` werden direkt uebergeben, "jetzt" ist fest.
+"""
+
+from datetime import datetime, time
+
+from alert_rules import AlertRules, benchmark, diff_alerts
+
+JETZT = datetime(2026, 10, 19, 14, 30)
+
+
+def _due(pid, mhd, **product):
+    return {'product_id': pid, 'best_before_date': mhd,
+            'product': dict({'id': pid, 'name': f'P{pid}'}, **product)}
+
+
+def _override(pid, days=-1, limit=None):
+    return {'product_id': pid, 'custom_days_before_expiry': days,
+            'custom_repeat_limit': limit}
+
+
+def _alerts(volatile, settings=None, overrides=()):
+    regeln = AlertRules.compile(settings or {}, list(overrides), now=JETZT)
+    return regeln.evaluate(volatile)
+
+
+def test_individuelle_warnschwelle_in_tagen():
+    volatile = {'due_products': [_due(1, '2026-10-21'), _due(2, '2026-10-23'),
+                                 _due(3, '2026-10-22')]}
+    # Schwelle 3 Tage: bis einschliesslich 22.10. melden, 23.10. nicht
+    alerts = _alerts(volatile, overrides=[_override(1, 3), _override(2, 3), _override(3, 3)])
+    assert [a['product_id'] for a in alerts] == ['1', '3']
+
+
+def test_override_null_schaltet_das_produkt_ab():
+    volatile = {'due_products': [_due(1, '2026-10-20')],
+                'expired_products': [_due(1, '2026-10-01')],
+                'missing_products': [{'id': 1, 'name': 'P1', 'amount_missing': 2}]}
+    assert _alerts(volatile, overrides=[_override(1, 0)]) == []
+
+
+def test_filter_fuer_kategorie_und_lagerort():
+    volatile = {'due_products': [
+        _due(1, '2026-10-20', product_group_id=4, location_id=1),
+        _due(2, '2026-10-20', product_group_id=5, location_id=1),
+        _due(3, '2026-10-20', product_group_id=4, location_id=2),
+    ]}
+    settings = {'notify_product_groups': '4', 'notify_locations': '1'}
+    assert [a['product_id'] for a in _alerts(volatile, settings)] == ['1']
+
+
+def test_eigenes_wiederholungslimit_umgeht_den_filter():
+    volatile = {'due_products': [_due(2, '2026-10-20', product_group_id=5)]}
+    alerts = _alerts(volatile, {'notify_product_groups': '4'}, [_override(2, limit=3)])
+    assert [a['product_id'] for a in alerts] == ['2']
+
+
+def test_texte_und_typen_wie_bisher():
+    volatile = {'due_products': [_due(1, '2026-10-20', due_type=2)],
+                'overdue_products': [_due(2, '2026-10-01')],
+                'missing_products': [{'id': 3, 'name': 'Mehl', 'amount_missing': 2}]}
+    alerts = _alerts(volatile, {'language': 'de'})
+    assert [(a['type'], a['detail']) for a in alerts] == [
+        ('expiring', 'Verbrauchsdatum: 2026-10-20'),
+        ('expired', 'Abgelaufen seit (MHD): 2026-10-01'),
+        ('missing', 'Fehlmenge: 2'),
+    ]
+
+
+def test_wiederholungslimit_je_produkt_greift():
+    """Bis 1.7.x wurde das Override mit der Text-ID des Alerts gesucht und nie gefunden."""
+    regeln = AlertRules.compile({'notification_repeat_limit': '1'},
+                                [_override(1, limit=3)], now=JETZT)
+    alerts = regeln.evaluate({'due_products': [_due(1, '2026-10-20'), _due(2, '2026-10-20')]})
+    tracker = {
+        ('1', 'expiring'): {'best_before_date': '2026-10-20', 'sent_count': 2},
+        ('2', 'expiring'): {'best_before_date': '2026-10-20', 'sent_count': 1},
+    }
+    assert [a['product_id'] for a in regeln.filter_repeats(alerts, tracker)] == ['1']
+
+
+def test_zehntausende_positionen_in_kurzer_zeit():
+    dauer, treffer = benchmark(20000)
+    assert treffer > 0
+    assert dauer < 2
+
+
+def _stock(pid, mhd, due_type=1):
+    return _due(pid, mhd, due_type=due_type)
+
+
+def test_override_kann_das_fenster_vergroessern():
+    """Mit globalen 5 Tagen kam ein 30-Tage-Override ueber /stock/volatile nie an."""
+    regeln = AlertRules.compile({'default_days_before_expiry': '5'},
+                                [_override(1, 30)], now=JETZT)
+    stock = [_stock(1, '2026-11-08'), _stock(2, '2026-11-08'),
+             _stock(1, '2026-11-19'), _stock(3, '2026-10-24')]
+    volatile = regeln.volatile_from_stock(stock)
+    assert [(e['product_id'], e['best_before_date']) for e in volatile['due_products']] == [
+        (3, '2026-10-24'), (1, '2026-11-08')]
+
+
+def test_ueberfaellig_und_abgelaufen_nach_mhd_art():
+    regeln = AlertRules.compile({}, [], now=JETZT)
+    volatile = regeln.volatile_from_stock(
+        [_stock(1, '2026-10-18', due_type=1), _stock(2, '2026-10-10', due_type=2),
+         _stock(3, '2026-10-19'), _stock(4, '2999-12-31')],
+        missing_products=[{'id': 9}])
+    assert [e['product_id'] for e in volatile['overdue_products']] == [1]
+    assert [e['product_id'] for e in volatile['expired_products']] == [2]
+    # Heute faellig zaehlt als "bald", "nie" gar nicht
+    assert [e['product_id'] for e in volatile['due_products']] == [3]
+    assert volatile['missing_products'] == [{'id': 9}]
+
+
+def test_naechster_uebertritt_je_produktschwelle():
+    regeln = AlertRules.compile({'default_days_before_expiry': '5'},
+                                [_override(1, 30), _override(3, 0)], now=JETZT)
+    stock = [_stock(1, '2026-12-01'), _stock(2, '2026-10-30'),
+             _stock(3, '2026-10-21'), _stock(4, '2026-10-19')]
+    # P1: Schwelle am 1.11., P2: am 25.10., P3 abgeschaltet,
+    # P4 ist heute faellig und wird morgen ueberfaellig
+    assert regeln.next_crossing(stock) == datetime(2026, 10, 20)
+    assert regeln.next_crossing(stock[:3]) == datetime(2026, 10, 25)
+
+
+def test_weckzeit_und_abgeschaltete_benachrichtigungen():
+    regeln = AlertRules.compile({'notify_expiring': '0'}, [], now=JETZT)
+    # Nur noch "ueberfaellig" zaehlt: der Tag nach dem MHD
+    assert regeln.next_crossing([_stock(1, '2026-10-22')], at=time(7, 30)) == \
+        datetime(2026, 10, 23, 7, 30)
+    assert regeln.next_crossing([_stock(1, '2999-12-31')]) is None
+
+
+def test_diff_meldet_nur_zustandswechsel():
+    alt = {('1', 'expiring', '2026-10-20'): {'name': 'P1', 'detail': 'MHD: 2026-10-20'},
+           ('2', 'missing', ''): {'name': 'P2', 'detail': 'Fehlmenge: 1'},
+           ('3', 'expired', '2026-10-01'): {'name': 'P3', 'detail': 'x'}}
+    alerts = [
+        {'product_id': '1', 'type': 'expiring', 'best_before': '2026-10-20',
+         'name': 'P1', 'detail': 'MHD: 2026-10-20'},
+        {'product_id': '2', 'type': 'missing', 'best_before': '',
+         'name': 'P2', 'detail': 'Fehlmenge: 3'},
+        {'product_id': '4', 'type': 'expiring', 'best_before': '2026-10-21',
+         'name': 'P4', 'detail': 'MHD: 2026-10-21'},
+    ]
+    diff = diff_alerts(alt, alerts)
+    assert [a['product_id'] for a in diff['new']] == ['4']
+    assert [a['product_id'] for a in diff['changed']] == ['2']
+    assert diff['resolved'] == [('3', 'expired', '2026-10-01')]
@@ -6,6 +6,8 @@ fest, dass ein Sync die Liste nur ein einziges Mal abruft - bis v1.4.x
 holte die Engine sie nach jedem neu angelegten Eintrag komplett neu.
 """
 
+import threading
+
 import pytest
 
 import bring_sync
@@ -59,6 +61,8 @@ def umgebung(monkeypatch):
         'overrides': {},
         'upserts': [],
         'deletes': [],
+        'commits': 0,
+        'commit_threads': [],
         'logs': [],
         'grocy': FakeGrocy(),
     }
@@ -71,13 +75,17 @@ def umgebung(monkeypatch):
                         lambda: dict(zustand['overrides']))
     monkeypatch.setattr(bring_sync, 'GrocyClient',
                         lambda *a, **kw: zustand['grocy'])
-    monkeypatch.setattr(
-        bring_sync, 'upsert_bring_sync_entry',
-        lambda pid, uuid, name, spec: zustand['upserts'].append(
-            {'product_id': pid, 'uuid': uuid, 'name': name, 'spec': spec}))
-    monkeypatch.setattr(
-        bring_sync, 'delete_bring_sync_entry',
-        lambda pid: zustand['deletes'].append(pid))
+
+    def aenderungen_nachziehen(upserts, deletes):
+        zustand['deletes'].extend(deletes)
+        zustand['upserts'].extend(
+            {'product_id': pid, 'uuid': uuid, 'name': name, 'spec': spec}
+            for pid, uuid, name, spec in upserts)
+        zustand['commits'] += 1
+        zustand['commit_threads'].append(threading.current_thread().name)
+
+    monkeypatch.setattr(bring_sync, 'apply_bring_sync_changes',
+                        aenderungen_nachziehen)
     monkeypatch.setattr(
         bring_sync, 'add_log_entry',
         lambda *a, **kw: zustand['logs'].append((a, kw)))
@@ -495,6 +503,59 @@ def test_grosse_mengen_werden_gestueckelt(umgebung, fake_bring, monkeypatch):
     assert fake_bring.instances[0].count('batch_update_list') == 2
 
 
+def test_sync_map_wird_je_sync_in_einem_zug_nachgezogen(umgebung, fake_bring,
+                                                        monkeypatch):
+    """Neue und unveraenderte Items ueber zwei Bloecke: ein Commit insgesamt.
+
+    Geschrieben wird im aufrufenden Thread, nicht im Eventloop des Runtimes.
+    """
+    monkeypatch.setattr(BringSync, 'BATCH_CHUNK_SIZE', 1)
+    umgebung['grocy'].shopping_list = [
+        {'product_id': 10, 'amount': 1, 'qu_id': 2},
+        {'product_id': 11, 'amount': 1, 'qu_id': 1},
+        {'product_id': 12, 'amount': 1, 'qu_id': 1},
+    ]
+
+    def mit_bestand(bring):
+        bring.purchase = [FakePurchase('Milch', '1 Flasche', 'uuid-10')]
+        return bring
+
+    _vorbereiten(fake_bring, mit_bestand, umgebung)
+    stats = BringSync().sync_all()
+
+    assert stats['skipped'] == 1 and stats['added'] == 2
+    assert fake_bring.instances[0].count('batch_update_list') == 2
+    assert umgebung['commits'] == 1
+    assert sorted(u['product_id'] for u in umgebung['upserts']) == [10, 11, 12]
+    assert umgebung['commit_threads'] == [threading.current_thread().name]
+
+
+def test_abbruch_nach_dem_ersten_block_behaelt_dessen_zuordnung(
+        umgebung, fake_bring, monkeypatch):
+    """Scheitert ein spaeterer Block, bleibt die sync_map fuer die frueheren."""
+    monkeypatch.setattr(BringSync, 'BATCH_CHUNK_SIZE', 1)
+    umgebung['grocy'].shopping_list = [
+        {'product_id': 10, 'amount': 1, 'qu_id': 2},
+        {'product_id': 11, 'amount': 1, 'qu_id': 1},
+    ]
+    original = BringSync._apply_changes
+    bloecke = []
+
+    async def zweiter_bricht_ab(self, bring, list_uuid, chunk, stats):
+        bloecke.append(chunk)
+        if len(bloecke) > 1:
+            raise RuntimeError("Verbindung weg")
+        return await original(self, bring, list_uuid, chunk, stats)
+
+    monkeypatch.setattr(BringSync, '_apply_changes', zweiter_bricht_ab)
+    with pytest.raises(RuntimeError, match='Verbindung weg'):
+        BringSync().sync_all()
+
+    assert umgebung['commits'] == 1
+    assert [u['product_id'] for u in umgebung['upserts']] == [
+        bloecke[0][0]['product_id']]
+
+
 def test_chunked_zerlegt_korrekt():
     assert list(bring_sync._chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
     assert list(bring_sync._chunked([], 2)) == []
@@ -0,0 +1,99 @@
+"""Tests fuer die Sync-Map-Behandlung der CalDAV-Engine.
+
+Kalender und Grocy sind Attrappen, die Datenbank wird umgebogen. Geprueft
+wird, dass die Sync-Map einmal je Lauf geladen und je Phase einmal
+geschrieben wird -- statt einer Abfrage und einem Commit je Aufgabe.
+"""
+
+import pytest
+
+import caldav_sync
+from caldav_sync import CalDAVSync
+
+
+class FakeCalendar:
+    def __init__(self):
+        self.saved = []
+
+    def todos(self, include_completed=False):
+        return []
+
+    def save_todo(self, data):
+        self.saved.append(data)
+
+
+class FakeGrocy:
+    def __init__(self, tasks=None, chores=None):
+        self.tasks = tasks or []
+        self.chores = chores or []
+
+    def get_all_tasks_including_done(self):
+        return self.tasks
+
+    def get_chores(self):
+        return self.chores
+
+
+@pytest.fixture
+def umgebung(monkeypatch):
+    zustand = {'sync_map': [], 'writes': [], 'map_loads': 0}
+
+    def sync_map_laden():
+        zustand['map_loads'] += 1
+        return [dict(e) for e in zustand['sync_map']]
+
+    monkeypatch.setattr(caldav_sync, 'get_all_settings', lambda: {})
+    monkeypatch.setattr(caldav_sync, 'get_sync_map', sync_map_laden)
+    monkeypatch.setattr(caldav_sync, 'upsert_sync_entries',
+                        lambda entries: zustand['writes'].append(list(entries)))
+
+    def verbinden(self):
+        self.calendar = FakeCalendar()
+        self.grocy = zustand['grocy']
+        return True
+
+    monkeypatch.setattr(CalDAVSync, 'connect', verbinden)
+    return zustand
+
+
+def test_map_wird_einmal_geladen_und_je_phase_geschrieben(umgebung):
+    umgebung['grocy'] = FakeGrocy(
+        tasks=[{'id': i, 'name': 'Aufgabe %d' % i, 'done': 0} for i in range(1, 51)],
+        chores=[{'chore_id': 7, 'chore_name': 'Muell',
+                 'next_estimated_execution_time': '2026-10-20 08:00:00'}])
+
+    stats = CalDAVSync().sync_all()
+
+    assert stats['tasks_synced'] == 50 and stats['chores_synced'] == 1
+    assert umgebung['map_loads'] == 1
+    # Phase CalDAV->Grocy schreibt nichts, danach je ein Commit fuer Tasks und Chores
+    assert [len(w) for w in umgebung['writes']] == [50, 1]
+
+
+def test_importierte_uid_wird_aus_der_map_uebernommen(umgebung):
+    """Aus CalDAV uebernommene Aufgaben behalten ihre Original-UID."""
+    umgebung['grocy'] = FakeGrocy(tasks=[{'id': 3, 'name': 'Einkaufen', 'done': 0}])
+    umgebung['sync_map'] = [{
+        'grocy_type': 'task', 'grocy_id': 3, 'caldav_uid': 'fremd-123@nextcloud',
+        'last_status': 'NEEDS-ACTION', 'last_summary': 'Einkaufen',
+        'last_due': '', 'sync_direction': 'caldav→grocy',
+    }]
+
+    sync = CalDAVSync()
+    sync.sync_all()
+
+    (eintrag,) = umgebung['writes'][0]
+    assert eintrag[:3] == ('task', 3, 'fremd-123@nextcloud')
+    assert 'fremd-123@nextcloud' in sync.calendar.saved[0]
+
+
+def test_vorgemerkter_eintrag_ist_sofort_nachschlagbar():
+    sync = CalDAVSync.__new__(CalDAVSync)
+    sync._pending_map, sync._map_by_key, sync._map_by_uid = [], {}, {}
+
+    sync._remember('task', '5', 'uid-alt', 'NEEDS-ACTION')
+    sync._remember('task', 5, 'uid-neu', 'COMPLETED')
+
+    assert sync._entry('task', 5)['caldav_uid'] == 'uid-neu'
+    assert sync._entry_by_uid('uid-neu')['last_status'] == 'COMPLETED'
+    assert sync._entry_by_uid('uid-alt') is None
@@ -0,0 +1,120 @@
+"""Tests fuer Suche, Sortierung, Seiten und Felder von ``/api/products`` (``catalog.py``).
+
+Echte, temporaere SQLite-Datei; die Produktliste wird direkt als
+vorberechnete Antwort abgelegt, Grocy wird nicht gebraucht.
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+import catalog
+import database
+
+
+PRODUKTE = [
+    {'product_id': 1, 'name': 'Apfelsaft', 'amount': 2, 'best_before_date': '2026-11-01'},
+    {'product_id': 2, 'name': 'Hafer-Milch', 'amount': 5, 'best_before_date': '2026-10-25'},
+    {'product_id': 3, 'name': 'Milch', 'amount': '-', 'best_before_date': ''},
+    {'product_id': 4, 'name': 'Mehl', 'amount': 1, 'best_before_date': '2027-03-01'},
+    {'product_id': 5, 'name': 'Zucker', 'amount': 3, 'best_before_date': ''},
+]
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    database.save_settings({'grocy_url': 'http://grocy', 'grocy_api_key': 'k'})
+    database.save_materialized_view('products', PRODUKTE, {}, '2026-10-19 08:00:00')
+    catalog.clear()
+    monkeypatch.setenv('GROCYLINK_ROLE', 'web')
+    import app as anwendungsmodul
+    return anwendungsmodul.app.test_client()
+
+
+def _namen(antwort):
+    return [p['name'] for p in antwort.get_json()['products']]
+
+
+def test_ohne_parameter_die_ganze_liste(client):
+    daten = client.get('/api/products').get_json()
+    assert [p['product_id'] for p in daten['products']] == [1, 2, 4, 3, 5]
+    assert daten['total'] == 5 and daten['next_cursor'] is None
+    assert daten['snapshot']['version'] == 1 and 'overrides' in daten
+
+
+def test_praefix_und_unscharfe_suche(client):
+    # Praefix trifft den Namen und jedes Wort darin
+    assert _namen(client.get('/api/products?q=mil')) == ['Hafer-Milch', 'Milch']
+    assert _namen(client.get('/api/products?q=ZUC')) == ['Zucker']
+    assert _namen(client.get('/api/products?q=saft')) == []
+    assert _namen(client.get('/api/products?q=haf%20mil')) == ['Hafer-Milch']
+    # Unscharf: Tippfehler, der genaueste Treffer zuerst
+    treffer = _namen(client.get('/api/products?q=Milsh&match=fuzzy'))
+    assert treffer[0] == 'Milch' and 'Zucker' not in treffer
+
+
+def test_sortierung_leere_werte_hinten(client):
+    assert _namen(client.get('/api/products?sort=-amount')) == [
+        'Hafer-Milch', 'Zucker', 'Apfelsaft', 'Mehl', 'Milch']
+    assert _namen(client.get('/api/products?sort=best_before_date')) == [
+        'Hafer-Milch', 'Apfelsaft', 'Mehl', 'Milch', 'Zucker']
+    assert _namen(client.get('/api/products?sort=-best_before_date'))[-2:] == ['Milch', 'Zucker']
+
+
+def test_seiten_und_felder(client):
+    erste = client.get('/api/products?limit=2&fields=product_id,name').get_json()
+    assert erste['products'] == [{'product_id': 1, 'name': 'Apfelsaft'},
+                                 {'product_id': 2, 'name': 'Hafer-Milch'}]
+    assert erste['total'] == 5
+
+    gesehen, cursor = list(erste['products']), erste['next_cursor']
+    while cursor:
+        seite = client.get(f'/api/products?limit=2&fields=name&cursor={cursor}').get_json()
+        gesehen += seite['products']
+        cursor = seite['next_cursor']
+    assert [p['name'] for p in gesehen] == ['Apfelsaft', 'Hafer-Milch', 'Mehl', 'Milch', 'Zucker']
+
+
+def test_cursor_einer_aelteren_liste_laeuft_ab(client):
+    cursor = client.get('/api/products?limit=2').get_json()['next_cursor']
+    # Neu berechnet, ein Produkt mehr vorne: der alte Offset passte nicht mehr
+    database.save_materialized_view(
+        'products', [{'product_id': 6, 'name': 'Aal', 'amount': 1,
+                      'best_before_date': ''}] + PRODUKTE, {}, '2026-10-19 08:01:00')
+    antwort = client.get(f'/api/products?limit=2&cursor={cursor}')
+    assert antwort.status_code == 410 and antwort.get_json()['cursor_expired'] is True
+    neu = client.get('/api/products?limit=2').get_json()
+    assert client.get(f"/api/products?limit=2&cursor={neu['next_cursor']}").status_code == 200
+
+
+@pytest.mark.parametrize('abfrage', ['limit=0', 'limit=abc', 'sort=preis', 'match=regex',
+                                     'fields=name,preis', 'cursor=%21%21'])
+def test_ungueltige_parameter(client, abfrage):
+    antwort = client.get(f'/api/products?{abfrage}')
+    assert antwort.status_code == 400
+    assert abfrage.split('=')[0] in antwort.get_json()['error']
+
+
+def test_zehntausend_produkte(client):
+    produkte = [{'product_id': i, 'name': f'Produkt {i:05d} Sorte {i % 97}',
+                 'amount': i % 13, 'best_before_date': ''} for i in range(12000)]
+    database.save_materialized_view('products', produkte, {}, '2026-10-19 09:00:00')
+
+    start = time.perf_counter()
+    erste = client.get('/api/products?limit=100&q=sorte 4').get_json()
+    client.get('/api/products?limit=100&sort=-amount')
+    client.get('/api/products?limit=100&q=Produkt 0111&match=fuzzy')
+    dauer = time.perf_counter() - start
+    assert erste['snapshot']['version'] == 2
+    assert len(erste['products']) == 100 and erste['next_cursor']
+    assert dauer < 1.0
+
+    # Spaeter nur noch die Versionszeile: der Katalog bleibt derselbe
+    katalog, _ = catalog.current()
+    client.get('/api/products?limit=100&q=produkt 1')
+    assert catalog.current()[0] is katalog
@@ -0,0 +1,107 @@
+"""Tests fuer die vorberechneten Antworten von Dashboard und Produktliste.
+
+Echte, temporaere SQLite-Datei; Grocy ist eine Attrappe, die ihre Abrufe
+zaehlt und im Grocy-Snapshot an die Stelle des ``GrocyClient`` tritt.
+"""
+import os
+import tempfile
+
+import pytest
+
+import database
+import grocy_snapshot
+import dashboard
+import worker
+
+
+class Grocy:
+    url = 'http://grocy'
+    api_key = 'k'
+    abrufe = []
+    produkte = []
+    bestand = []
+
+    def get_volatile_stock(self, due_soon_days=5):
+        Grocy.abrufe.append('volatile')
+        return {'due_products': [{'name': 'Milch', 'days': due_soon_days}],
+                'overdue_products': [], 'expired_products': [], 'missing_products': []}
+
+    def get_all_stock(self):
+        Grocy.abrufe.append('stock')
+        return [dict(b) for b in Grocy.bestand]
+
+    def get_all_products(self):
+        Grocy.abrufe.append('products')
+        return [dict(p) for p in Grocy.produkte]
+
+
+@pytest.fixture()
+def umgebung(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    database.save_settings({'grocy_url': 'http://grocy', 'grocy_api_key': 'k',
+                            'default_days_before_expiry': '5'})
+    monkeypatch.setattr(grocy_snapshot, 'GrocyClient', Grocy)
+    Grocy.abrufe = []
+    Grocy.produkte = [{'id': 2, 'name': 'mehl'}, {'id': 1, 'name': 'Butter'}]
+    Grocy.bestand = [{'product_id': 1, 'amount': 2, 'best_before_date': '2026-10-25'}]
+    # Ohne Scheduler (siehe conftest): keine geplante Vorberechnung, die die
+    # gezaehlten Abrufe verfaelscht
+    import app as anwendungsmodul
+    return anwendungsmodul.app.test_client()
+
+
+def test_endpunkte_lesen_die_vorberechnete_antwort(umgebung):
+    worker.run_dashboard_refresh()
+    assert sorted(Grocy.abrufe) == ['products', 'stock', 'volatile']
+
+    status = umgebung.get('/api/status').get_json()
+    assert status['total_products'] == 1 and status['due_products'][0]['name'] == 'Milch'
+    assert status['snapshot']['version'] == 1 and status['snapshot']['live'] is False
+    assert status['snapshot']['fetched_at'] and status['snapshot']['refreshed_at']
+
+    produkte = umgebung.get('/api/products').get_json()
+    assert [p['name'] for p in produkte['products']] == ['Butter', 'mehl']
+    assert produkte['products'][0]['amount'] == 2
+    assert produkte['products'][1]['amount'] == '-'
+    # Kein weiterer Grocy-Abruf fuer die Oberflaeche
+    assert len(Grocy.abrufe) == 3
+
+    lauf, = database.get_job_runs(job='dashboard_refresh')
+    assert lauf['job'] == 'dashboard_refresh' and lauf['counts']['products'] == 2
+
+
+def test_version_steigt_nur_bei_neuem_inhalt(umgebung):
+    assert dashboard.refresh()['products']['version'] == 1
+    assert dashboard.refresh(fresh=True)['products']['version'] == 1
+    Grocy.produkte.append({'id': 3, 'name': 'Zucker'})
+    assert dashboard.refresh(fresh=True)['products']['version'] == 2
+
+
+def test_fresh_und_fehlende_antwort_rechnen_im_request(umgebung):
+    # Noch nichts vorberechnet: der Request rechnet selbst und legt ab
+    erste = umgebung.get('/api/status').get_json()
+    assert erste['snapshot']['live'] is True
+    assert umgebung.get('/api/status').get_json()['snapshot']['live'] is False
+
+    abrufe = len(Grocy.abrufe)
+    frisch = umgebung.get('/api/status?fresh=1').get_json()
+    assert frisch['snapshot']['live'] is True and len(Grocy.abrufe) > abrufe
+
+    # Anderer Vorlauf in den Einstellungen: alte Antwort passt nicht mehr
+    database.save_settings({'default_days_before_expiry': '9'})
+    neu = umgebung.get('/api/status').get_json()
+    assert neu['snapshot']['live'] is True and neu['due_products'][0]['days'] == 9
+
+
+def test_override_landet_ohne_grocy_in_der_liste(umgebung):
+    dashboard.refresh()
+    abrufe = len(Grocy.abrufe)
+    antwort = umgebung.post('/api/products/override', json={
+        'product_id': 1, 'product_name': 'Butter', 'days': 3, 'repeat_limit': 2})
+    assert antwort.get_json()['ok']
+    butter = umgebung.get('/api/products').get_json()['products'][0]
+    assert butter['custom_days'] == 3 and butter['custom_repeat_limit'] == 2
+    assert len(Grocy.abrufe) == abrufe
@@ -0,0 +1,113 @@
+"""Tests fuer die Transaktionsschicht in ``database.py``.
+
+Zusammengesetzte Vorgaenge -- Bon mit Positionen, Tracker aufraeumen und
+hochzaehlen -- landen ganz oder gar nicht in der Datei.
+"""
+import os
+import tempfile
+
+import pytest
+
+import database
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    verzeichnis = tempfile.mkdtemp()
+    pfad = os.path.join(verzeichnis, "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    return pfad
+
+
+def _anzahl(tabelle):
+    verbindung = database.get_db()
+    try:
+        return verbindung.execute(f"SELECT COUNT(*) FROM {tabelle}").fetchone()[0]
+    finally:
+        verbindung.close()
+
+
+def test_ausnahme_rollt_alles_zurueck(datenbank):
+    with pytest.raises(RuntimeError):
+        with database.transaction() as conn:
+            database.save_receipt('a.pdf', '/tmp/a.pdf', conn=conn)
+            raise RuntimeError("Absturz zwischen den Schritten")
+    assert _anzahl('receipts') == 0
+
+
+def test_bon_mit_positionen_in_einem_zug(datenbank):
+    positionen = [{'raw_name': 'MILCH', 'quantity': 2},
+                  {'raw_name': 'BUTTER', 'quantity': 1}]
+    bon_id = database.save_receipt_with_items(
+        positionen, filename='a.pdf', filepath='/tmp/a.pdf')
+
+    bon = database.get_receipt(bon_id)
+    assert [p['raw_name'] for p in bon['items']] == ['MILCH', 'BUTTER']
+
+
+def test_fehlerhafte_position_verhindert_auch_den_bon(datenbank):
+    """Ohne Transaktion blieb ein Bon ohne Positionen zurueck."""
+    kaputt = [{'raw_name': None}]  # raw_name ist NOT NULL
+    with pytest.raises(Exception):
+        database.save_receipt_with_items(
+            kaputt, filename='a.pdf', filepath='/tmp/a.pdf')
+    assert _anzahl('receipts') == 0
+    assert not database.receipt_filepath_exists('/tmp/a.pdf')
+
+
+def test_bon_loeschen_entfernt_positionen(datenbank):
+    bon_id = database.save_receipt_with_items(
+        [{'raw_name': 'MILCH'}], filename='a.pdf', filepath='/tmp/a.pdf')
+    database.delete_receipt(bon_id)
+    assert _anzahl('receipts') == 0
+    assert _anzahl('receipt_items') == 0
+
+
+def test_executemany_liefert_anzahl(datenbank):
+    anzahl = database.executemany(
+        "INSERT INTO settings (key, value) VALUES (?, ?)",
+        [('probe_%d' % i, str(i)) for i in range(5)])
+    assert anzahl == 5
+    assert database.executemany("DELETE FROM settings WHERE key = ?", []) == 0
+
+
+def test_tracker_zaehlt_und_raeumt_auf(datenbank):
+    database.update_tracker({('1', 'expiring'), ('2', 'expired')},
+                            [('1', 'expiring', '2026-10-01'),
+                             ('2', 'expired', '2026-09-01')])
+    database.update_tracker({('1', 'expiring')},
+                            [('1', 'expiring', '2026-10-01')])
+
+    eintraege = database.get_tracker_entries()
+    assert set(eintraege) == {('1', 'expiring')}
+    assert eintraege[('1', 'expiring')]['sent_count'] == 2
+
+
+def test_neues_mhd_setzt_den_zaehler_zurueck(datenbank):
+    database.upsert_tracker_entry('1', 'expiring', '2026-10-01')
+    database.upsert_tracker_entry('1', 'expiring', '2026-10-01')
+    database.upsert_tracker_entry('1', 'expiring', '2026-11-15')
+
+    eintrag = database.get_tracker_entry('1', 'expiring')
+    assert eintrag['sent_count'] == 1
+    assert eintrag['best_before_date'] == '2026-11-15'
+
+
+def test_sync_maps_in_einem_zug(datenbank):
+    database.upsert_sync_entries(
+        [('task', i, 'uid-%d' % i, 'NEEDS-ACTION', 'T%d' % i, '', 'grocy→caldav')
+         for i in range(1, 501)])
+    assert _anzahl('caldav_sync_map') == 500
+    eintrag, = [e for e in database.get_sync_map()
+                if e['grocy_type'] == 'task' and e['grocy_id'] == 7]
+    assert eintrag['caldav_uid'] == 'uid-7'
+
+    database.apply_bring_sync_changes(
+        [(i, 'uuid-%d' % i, 'P%d' % i, '') for i in range(1, 501)], [])
+    database.apply_bring_sync_changes(
+        [(1, 'uuid-neu', 'P1', '2 Stueck')], list(range(2, 501)))
+    assert database.get_bring_sync_map() == [
+        dict(database.get_bring_sync_entry(1))]
+    assert database.get_bring_sync_entry(1)['bring_item_uuid'] == 'uuid-neu'
@@ -0,0 +1,80 @@
+"""Tests fuer die geplante Datenbank-Wartung.
+
+Geprueft wird an einer echten, temporaeren SQLite-Datei: Nach dem Leeren des
+Logs geht der Platz an das Dateisystem zurueck, und Dateien aus der Zeit vor
+``auto_vacuum=INCREMENTAL`` werden einmalig umgestellt.
+"""
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+import database
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    verzeichnis = tempfile.mkdtemp()
+    pfad = os.path.join(verzeichnis, "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    return pfad
+
+
+def _auto_vacuum(pfad):
+    verbindung = sqlite3.connect(pfad)
+    try:
+        return verbindung.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        verbindung.close()
+
+
+def test_neue_datenbank_steht_auf_incremental(datenbank):
+    database.init_db()
+    assert _auto_vacuum(datenbank) == 2
+
+
+def test_geleertes_log_gibt_platz_zurueck(datenbank):
+    database.init_db()
+    verbindung = database.get_db()
+    verbindung.executemany(
+        "INSERT INTO notification_log (notification_type, channel_name, message) "
+        "VALUES ('expiring', 'Probe', ?)",
+        [("x" * 500,) for _ in range(2000)])
+    verbindung.commit()
+    verbindung.close()
+    database.clear_log()
+
+    ergebnis = database.run_maintenance()
+
+    assert ergebnis['integrity'] == 'ok'
+    assert ergebnis['reclaimed_bytes'] > 500 * 1000
+    assert ergebnis['size_after'] < ergebnis['size_before']
+    assert ergebnis['converted'] is False
+    assert ergebnis['duration_ms'] >= 0
+
+
+def test_alte_datenbank_wird_einmalig_umgestellt(datenbank):
+    """Vor dieser Version angelegte Dateien laufen ohne auto_vacuum."""
+    verbindung = sqlite3.connect(datenbank)
+    verbindung.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    verbindung.commit()
+    verbindung.close()
+    database.init_db()
+    assert _auto_vacuum(datenbank) == 0
+
+    assert database.run_maintenance()['converted'] is True
+    assert _auto_vacuum(datenbank) == 2
+    assert database.run_maintenance()['converted'] is False
+
+
+def test_wartung_legt_statistiken_an(datenbank):
+    database.init_db()
+    database.run_maintenance()
+    verbindung = database.get_db()
+    try:
+        assert verbindung.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    finally:
+        verbindung.close()
@@ -0,0 +1,102 @@
+"""Tests fuer die Live-Meldungen (``events.py``).
+
+Echte, temporaere SQLite-Datei. Der Verteiler wird mit langem Takt angelegt
+und per ``tick()`` von Hand weitergeschaltet -- so entscheidet der Test, wann
+verglichen wird.
+"""
+import os
+import tempfile
+
+import pytest
+
+import database
+import events
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    return pfad
+
+
+def _meldungen(abo):
+    texte = []
+    while not abo.empty():
+        texte.append(abo.get_nowait())
+    return texte
+
+
+def test_eine_berechnung_fuer_alle_tabs(datenbank):
+    hub = events.EventHub(poll_seconds=60)
+    erster, zweiter = hub.subscribe(), hub.subscribe()
+    hub.tick()
+    assert _meldungen(erster) == []  # Ausgangsstand ist schon geladen
+
+    database.add_log_entry('Milch', 'expiry', 'Mail', 'Laeuft ab')
+    database.save_materialized_view('status', {'due_products': [], 'total_products': 7},
+                                    {'due_soon_days': 5}, '2026-10-19 08:00:00')
+    hub.tick()
+    a, b = _meldungen(erster), _meldungen(zweiter)
+    assert a == b and all(x is y for x, y in zip(a, b))
+    namen = [t.split('\n')[1] for t in a]
+    assert namen == ['event: dashboard', 'event: log']
+    assert '"total_products": 7' in a[0] and '"version": 1' in a[0]
+    assert '"Laeuft ab"' in a[1]
+
+    # Ohne Aenderung bleibt es still
+    hub.tick()
+    assert _meldungen(erster) == []
+
+    database.clear_log()
+    hub.tick()
+    assert '"reset": true' in _meldungen(zweiter)[0]
+
+
+def test_auftraege_und_abgleich(datenbank):
+    hub = events.EventHub(poll_seconds=60)
+    abo = hub.subscribe()
+    job_id, _ = database.enqueue_job('check')
+    hub.tick()
+    assert 'event: jobs' in _meldungen(abo)[0]
+
+    job = database.claim_next_job('test')
+    database.finish_job(job['id'], result={'message': 'fertig'})
+    database.upsert_bring_sync_entry(1, 'uuid-1', 'Milch', '')
+    hub.tick()
+    texte = _meldungen(abo)
+    assert any('event: sync' in t and '"items_synced": 1' in t for t in texte)
+    jobs, = [t for t in texte if 'event: jobs' in t]
+    assert '"status": "done"' in jobs and '"payload"' not in jobs
+
+
+def test_verpasstes_wird_nachgereicht(datenbank):
+    hub = events.EventHub(poll_seconds=60)
+    abo = hub.subscribe()
+    hub.publish('runs', {'runs': []})
+    hub.publish('runs', {'runs': [1]})
+    erste_id = _meldungen(abo)[0].split('\n')[0][len('id: '):]
+    hub.unsubscribe(abo)
+
+    wieder = hub.subscribe(erste_id)
+    assert ['"runs": [1]' in t for t in _meldungen(wieder)] == [True]
+    fremd = hub.subscribe('anderer-prozess-3')
+    assert 'event: resync' in _meldungen(fremd)[0]
+
+
+def test_endpunkt_streamt_und_begrenzt(datenbank, monkeypatch):
+    monkeypatch.setenv('GROCYLINK_ROLE', 'web')
+    import app as anwendungsmodul
+    hub = events.EventHub(poll_seconds=60, max_subscribers=1)
+    monkeypatch.setattr(events, 'get_hub', lambda: hub)
+    client = anwendungsmodul.app.test_client()
+
+    antwort = client.get('/api/events', buffered=False)
+    assert antwort.status_code == 200
+    assert antwort.mimetype == 'text/event-stream'
+    assert next(antwort.response).startswith(b'retry:')
+    assert client.get('/api/events', buffered=False).status_code == 503
+    antwort.close()
+    assert hub.subscribers() == 0
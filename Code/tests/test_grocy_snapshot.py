@@ -0,0 +1,97 @@
+"""Tests fuer den gemeinsamen Grocy-Stand der Hintergrund-Jobs.
+
+Grocy ist eine Attrappe, die ihre Abrufe zaehlt; die Datenbank wird nur fuer
+den Test gebraucht, der die Zugriffe in ``job_runs`` nachliest.
+"""
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+import database
+import jobruns
+from grocy_snapshot import GrocySnapshot
+
+
+class Grocy:
+    url = 'http://grocy'
+    api_key = 'k'
+
+    def __init__(self):
+        self.abrufe = 0
+        self.produkte = [{'id': 1, 'name': 'Milch'}]
+
+    def get_all_products(self):
+        self.abrufe += 1
+        time.sleep(0.02)
+        return [dict(p) for p in self.produkte]
+
+
+def test_ein_abruf_fuer_alle_jobs_im_zyklus():
+    snapshot, grocy = GrocySnapshot(), Grocy()
+    erster = snapshot.get('products', 'bring_sync', grocy)
+    zweiter = snapshot.get('products', 'receipt_watch', grocy)
+    assert grocy.abrufe == 1
+    assert zweiter is erster and erster.version == 1
+    assert [(r['consumer'], r['version'], r['fetched']) for r in snapshot.reads()] == [
+        ('receipt_watch', 1, False), ('bring_sync', 1, True)]
+
+
+def test_gleichzeitige_jobs_warten_auf_denselben_abruf():
+    snapshot, grocy = GrocySnapshot(), Grocy()
+    threads = [threading.Thread(target=snapshot.get, args=('products', f'job{i}', grocy))
+               for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert grocy.abrufe == 1
+
+
+def test_version_steigt_nur_bei_neuem_inhalt():
+    snapshot, grocy = GrocySnapshot(), Grocy()
+    assert snapshot.get('products', 'check', grocy).version == 1
+    snapshot.invalidate('products')
+    assert snapshot.get('products', 'check', grocy).version == 1
+    grocy.produkte.append({'id': 2, 'name': 'Mehl'})
+    snapshot.invalidate()
+    view = snapshot.get('products', 'check', grocy)
+    assert view.version == 2 and len(view.data) == 2
+    assert grocy.abrufe == 3
+    # Nach Ablauf des Zyklus wird neu geholt
+    snapshot.max_age = 0
+    snapshot.get('products', 'check', grocy)
+    assert grocy.abrufe == 4
+
+
+def test_stand_ist_unveraenderlich():
+    snapshot, grocy = GrocySnapshot(), Grocy()
+    produkte = snapshot.get('products', 'bring_sync', grocy).data
+    with pytest.raises(TypeError):
+        produkte[0]['name'] = 'Hafermilch'
+    with pytest.raises(TypeError):
+        produkte.append({'id': 9})
+    # Kopieren geht, Lesen sowieso
+    kopie = dict(produkte[0])
+    kopie['name'] = 'Hafermilch'
+    assert produkte[0]['name'] == 'Milch'
+    assert produkte + [{'id': 9}] == [{'id': 1, 'name': 'Milch'}, {'id': 9}]
+
+
+def test_auftrag_aus_der_oberflaeche_holt_frisch(monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH",
+                        os.path.join(tempfile.mkdtemp(), "test.db"))
+    database.init_db()
+    snapshot, grocy = GrocySnapshot(), Grocy()
+    with jobruns.job_run('bring_sync'):
+        snapshot.get('products', 'bring_sync', grocy)
+    with jobruns.job_run('receipt_reprocess', 'manual'):
+        snapshot.get('products', 'receipt', grocy)
+    assert grocy.abrufe == 2
+
+    laeufe = {l['job']: l for l in database.get_job_runs()}
+    assert laeufe['bring_sync']['reads'] == [
+        {'entity': 'products', 'version': 1, 'fetched': True}]
+    assert laeufe['receipt_reprocess']['counts'] == {'grocy_fetches': 1}
@@ -0,0 +1,90 @@
+"""Tests fuer ETag, 304 und Kompression der JSON-Antworten (``http_cache.py``).
+
+Echte, temporaere SQLite-Datei; die Antworten kommen ueber den Testclient
+von Flask, Grocy wird nicht gebraucht.
+"""
+import gzip
+import json
+import os
+import tempfile
+
+import pytest
+
+import database
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    monkeypatch.setenv('GROCYLINK_ROLE', 'web')
+    import app as anwendungsmodul
+    return anwendungsmodul.app.test_client()
+
+
+def _log_fuellen(anzahl):
+    for i in range(anzahl):
+        database.add_log_entry(f'Produkt {i}', 'expiry', 'Mail', 'Laeuft in 3 Tagen ab')
+
+
+def test_grosse_antwort_gepackt_und_mit_etag(client):
+    _log_fuellen(30)
+    antwort = client.get('/api/log', headers={'Accept-Encoding': 'gzip'})
+    assert antwort.status_code == 200
+    assert antwort.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in antwort.headers['Vary']
+    tag, schwach = antwort.get_etag()
+    assert tag.endswith('-gzip') and not schwach
+    assert len(json.loads(gzip.decompress(antwort.data))) == 30
+
+    # Ob der Client den gepackten oder den ungepackten ETag schickt: 304
+    for gesendet in (tag, tag[:-len('-gzip')]):
+        wieder = client.get('/api/log', headers={'Accept-Encoding': 'gzip',
+                                                 'If-None-Match': f'"{gesendet}"'})
+        assert wieder.status_code == 304 and wieder.data == b''
+
+    _log_fuellen(1)
+    neu = client.get('/api/log', headers={'Accept-Encoding': 'gzip',
+                                          'If-None-Match': f'"{tag}"'})
+    assert neu.status_code == 200
+
+
+def test_kleine_antwort_und_post_bleiben_ungepackt(client):
+    antwort = client.get('/api/log', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in antwort.headers
+    assert antwort.headers['Cache-Control'] == 'private, no-cache'
+    assert antwort.get_etag()[0]
+    post = client.post('/api/settings', json={'sprache': 'de'})
+    assert post.get_etag() == (None, None)
+
+
+def test_etag_aus_der_version_des_standes(client):
+    database.save_settings({'grocy_url': 'http://grocy', 'grocy_api_key': 'k',
+                            'default_days_before_expiry': '5'})
+    database.save_materialized_view('status', {'due_products': [], 'total_products': 3},
+                                    {'due_soon_days': 5}, '2026-10-19 08:00:00')
+    erste = client.get('/api/status')
+    tag = erste.get_etag()[0]
+    assert erste.last_modified is not None
+
+    wieder = client.get('/api/status', headers={'If-None-Match': f'"{tag}"'})
+    assert wieder.status_code == 304 and wieder.get_etag()[0] == tag
+
+    # Neuer Inhalt -> neue Version -> neuer ETag
+    database.save_materialized_view('status', {'due_products': [], 'total_products': 4},
+                                    {'due_soon_days': 5}, '2026-10-19 08:01:00')
+    neu = client.get('/api/status', headers={'If-None-Match': f'"{tag}"'})
+    assert neu.status_code == 200 and neu.get_json()['total_products'] == 4
+
+
+def test_app_schnittstelle_bekommt_304(client):
+    schluessel = database.create_api_key('Handy')
+    kopf = {'X-API-Key': schluessel}
+    erste = client.get('/api/v1/log', headers=kopf)
+    tag = erste.get_etag()[0]
+    wieder = client.get('/api/v1/log', headers=dict(kopf, **{'If-None-Match': f'"{tag}"'}))
+    assert wieder.status_code == 304
+    # Ohne Schluessel bleibt es bei 401, auch mit passendem ETag
+    assert client.get('/api/v1/log', headers={'If-None-Match': f'"{tag}"'}).status_code == 401
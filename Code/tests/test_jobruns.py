@@ -0,0 +1,99 @@
+"""Tests fuer die Laufzeitmessung der Hintergrund-Jobs (``jobruns``).
+
+Echte, temporaere SQLite-Datei; gemessen wird mit ``time.sleep``, geprueft
+werden deshalb nur Untergrenzen und Verhaeltnisse, keine genauen Zeiten.
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+import database
+import jobruns
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    return pfad
+
+
+def test_phasen_und_mengen_landen_in_job_runs(datenbank):
+    @jobruns.timed('probe')
+    def probe():
+        with jobruns.phase('grocy_fetch'):
+            time.sleep(0.03)
+            # Die innere Phase fehlt in der aeusseren
+            with jobruns.phase('db_write'):
+                time.sleep(0.03)
+        jobruns.count('stock_entries', 120)
+        jobruns.count('stock_entries', 3)
+        return 'fertig'
+
+    assert probe() == 'fertig'
+    assert probe.__name__ == 'probe'
+    lauf, = database.get_job_runs()
+    assert lauf['job'] == 'probe' and lauf['source'] == 'schedule'
+    assert lauf['status'] == 'ok'
+    assert lauf['counts'] == {'stock_entries': 123}
+    phasen = lauf['phases']
+    assert 25 <= phasen['grocy_fetch']['ms'] < 55
+    assert phasen['db_write']['ms'] >= 25
+    assert phasen['grocy_fetch']['calls'] == phasen['db_write']['calls'] == 1
+    summe = sum(p['ms'] for p in phasen.values())
+    assert summe <= lauf['duration_ms'] + 1
+
+
+def test_innerer_lauf_haengt_sich_an_den_aeusseren(datenbank):
+    @jobruns.timed('check')
+    def geplant():
+        with jobruns.phase('evaluate'):
+            pass
+
+    with jobruns.job_run('check', 'manual'):
+        geplant()
+    lauf, = database.get_job_runs()
+    assert lauf['source'] == 'manual' and 'evaluate' in lauf['phases']
+
+
+def test_fehler_werden_vermerkt(datenbank):
+    with pytest.raises(RuntimeError):
+        with jobruns.job_run('bring_sync'):
+            raise RuntimeError("Bring nicht erreichbar")
+    with jobruns.job_run('caldav_sync'):
+        jobruns.current_run().fail("Login abgelehnt")
+
+    laeufe = {l['job']: l for l in database.get_job_runs()}
+    assert laeufe['bring_sync']['status'] == 'error'
+    assert 'nicht erreichbar' in laeufe['bring_sync']['error']
+    assert laeufe['caldav_sync']['error'] == "Login abgelehnt"
+
+    zusammen = jobruns.summarize_runs(database.get_job_runs())
+    assert zusammen['bring_sync']['errors'] == 1 and zusammen['bring_sync']['runs'] == 1
+
+
+def test_ausserhalb_eines_laufs_wirkungslos(datenbank):
+    with jobruns.phase('grocy_fetch'):
+        jobruns.count('x')
+    jobruns.current_run().fail("egal")
+    assert database.get_job_runs() == []
+
+
+def test_zusammenfassung_nennt_die_langsamste_phase():
+    laeufe = [
+        {'job': 'check', 'status': 'ok', 'started_at': '2026-10-19 06:00:00',
+         'duration_ms': 900.0, 'phases': {'grocy_fetch': {'ms': 800.0, 'calls': 1},
+                                          'evaluate': {'ms': 50.0, 'calls': 1}}},
+        {'job': 'check', 'status': 'ok', 'started_at': '2026-10-19 12:00:00',
+         'duration_ms': 300.0, 'phases': {'grocy_fetch': {'ms': 200.0, 'calls': 1},
+                                          'evaluate': {'ms': 70.0, 'calls': 1}}},
+    ]
+    s = jobruns.summarize_runs(laeufe)['check']
+    assert s['runs'] == 2 and s['avg_ms'] == 600.0 and s['max_ms'] == 900.0
+    assert s['phases'] == {'grocy_fetch': 500.0, 'evaluate': 60.0}
+    assert s['slowest_phase'] == 'grocy_fetch'
+    assert s['last_run'] == '2026-10-19 12:00:00'
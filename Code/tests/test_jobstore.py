@@ -0,0 +1,79 @@
+"""Tests fuer den SQLite-Job-Store und das Job-Verzeichnis in ``worker``.
+
+Die Scheduler starten pausiert: Geprueft wird, was in der Datenbank steht
+und wann der naechste Lauf waere, nicht die Jobs selbst.
+"""
+import os
+import tempfile
+
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import database
+import worker
+from jobstore import SQLiteJobStore
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    return pfad
+
+
+def _scheduler():
+    scheduler = BackgroundScheduler(jobstores={'default': SQLiteJobStore()},
+                                    job_defaults={'coalesce': True, 'max_instances': 1})
+    scheduler.start(paused=True)
+    return scheduler
+
+
+@pytest.fixture()
+def planer(datenbank, monkeypatch):
+    scheduler = _scheduler()
+    monkeypatch.setattr(worker, 'bg_scheduler', scheduler)
+    yield scheduler
+    scheduler.shutdown(wait=False)
+
+
+def test_jobs_ueberstehen_einen_neustart(datenbank):
+    erster = _scheduler()
+    erster.add_job(worker.run_outbox_delivery, 'interval', hours=6, id='grocy_check')
+    geplant = erster.get_job('grocy_check').next_run_time
+    erster.shutdown(wait=False)
+
+    zweiter = _scheduler()
+    try:
+        job = zweiter.get_job('grocy_check')
+        assert job.next_run_time == geplant
+        assert job.func is worker.run_outbox_delivery
+        assert job.max_instances == 1 and job.coalesce is True
+    finally:
+        zweiter.shutdown(wait=False)
+
+
+def test_nur_der_geaenderte_job_wird_neu_geplant(planer):
+    settings = {'check_interval_hours': '6', 'caldav_sync_enabled': '1',
+                'caldav_sync_interval_minutes': '30'}
+    worker.apply_schedules(settings)
+    check = planer.get_job('grocy_check').next_run_time
+    caldav = planer.get_job('caldav_sync').next_run_time
+
+    worker.apply_schedules(dict(settings, caldav_sync_interval_minutes='90'))
+    assert planer.get_job('grocy_check').next_run_time == check
+    assert planer.get_job('caldav_sync').next_run_time != caldav
+    assert planer.get_job('caldav_sync').misfire_grace_time == 90 * 60
+
+    worker.apply_schedules(dict(settings, caldav_sync_enabled='0'))
+    assert planer.get_job('caldav_sync') is None
+    assert planer.get_job('grocy_check').next_run_time == check
+
+
+def test_unbekannte_jobs_werden_aufgeraeumt(planer):
+    planer.add_job(worker.run_outbox_delivery, 'interval', minutes=5, id='alter_job')
+    worker.apply_schedules({'check_interval_hours': '0'})
+    ids = {job.id for job in planer.get_jobs()}
+    assert 'alter_job' not in ids and 'grocy_check' not in ids
+    assert {'outbox_delivery', 'settings_watch', 'db_maintenance'} <= ids
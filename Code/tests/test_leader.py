@@ -0,0 +1,99 @@
+"""Tests fuer die Leader-Wahl des Schedulers (``leader``).
+
+POSIX-Sperren gehoeren dem Prozess; der Gegenspieler laeuft deshalb als
+eigener Python-Prozess, der die Sperre haelt, bis er beendet wird.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+import leader
+from leader import SchedulerLeader
+
+pytestmark = pytest.mark.skipif(leader.fcntl is None, reason="fcntl fehlt")
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture()
+def sperrdatei():
+    return os.path.join(tempfile.mkdtemp(), 'data', leader.LOCK_FILENAME)
+
+
+def _fremder_leader(pfad):
+    """Startet einen Prozess, der Leader wird und dann wartet."""
+    prozess = subprocess.Popen(
+        [sys.executable, '-c',
+         'import sys, time; from leader import SchedulerLeader; '
+         'l = SchedulerLeader(sys.argv[1]); print(l.try_acquire(), flush=True); '
+         'time.sleep(60)', pfad],
+        cwd=CODE_DIR, stdout=subprocess.PIPE, text=True)
+    assert prozess.stdout.readline().strip() == 'True'
+    return prozess
+
+
+def test_nur_ein_prozess_wird_leader(sperrdatei):
+    prozess = _fremder_leader(sperrdatei)
+    try:
+        eigener = SchedulerLeader(sperrdatei)
+        assert eigener.try_acquire() is False
+        assert eigener.holder() == prozess.pid
+    finally:
+        prozess.kill()
+        prozess.wait()
+
+
+def test_uebernahme_wenn_der_leader_stirbt(sperrdatei):
+    prozess = _fremder_leader(sperrdatei)
+    gewaehlt = threading.Event()
+    eigener = SchedulerLeader(sperrdatei, retry_seconds=0.1)
+    try:
+        assert eigener.run(gewaehlt.set) is False
+        time.sleep(0.3)
+        assert not gewaehlt.is_set()
+
+        prozess.kill()
+        prozess.wait()
+        assert gewaehlt.wait(5), "Nach dem Tod des Leaders muss uebernommen werden"
+        assert eigener.is_leader and eigener.holder() == os.getpid()
+    finally:
+        eigener.release()
+        if prozess.poll() is None:
+            prozess.kill()
+
+
+def test_geforktes_kind_ist_kein_leader(sperrdatei):
+    eigener = SchedulerLeader(sperrdatei)
+    assert eigener.run(lambda: None) is True
+    try:
+        lesen, schreiben = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Kind: erbt das Flag nicht und bekommt die Sperre nicht
+            os.write(schreiben, b'%d%d' % (eigener.is_leader,
+                                           SchedulerLeader(sperrdatei).try_acquire()))
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert os.read(lesen, 2) == b'00'
+        assert eigener.is_leader
+    finally:
+        eigener.release()
+
+
+def test_sperrpfad_gilt_erst_beim_start(sperrdatei, monkeypatch):
+    import database
+    import worker
+    monkeypatch.setattr(database, 'DB_PATH',
+                        os.path.join(os.path.dirname(sperrdatei), 'test.db'))
+    leader_ = SchedulerLeader(worker.lock_path)
+    try:
+        assert leader_.run(lambda: None) is True
+        assert leader_.path == sperrdatei and os.path.exists(sperrdatei)
+    finally:
+        leader_.release()
@@ -0,0 +1,307 @@
+"""Tests fuer die Notifier der einzelnen Kanaele.
+
+Je Zugang verteilt ein Token-Bucket Schwaelle und beachtet die Pausen der
+Dienste; SMTP-Sitzungen werden wiederverwendet statt je Mail neu aufgebaut.
+Gleichzeitigkeit und Frist je Kanal prueft ``test_notify_runtime.py``.
+"""
+
+import json
+import smtplib
+
+import pytest
+
+import notifiers
+from notifiers import (
+    TokenBucket, RateLimited, rate_limited_post, SmtpPool,
+    NotifierRegistry, split_message, TelegramNotifier, PushoverNotifier,
+    DiscordNotifier, SlackNotifier,
+)
+
+
+# ── Sendegrenzen ───────────────────────────────────────────────────────
+
+
+class Uhr:
+    def __init__(self):
+        self.jetzt = 0.0
+
+    def __call__(self):
+        return self.jetzt
+
+
+class Antwort:
+    def __init__(self, status=200, headers=None, body=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self._body = body
+
+    def json(self):
+        if self._body is None:
+            raise ValueError("kein JSON")
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+@pytest.fixture
+def post(monkeypatch):
+    """Biegt ``requests.post`` und ``time.sleep`` um; Buckets frisch."""
+    zustand = {'antworten': [], 'aufrufe': 0, 'schlaf': []}
+
+    def antworten(url, **kwargs):
+        zustand['aufrufe'] += 1
+        return zustand['antworten'].pop(0) if zustand['antworten'] else Antwort()
+
+    monkeypatch.setattr(notifiers.requests, 'post', antworten)
+    monkeypatch.setattr(notifiers.time, 'sleep', zustand['schlaf'].append)
+    monkeypatch.setattr(notifiers, '_buckets', {})
+    return zustand
+
+
+def test_schwall_wird_verteilt_statt_abgelehnt():
+    uhr = Uhr()
+    bucket = TokenBucket(rate=1.0, capacity=3, clock=uhr)
+    wartezeiten = [bucket.reserve() for _ in range(5)]
+    assert wartezeiten == [0.0, 0.0, 0.0, 1.0, 2.0]
+
+    uhr.jetzt = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_verlangte_pause_sperrt_den_bucket():
+    uhr = Uhr()
+    bucket = TokenBucket(rate=5.0, capacity=5, clock=uhr)
+    bucket.block(4.0)
+    assert bucket.reserve() == 4.0
+
+
+def test_retry_after_wird_abgewartet_und_wiederholt(post):
+    post['antworten'] = [Antwort(429, {'Retry-After': '2'}), Antwort(200)]
+    rate_limited_post('telegram', 'bot-1', 'https://example.invalid')
+    assert post['aufrufe'] == 2
+    assert post['schlaf'] == [pytest.approx(2.0, abs=0.05)]
+
+
+def test_lange_pause_geht_als_ratelimited_zurueck(post):
+    post['antworten'] = [Antwort(429, body={'ok': False, 'parameters': {'retry_after': 600}})]
+    with pytest.raises(RateLimited) as fehler:
+        rate_limited_post('telegram', 'bot-1', 'https://example.invalid')
+    assert fehler.value.retry_after == pytest.approx(600, abs=1)
+    # Der naechste Versand desselben Bots wartet gar nicht erst auf den Dienst
+    with pytest.raises(RateLimited):
+        rate_limited_post('telegram', 'bot-1', 'https://example.invalid')
+    assert post['aufrufe'] == 1
+
+
+def test_discord_header_leerer_vorrat_pausiert(post):
+    post['antworten'] = [Antwort(200, {'X-RateLimit-Remaining': '0',
+                                       'X-RateLimit-Reset-After': '1.5'})]
+    rate_limited_post('discord', 'hook', 'https://example.invalid')
+    rate_limited_post('discord', 'hook', 'https://example.invalid')
+    assert post['schlaf'] and post['schlaf'][0] == pytest.approx(1.5, abs=0.05)
+    # Ein anderer Webhook hat seinen eigenen Bucket
+    rate_limited_post('discord', 'anderer-hook', 'https://example.invalid')
+    assert len(post['schlaf']) == 1
+
+
+# ── SMTP-Pool ──────────────────────────────────────────────────────────
+
+
+class FakeSMTP:
+    """Zaehlt Verbindungen, Logins und Nachrichten; ``kappen`` simuliert
+    einen Server, der die Sitzung beim naechsten Befehl verloren hat."""
+
+    verbindungen = []
+
+    def __init__(self, host, port, timeout=None):
+        self.logins = 0
+        self.gesendet = []
+        self.kappen = False
+        self.geschlossen = False
+        FakeSMTP.verbindungen.append(self)
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        if self.kappen:
+            raise smtplib.SMTPServerDisconnected("weg")
+        return (250, b'OK')
+
+    def sendmail(self, from_addr, to_addrs, msg):
+        if self.kappen:
+            raise smtplib.SMTPServerDisconnected("weg")
+        self.gesendet.append(msg)
+
+    def quit(self):
+        self.geschlossen = True
+
+
+MAIL = {'smtp_host': 'mail.example', 'smtp_port': 587,
+        'username': 'ich', 'password': 'geheim', 'to_email': 'du@example'}
+
+
+@pytest.fixture
+def pool():
+    FakeSMTP.verbindungen = []
+    uhr = Uhr()
+    return SmtpPool(factory=FakeSMTP, clock=uhr), uhr
+
+
+def test_mehrere_mails_in_einer_sitzung(pool):
+    smtp, _ = pool
+    for i in range(5):
+        smtp.send(MAIL, 'ich@example', 'du@example', f'Nachricht {i}')
+    (verbindung,) = FakeSMTP.verbindungen
+    assert verbindung.logins == 1 and len(verbindung.gesendet) == 5
+
+
+def test_abgebrochene_sitzung_wird_neu_aufgebaut(pool):
+    smtp, _ = pool
+    smtp.send(MAIL, 'ich@example', 'du@example', 'eins')
+    FakeSMTP.verbindungen[0].kappen = True
+    smtp.send(MAIL, 'ich@example', 'du@example', 'zwei')
+    assert len(FakeSMTP.verbindungen) == 2
+    assert FakeSMTP.verbindungen[1].gesendet == ['zwei']
+
+
+def test_ruhende_sitzung_wird_per_noop_geprueft_und_geschlossen(pool):
+    smtp, uhr = pool
+    smtp.send(MAIL, 'ich@example', 'du@example', 'eins')
+    uhr.jetzt += notifiers.SMTP_NOOP_AFTER_SECONDS + 1
+    FakeSMTP.verbindungen[0].kappen = True
+    smtp.send(MAIL, 'ich@example', 'du@example', 'zwei')
+    assert len(FakeSMTP.verbindungen) == 2
+
+    uhr.jetzt += notifiers.SMTP_IDLE_SECONDS + 1
+    smtp.close_idle()
+    assert FakeSMTP.verbindungen[1].geschlossen
+
+
+def test_anderer_benutzer_bekommt_eigene_sitzung(pool):
+    smtp, _ = pool
+    smtp.send(MAIL, 'ich@example', 'du@example', 'eins')
+    smtp.send(dict(MAIL, username='jemand'), 'x@example', 'du@example', 'zwei')
+    assert len(FakeSMTP.verbindungen) == 2
+
+
+def test_neues_passwort_meldet_sich_neu_an(pool):
+    smtp, _ = pool
+    smtp.send(MAIL, 'ich@example', 'du@example', 'eins')
+    smtp.send(dict(MAIL, password='neu'), 'ich@example', 'du@example', 'zwei')
+    alt, neu = FakeSMTP.verbindungen
+    assert alt.gesendet == ['eins'] and neu.gesendet == ['zwei'] and neu.logins == 1
+
+
+# ── Notifier-Registry ──────────────────────────────────────────────────
+
+def _kanal(kanal_id=1, chat='1'):
+    return {'id': kanal_id, 'type': 'telegram',
+            'config_json': json.dumps({'chat_id': chat, 'bot_token': ''})}
+
+
+def test_registry_liefert_denselben_notifier_samt_session():
+    registry = NotifierRegistry()
+    erster = registry.get(_kanal())
+    session = erster.session
+    zweiter = registry.get(_kanal())
+    assert zweiter is erster and zweiter.session is session
+
+
+def test_geaenderte_konfiguration_baut_neu_und_schliesst_den_alten():
+    registry = NotifierRegistry()
+    alt = registry.get(_kanal())
+    alt.session
+    neu = registry.get(_kanal(chat='2'))
+    assert neu is not alt and neu.config['chat_id'] == '2'
+    assert alt._session is None
+
+
+def test_invalidieren_verwirft_den_kanal():
+    registry = NotifierRegistry()
+    alt = registry.get(_kanal())
+    registry.invalidate(1)
+    assert registry.get(_kanal()) is not alt
+
+
+# ── Aufteilen grosser Meldungen ────────────────────────────────────────
+
+def _welle(anzahl):
+    """Eine Ablaufwelle: je Warnung eine Zeile wie im Check."""
+    return '\n'.join(f"[Laeuft bald ab] Produkt {i:04d} - MHD: 2026-10-20"
+                     for i in range(anzahl))
+
+
+def test_split_bleibt_an_zeilengrenzen_und_verliert_nichts():
+    text = _welle(300)
+    teile = split_message(text, 1024)
+    assert all(len(t) <= 1024 for t in teile)
+    assert '\n'.join(teile) == text
+
+
+def test_ueberlange_zeile_wird_hart_geteilt():
+    assert split_message('x' * 25, 10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+@pytest.mark.parametrize('notifier, laenge', [
+    (TelegramNotifier({'bot_token': 'b', 'chat_id': '1'}), 4096),
+    (PushoverNotifier({'api_token': 't', 'user_key': 'u'}), 1024),
+])
+def test_teile_halten_die_grenze_des_dienstes(notifier, laenge):
+    requests_ = notifier.build_requests('Grocy-Warnung: 300 Produkte', _welle(300))
+    texte = [kw.get('json', kw.get('data'))['text' if 'json' in kw else 'message']
+             for _, _, kw in requests_]
+    assert len(requests_) > 1
+    assert all(len(t) <= laenge for t in texte)
+    assert '(1/' in str(requests_[0][2])
+
+
+def test_telegram_maskiert_html():
+    (_, _, kwargs), = TelegramNotifier({'bot_token': 'b', 'chat_id': '1'}).build_requests(
+        'Titel', '[Abgelaufen] Salz & Pfeffer <gross>')
+    assert 'Salz &amp; Pfeffer &lt;gross&gt;' in kwargs['json']['text']
+
+
+def test_discord_packt_embeds_in_moeglichst_wenige_requests():
+    text = _welle(300)  # rund 15 000 Zeichen
+    requests_ = DiscordNotifier({'webhook_url': 'https://hook'}).build_requests('Titel', text)
+    # Volle Nachrichten zu 6000 Zeichen; Zeilengrenzen kosten hoechstens eine mehr
+    assert -(-len(text) // 6000) <= len(requests_) <= -(-len(text) // 6000) + 1
+    for _, _, kwargs in requests_:
+        embeds = kwargs['json']['embeds']
+        assert len(embeds) <= 10
+        assert all(len(e['description']) <= 4096 for e in embeds)
+        assert sum(len(e['description']) + len(e.get('title', '')) for e in embeds) <= 6000
+    beschreibungen = [e['description'] for _, _, kw in requests_ for e in kw['json']['embeds']]
+    assert '\n'.join(beschreibungen) == text
+
+
+def test_slack_schickt_bloecke_mit_ueberschrift():
+    (_, _, kwargs), = SlackNotifier({'webhook_url': 'https://hook'}).build_requests(
+        'Titel', _welle(300))
+    blocks = kwargs['json']['blocks']
+    assert blocks[0]['type'] == 'header'
+    assert all(len(b['text']['text']) <= 3000 for b in blocks[1:])
+
+
+def test_sync_versand_schickt_alle_teile_in_reihenfolge(post):
+    telegram = TelegramNotifier({'bot_token': 'b', 'chat_id': '1'})
+    gesendet = []
+
+    class Session:
+        def post(self, url, **kwargs):
+            gesendet.append(kwargs['json']['text'].split('</b>')[0])
+            return Antwort()
+
+    telegram._session = Session()
+    telegram.send('Titel', _welle(300))
+    assert len(gesendet) > 1
+    assert gesendet == [f"<b>Titel ({i}/{len(gesendet)})" for i in range(1, len(gesendet) + 1)]
@@ -0,0 +1,109 @@
+"""Tests fuer den asynchronen Versand in ``notify_runtime``.
+
+Kein Netzwerk: ``_http_post`` wird durch eine Coroutine ersetzt, die nur
+wartet und eine vorbereitete Antwort liefert. Geprueft wird, dass viele
+Zustellungen gleichzeitig auf einem Loop laufen, dass die Frist je
+Zustellung greift und dass 429-Antworten wie im synchronen Weg behandelt
+werden.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import notifiers
+from notifiers import TelegramNotifier, DiscordNotifier, RateLimited
+from notify_runtime import NotifyRuntime, _Antwort
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    monkeypatch.setattr(notifiers, '_buckets', {})
+    # Grosszuegige Grenzen, damit nur die Gleichzeitigkeit gemessen wird
+    monkeypatch.setitem(notifiers.RATE_LIMITS, 'telegram', (1000.0, 1000))
+    rt = NotifyRuntime()
+    yield rt
+    rt.shutdown()
+
+
+def _antworten(rt, antworten=None, dauer=0.0):
+    """Ersetzt den HTTP-Aufruf; ``antworten`` wird der Reihe nach abgearbeitet."""
+    aufrufe = []
+
+    async def post(url, timeout=10, **kwargs):
+        aufrufe.append((url, kwargs))
+        await asyncio.sleep(dauer)
+        if antworten:
+            return antworten.pop(0)
+        return _Antwort(200, {}, b'{"ok": true}')
+
+    rt._http_post = post
+    return aufrufe
+
+
+def _telegram(chat):
+    return TelegramNotifier({'bot_token': 'bot', 'chat_id': str(chat)})
+
+
+def test_hunderte_zustellungen_ohne_hunderte_threads(runtime):
+    aufrufe = _antworten(runtime, dauer=0.3)
+    threads_vorher = threading.active_count()
+
+    start = time.monotonic()
+    ergebnisse = runtime.deliver(
+        [(i, _telegram(i), 'Titel', 'Text') for i in range(300)])
+    dauer = time.monotonic() - start
+
+    assert len(aufrufe) == 300
+    assert all(e['ok'] for e in ergebnisse.values())
+    assert dauer < 2, "300 Zustellungen a 0,3 s muessen gleichzeitig laufen"
+    # Nur der Loop-Thread kommt hinzu
+    assert threading.active_count() <= threads_vorher + 1
+
+
+def test_frist_bricht_nur_die_langsame_zustellung_ab(runtime):
+    _antworten(runtime, dauer=5)
+    langsam = _telegram(1)
+
+    class Schnell(notifiers.BaseNotifier):
+        def send(self, title, message):
+            return True
+
+    start = time.monotonic()
+    ergebnisse = runtime.deliver([('langsam', langsam, 'T', 'x'),
+                                  ('schnell', Schnell({}), 'T', 'x')], deadline=0.3)
+    assert time.monotonic() - start < 2
+    assert ergebnisse['schnell']['ok'] is True
+    assert isinstance(ergebnisse['langsam']['error'], TimeoutError)
+
+
+def test_submit_liefert_ein_future(runtime):
+    aufrufe = _antworten(runtime)
+    future = runtime.submit(_telegram(7), 'Titel', 'Text')
+    assert future.result(5) is True
+    ((url, kwargs),) = aufrufe
+    assert url.endswith('/botbot/sendMessage')
+    assert kwargs['json']['chat_id'] == '7'
+
+
+def test_429_wird_abgewartet_und_wiederholt(runtime):
+    aufrufe = _antworten(runtime, [
+        _Antwort(429, {'Retry-After': '0.2'}, b''),
+        _Antwort(200, {}, b''),
+    ])
+    runtime.submit(DiscordNotifier({'webhook_url': 'https://hook'}), 'T', 'x').result(5)
+    assert len(aufrufe) == 2
+
+
+def test_lange_pause_geht_als_ratelimited_zurueck(runtime):
+    _antworten(runtime, [_Antwort(429, {}, b'{"retry_after": 300}')])
+    ergebnisse = runtime.deliver([('d', DiscordNotifier({'webhook_url': 'https://hook'}), 'T', 'x')])
+    assert isinstance(ergebnisse['d']['error'], RateLimited)
+
+
+def test_http_fehler_kommt_als_ausnahme_zurueck(runtime):
+    _antworten(runtime, [_Antwort(400, {}, b'{"description": "chat not found"}')])
+    with pytest.raises(Exception, match='chat not found'):
+        runtime.submit(_telegram(1), 'T', 'x').result(5)
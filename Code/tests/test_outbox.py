@@ -0,0 +1,265 @@
+"""Tests fuer die Zustellung ueber die Outbox.
+
+Datenbank ist eine echte, temporaere SQLite-Datei; die Notifier sind
+Attrappen. Kernaussagen: Ein gescheiterter Kanal wird spaeter erneut
+bedient, der Tracker zaehlt nur tatsaechlich zugestellte Meldungen, und
+nach der Hoechstzahl an Versuchen bleibt die Zeile als ``dead`` liegen.
+"""
+import json
+import os
+import tempfile
+
+import pytest
+
+import database
+import outbox
+from notifiers import RateLimited
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    verzeichnis = tempfile.mkdtemp()
+    pfad = os.path.join(verzeichnis, "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    verbindung = database.get_db()
+    verbindung.executemany(
+        "INSERT INTO notification_channels (id, type, name, enabled, config_json) "
+        "VALUES (?, ?, ?, 1, ?)",
+        [(1, 'telegram', 'Telegram', json.dumps({'chat_id': '1'})),
+         (2, 'email', 'Mail', json.dumps({'to_email': 'a@b.c'}))])
+    verbindung.commit()
+    verbindung.close()
+    return pfad
+
+
+@pytest.fixture()
+def kanaele(monkeypatch):
+    """Attrappen-Notifier: ``kaputt`` enthaelt die Typen, die scheitern."""
+    zustand = {'kaputt': set(), 'gedrosselt': set(), 'gesendet': []}
+
+    class Attrappe:
+        def __init__(self, channel_type):
+            self.channel_type = channel_type
+
+        def send(self, title, message):
+            if self.channel_type in zustand['gedrosselt']:
+                raise RateLimited(120)
+            if self.channel_type in zustand['kaputt']:
+                raise ConnectionError(f"{self.channel_type} nicht erreichbar")
+            zustand['gesendet'].append((self.channel_type, title))
+
+    monkeypatch.setattr(outbox, 'get_channel_notifier',
+                        lambda channel: Attrappe(channel['type']))
+    return zustand
+
+
+ALERTS = [{'product_id': '7', 'type': 'expiring', 'best_before': '2026-10-20',
+           'name': 'Milch', 'detail': 'MHD: 2026-10-20'}]
+
+
+def _zeilen():
+    verbindung = database.get_db()
+    try:
+        return [dict(r) for r in verbindung.execute(
+            "SELECT * FROM notification_outbox ORDER BY id")]
+    finally:
+        verbindung.close()
+
+
+def _faellig_machen():
+    verbindung = database.get_db()
+    verbindung.execute("UPDATE notification_outbox SET next_attempt_at = datetime('now')")
+    verbindung.commit()
+    verbindung.close()
+
+
+def test_gescheiterter_kanal_wird_spaeter_erneut_bedient(datenbank, kanaele):
+    kanaele['kaputt'] = {'email'}
+    outbox.enqueue('Titel', 'Text', ALERTS, {('7', 'expiring')})
+
+    assert outbox.deliver_outbox() == {'sent': 1, 'retry': 1, 'dead': 0}
+    mail = [z for z in _zeilen() if z['channel_id'] == 2][0]
+    assert mail['status'] == 'pending' and mail['attempts'] == 1
+    assert 'nicht erreichbar' in mail['last_error']
+
+    # Vor Ablauf der Wartezeit passiert nichts
+    assert outbox.deliver_outbox() == {'sent': 0, 'retry': 0, 'dead': 0}
+
+    kanaele['kaputt'] = set()
+    _faellig_machen()
+    assert outbox.deliver_outbox()['sent'] == 1
+    assert {z['status'] for z in _zeilen()} == {'sent'}
+
+
+def test_tracker_zaehlt_nur_zugestellte_meldungen(datenbank, kanaele):
+    kanaele['kaputt'] = {'email', 'telegram'}
+    outbox.enqueue('Titel', 'Text', ALERTS, {('7', 'expiring')})
+    outbox.deliver_outbox()
+    assert database.get_tracker_entries() == {}
+
+    kanaele['kaputt'] = set()
+    _faellig_machen()
+    outbox.deliver_outbox()
+    # Zwei Kanaele zugestellt, aber ein Check -- also einmal gezaehlt
+    assert database.get_tracker_entry('7', 'expiring')['sent_count'] == 1
+
+
+def test_nach_hoechstzahl_bleibt_die_zeile_liegen(datenbank, kanaele, monkeypatch):
+    monkeypatch.setattr(outbox, 'MAX_ATTEMPTS', 3)
+    kanaele['kaputt'] = {'email'}
+    outbox.enqueue('Titel', 'Text', ALERTS, {('7', 'expiring')})
+    for _ in range(3):
+        outbox.deliver_outbox()
+        _faellig_machen()
+
+    (tot,) = [z for z in database.get_outbox() if z['status'] == 'dead']
+    assert tot['channel_name'] == 'Mail' and tot['attempts'] == 3
+
+    kanaele['kaputt'] = set()
+    assert database.retry_outbox_entry(tot['id']) == 1
+    assert outbox.deliver_outbox()['sent'] == 1
+
+
+def test_erneut_zustellen_wartet_nicht_auf_den_kanal(datenbank, kanaele):
+    import app as anwendungsmodul
+    import worker
+    outbox.enqueue('Titel', 'Text', ALERTS, {('7', 'expiring')})
+    verbindung = database.get_db()
+    verbindung.execute("UPDATE notification_outbox SET status = 'dead'")
+    verbindung.commit()
+    verbindung.close()
+    tot = _zeilen()[0]
+
+    client = anwendungsmodul.app.test_client()
+    antwort = client.post(f"/api/outbox/{tot['id']}/retry")
+    assert antwort.status_code == 202 and antwort.get_json()['job_id']
+    # Im Request nichts verschickt, erst der Auftrag im Worker stellt zu
+    assert kanaele['gesendet'] == [] and _zeilen()[0]['status'] == 'pending'
+    worker.process_queue('test')
+    assert _zeilen()[0]['status'] == 'sent' and kanaele['gesendet']
+    assert client.post('/api/outbox/999999/retry').status_code == 404
+
+
+def test_neue_meldung_ueberholt_wartende(datenbank, kanaele):
+    kanaele['kaputt'] = {'email'}
+    outbox.enqueue('Alt', 'Text', ALERTS, {('7', 'expiring')})
+    outbox.deliver_outbox()
+    outbox.enqueue('Neu', 'Text', ALERTS, {('7', 'expiring')})
+
+    mail = [(z['title'], z['status']) for z in _zeilen() if z['channel_id'] == 2]
+    assert mail == [('Alt', 'superseded'), ('Neu', 'pending')]
+
+
+def test_sendegrenze_zaehlt_nicht_als_versuch(datenbank, kanaele):
+    kanaele['gedrosselt'] = {'telegram'}
+    outbox.enqueue('Titel', 'Text', ALERTS, {('7', 'expiring')})
+    outbox.deliver_outbox()
+
+    (telegram,) = [z for z in _zeilen() if z['channel_id'] == 1]
+    assert telegram['status'] == 'pending' and telegram['attempts'] == 0
+    verbindung = database.get_db()
+    abstand = verbindung.execute(
+        "SELECT CAST(strftime('%s', ?) AS INTEGER) - CAST(strftime('%s', 'now') AS INTEGER)",
+        (telegram['next_attempt_at'],)).fetchone()[0]
+    verbindung.close()
+    assert 110 <= abstand <= 120
+
+
+def test_je_kanal_nur_eine_reservierung(datenbank):
+    database.enqueue_notifications('a', [(1, 'Telegram')], 'T1', 'x', [], set())
+    verbindung = database.get_db()
+    verbindung.execute("UPDATE notification_outbox SET status = 'pending'")
+    verbindung.execute(
+        "INSERT INTO notification_outbox (batch_id, channel_id, channel_name, title, message) "
+        "VALUES ('b', 1, 'Telegram', 'T2', 'x')")
+    verbindung.commit()
+    verbindung.close()
+
+    assert [z['title'] for z in database.claim_due_outbox()] == ['T1']
+    # Solange T1 in Arbeit ist, bekommt der Kanal keine zweite Zeile
+    assert database.claim_due_outbox() == []
+
+
+def test_backoff_waechst_bis_zur_obergrenze():
+    assert 54 <= outbox.backoff_seconds(1) <= 66
+    assert 108 <= outbox.backoff_seconds(2) <= 132
+    assert outbox.backoff_seconds(30) <= outbox.BACKOFF_MAX_SECONDS * 1.1
+
+
+@pytest.fixture()
+def bestand(monkeypatch):
+    """Grocy-Attrappe fuer ``scheduler.run_check``: ein ueberfaelliges Produkt."""
+    import scheduler
+    eintraege = [{'product_id': 7, 'best_before_date': '2000-01-02',
+                  'product': {'id': 7, 'name': 'Milch'}}]
+
+    class Grocy:
+        def __init__(self, *args):
+            pass
+
+        def get_all_stock(self):
+            return list(eintraege)
+
+    monkeypatch.setattr(scheduler, 'GrocyClient', Grocy)
+    # Jeder Check ein eigener Zyklus, sonst kaeme der Bestand aus dem Snapshot
+    from grocy_snapshot import get_snapshot
+    monkeypatch.setattr(get_snapshot(), 'max_age', 0)
+    database.save_settings({'grocy_url': 'http://grocy', 'grocy_api_key': 'k',
+                            'notify_missing': '0', 'notification_repeat_limit': '0'})
+    return eintraege
+
+
+def test_check_wartet_nicht_auf_die_zustellung(datenbank, kanaele, bestand):
+    import scheduler
+    import worker
+    kanaele['kaputt'] = {'email'}
+    assert scheduler.run_check()['alerts'] == 1
+    # Der Check legt nur ab; gesendet wird erst im Auftrag des Workers
+    assert kanaele['gesendet'] == []
+    assert {z['status'] for z in _zeilen()} == {'pending'}
+
+    worker.run_check_job()
+    (auftrag,) = database.get_jobs(kind='outbox_delivery')
+    assert auftrag['status'] == 'queued'
+    worker.process_queue('test')
+    assert [k for k, _ in kanaele['gesendet']] == ['telegram']
+
+
+def test_inkrementeller_check_meldet_nur_wechsel(datenbank, kanaele, bestand):
+    import scheduler
+    database.save_settings({'check_mode': 'incremental'})
+
+    assert scheduler.run_check()['new'] == 1
+    outbox.deliver_outbox()
+    assert len(kanaele['gesendet']) == 2
+    # Nichts hat sich geaendert: kein Versand, keine Outbox-Zeile
+    assert scheduler.run_check()['alerts'] == 0
+    assert len(kanaele['gesendet']) == 2 and len(_zeilen()) == 2
+
+    bestand.clear()
+    ergebnis = scheduler.run_check()
+    assert ergebnis['resolved'] == 1 and ergebnis['alerts'] == 0
+    assert database.get_alert_snapshot() == {}
+
+
+def test_wechsel_bleiben_offen_wenn_alle_kanaele_scheitern(datenbank, kanaele, bestand,
+                                                           monkeypatch):
+    import scheduler
+    monkeypatch.setattr(outbox, 'MAX_ATTEMPTS', 1)
+    database.save_settings({'check_mode': 'incremental'})
+    kanaele['kaputt'] = {'email', 'telegram'}
+
+    assert scheduler.run_check()['new'] == 1
+    # Vor der Zustellung steht der Wechsel noch nicht im Snapshot
+    assert database.get_alert_snapshot() == {}
+    assert outbox.deliver_outbox()['dead'] == 2
+    assert database.get_alert_snapshot() == {}
+
+    # Der naechste Check meldet den Wechsel erneut, diesmal mit Erfolg
+    kanaele['kaputt'] = set()
+    assert scheduler.run_check()['new'] == 1
+    assert outbox.deliver_outbox()['sent'] == 2
+    assert list(database.get_alert_snapshot()) == [('7', 'expired', '2000-01-02')]
+    assert scheduler.run_check()['alerts'] == 0
@@ -0,0 +1,189 @@
+"""Tests fuer die Auftrags-Warteschlange zwischen Weboberflaeche und Worker.
+
+Echte, temporaere SQLite-Datei; die Auftragsarten werden durch kleine
+Funktionen ersetzt, damit weder Grocy noch Bring gebraucht werden.
+"""
+import os
+import tempfile
+import threading
+
+import pytest
+
+import database
+import worker
+
+
+@pytest.fixture()
+def datenbank(monkeypatch):
+    pfad = os.path.join(tempfile.mkdtemp(), "data", "test.db")
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    monkeypatch.setattr(database, "DB_PATH", pfad)
+    database.init_db()
+    return pfad
+
+
+@pytest.fixture()
+def auftraege(monkeypatch):
+    aufrufe = []
+
+    def rechnen(payload):
+        aufrufe.append(threading.current_thread().name)
+        return {'summe': payload['a'] + payload['b']}
+
+    def kaputt(payload):
+        raise RuntimeError("Grocy nicht erreichbar")
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, 'rechnen', rechnen)
+    monkeypatch.setitem(worker.JOB_HANDLERS, 'kaputt', kaputt)
+    return aufrufe
+
+
+def test_worker_arbeitet_die_warteschlange_ab(datenbank, auftraege):
+    gut, _ = database.enqueue_job('rechnen', {'a': 2, 'b': 3})
+    schlecht, _ = database.enqueue_job('kaputt')
+
+    assert worker.process_queue('test') == 2
+    assert database.get_job(gut)['result'] == {'summe': 5}
+    job = database.get_job(schlecht)
+    assert job['status'] == 'failed' and 'nicht erreichbar' in job['error']
+    assert worker.process_queue('test') == 0
+
+
+def test_web_rolle_wartet_auf_den_worker(datenbank, auftraege, monkeypatch):
+    monkeypatch.setenv(worker.ROLE_ENV, 'web')
+    monkeypatch.setattr(worker, 'QUEUE_POLL_SECONDS', 0.05)
+    worker.start_job_consumer()
+    try:
+        assert worker.execute_job('rechnen', {'a': 1, 'b': 1}, timeout=5) == {'summe': 2}
+        # Ausgefuehrt im Thread der Warteschlange, nicht im Aufrufer
+        assert auftraege == ['job-queue']
+        with pytest.raises(worker.JobFailed, match='nicht erreichbar'):
+            worker.execute_job('kaputt', timeout=5)
+    finally:
+        worker._consumer_stop.set()
+        worker._consumer_thread.join(5)
+
+
+def test_abgebrochener_auftrag_wird_nicht_wiederholt(datenbank):
+    job_id, _ = database.enqueue_job('rechnen', {'a': 1, 'b': 2})
+    assert database.claim_next_job('tot')['id'] == job_id
+    verbindung = database.get_db()
+    verbindung.execute("UPDATE job_queue SET started_at = datetime('now', '-2 hours')")
+    verbindung.commit()
+    verbindung.close()
+
+    assert database.claim_next_job('neu') is None
+    assert database.get_job(job_id)['status'] == 'failed'
+
+
+def test_unbekannte_rolle_faellt_auf_all_zurueck(monkeypatch):
+    monkeypatch.setenv(worker.ROLE_ENV, 'Web')
+    assert worker.get_role() == 'web'
+    monkeypatch.setenv(worker.ROLE_ENV, 'irgendwas')
+    assert worker.get_role() == 'all'
+
+
+def test_doppelte_auftraege_werden_zusammengefasst(datenbank):
+    erster, neu = database.enqueue_job('rechnen', {'a': 1, 'b': 2})
+    assert neu
+    # Gleiche Daten in anderer Reihenfolge: derselbe Auftrag
+    assert database.enqueue_job('rechnen', {'b': 2, 'a': 1}) == (erster, False)
+    assert database.claim_next_job('w1')['id'] == erster
+    assert database.enqueue_job('rechnen', {'a': 1, 'b': 2}) == (erster, False)
+
+    database.finish_job(erster, result={'summe': 3})
+    zweiter, neu = database.enqueue_job('rechnen', {'a': 1, 'b': 2})
+    assert neu and zweiter != erster
+
+
+def test_je_art_laeuft_hoechstens_ein_auftrag(datenbank):
+    a, _ = database.enqueue_job('rechnen', {'a': 1, 'b': 1})
+    b, _ = database.enqueue_job('rechnen', {'a': 2, 'b': 2})
+    c, _ = database.enqueue_job('kaputt')
+    assert database.claim_next_job('w1')['id'] == a
+    # Der zweite Rechenauftrag wartet, die andere Art darf laufen
+    assert database.claim_next_job('w2')['id'] == c
+    assert database.claim_next_job('w3') is None
+    database.finish_job(a, result={})
+    assert database.claim_next_job('w3')['id'] == b
+
+
+def test_geplanter_lauf_nie_neben_dem_auftrag(datenbank, monkeypatch):
+    laeufe = []
+    monkeypatch.setitem(worker.SCHEDULED_RUNS, 'check', lambda: laeufe.append('geplant'))
+    monkeypatch.setitem(worker.JOB_HANDLERS, 'check', lambda p: laeufe.append('klick'))
+
+    # "Jetzt pruefen" laeuft gerade: der geplante Check wird kein zweiter Auftrag
+    klick, _ = worker.submit_job('check')
+    assert database.claim_next_job('w1')['id'] == klick
+    worker.queue_check()
+    assert database.claim_next_job('w2') is None
+    database.finish_job(klick, result={})
+
+    # Ohne laufenden Auftrag kommt der geplante Lauf als eigener Auftrag
+    worker.queue_check()
+    assert worker.process_queue('test') == 1
+    assert laeufe == ['geplant']
+    lauf, = database.get_job_runs(job='check')
+    assert lauf['source'] == 'schedule'
+
+
+def test_phase_und_fortschritt(datenbank, monkeypatch):
+    stand = []
+
+    def schritte(payload):
+        worker.report_phase('grocy', 0.0)
+        worker.report_phase('ocr', 0.5)
+        job = database.get_job(payload['id'])
+        stand.append((job['phase'], job['progress']))
+        return {}
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, 'schritte', schritte)
+    job_id, _ = database.enqueue_job('schritte', {'id': 1})
+    worker.process_queue('test')
+    assert stand == [('ocr', 0.5)]
+    job = database.get_job(job_id)
+    assert job['status'] == 'done' and job['progress'] == 1
+    # Ausserhalb eines Auftrags passiert nichts
+    worker.report_phase('leer')
+
+
+def test_endpunkt_antwortet_sofort_mit_auftrags_id(datenbank, monkeypatch):
+    import app as anwendungsmodul
+    freigabe = threading.Event()
+
+    def pruefen(payload):
+        freigabe.wait(5)
+        return {'message': 'fertig', 'alerts': 0}
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, 'check', pruefen)
+    client = anwendungsmodul.app.test_client()
+    erste = client.post('/api/check-now')
+    assert erste.status_code == 202
+    job_id = erste.get_json()['job_id']
+    zweite = client.post('/api/check-now').get_json()
+    assert zweite['job_id'] == job_id and zweite['deduplicated'] is True
+
+    # Ohne Frist: einmal nachsehen, dann TimeoutError mit der Art des Auftrags
+    with pytest.raises(TimeoutError, match='check'):
+        worker.wait_for_job(job_id, timeout=0)
+
+    freigabe.set()
+    worker.process_queue('test')
+    assert worker.wait_for_job(job_id, timeout=5)['message'] == 'fertig'
+    assert worker.wait_for_job(job_id, timeout=0)['message'] == 'fertig'
+    stand = client.get(f'/api/jobs/{job_id}').get_json()
+    assert stand['status'] == 'done' and stand['result']['message'] == 'fertig'
+    assert 'payload' not in stand
+    assert client.get('/api/jobs/999999').status_code == 404
+
+    # Mit ?wait=1 die alte, synchrone Antwort
+    monkeypatch.setattr(worker, 'QUEUE_POLL_SECONDS', 0.05)
+    worker.start_job_consumer()
+    try:
+        antwort = client.post('/api/check-now?wait=1')
+        assert antwort.status_code == 200
+        assert antwort.get_json()['ok'] and antwort.get_json()['message'] == 'fertig'
+    finally:
+        worker._consumer_stop.set()
+        worker._consumer_thread.join(5)
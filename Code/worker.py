@@ -0,0 +1,631 @@
+"""Hintergrund-Jobs: Scheduler, Auftrags-Warteschlange und eigener Prozess.
+
+Bis 1.7.x lebten Scheduler und Jobs in ``app.py`` und teilten sich CPU und
+GIL mit den Flask-Requests: Ein Tesseract-Lauf machte die Oberflaeche
+zaeh, ein Bring-Sync auf Knopfdruck hielt einen Gunicorn-Worker fest. Hier
+liegt jetzt alles, was im Hintergrund laeuft:
+
+- der ``BackgroundScheduler`` mit allen geplanten Jobs -- gestartet nur in
+  dem Prozess, der die Leader-Sperre haelt (``leader.py``)
+- die Warteschlange ``job_queue``: Die Weboberflaeche legt Auftraege
+  (Check, Sync, Kassenbon) dort ab, ein Worker arbeitet sie ab und meldet
+  Phase und Fortschritt zurueck; je Art laeuft hoechstens einer. Auch der
+  geplante Check und die geplanten Syncs laufen als Auftrag, sonst liefen
+  sie neben einem Klick auf "Jetzt pruefen" derselben Art
+
+Welcher Prozess was tut, bestimmt ``GROCYLINK_ROLE``:
+
+- ``all`` (Standard, wie bisher): Gunicorn bedient HTTP, der Leader unter
+  den Gunicorn-Prozessen fuehrt Scheduler und Warteschlange
+- ``web``: Gunicorn bedient nur HTTP und legt Auftraege ab
+- ``worker``: ``python -m worker`` -- kein HTTP; jeder Worker-Prozess
+  arbeitet die Warteschlange ab, der Leader unter ihnen fuehrt zusaetzlich
+  den Scheduler
+
+Beide Seiten lassen sich so getrennt neu starten und skalieren; gemeinsam
+ist nur das Datenverzeichnis.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.util import obj_to_ref
+
+import database
+import sprache
+from database import (
+    get_all_settings, run_maintenance, add_log_entry, purge_outbox,
+    save_receipt, save_receipt_with_items, reprocess_receipt_result, get_receipt,
+    get_product_mappings_dict, enqueue_job, claim_next_job, finish_job, get_job,
+    update_job_phase, purge_jobs, purge_job_runs,
+)
+from grocy_snapshot import snapshot_data
+from scheduler import run_check, next_wakeup, RESYNC_INTERVAL_MINUTES
+from outbox import deliver_outbox, DELIVERY_INTERVAL_SECONDS
+from caldav_sync import CalDAVSync, run_caldav_sync
+from bring_sync import BringSync, run_bring_sync, BringSyncError
+from receipt_scanner import process_receipt, scan_receipt_folder
+from leader import SchedulerLeader, LOCK_FILENAME
+from jobstore import SQLiteJobStore
+from jobruns import job_run, phase, count, timed, current_run
+import dashboard
+from dashboard import DASHBOARD_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ROLE_ENV = 'GROCYLINK_ROLE'
+ROLES = ('all', 'web', 'worker')
+
+# Abstand, in dem ein Worker nach neuen Auftraegen sieht
+QUEUE_POLL_SECONDS = 1.0
+
+# So lange wartet ein Request hoechstens auf seinen Auftrag -- unter dem
+# Gunicorn-Timeout von 120 s
+JOB_WAIT_SECONDS = 100
+
+# Abstand, in dem der Leader Einstellungsaenderungen anderer Prozesse abholt
+SETTINGS_WATCH_SECONDS = 30
+
+
+def get_role():
+    """Rolle dieses Prozesses laut ``GROCYLINK_ROLE`` (Standard ``all``)."""
+    role = os.environ.get(ROLE_ENV, 'all').strip().lower()
+    if role not in ROLES:
+        logger.warning(f"Unbekannte Rolle {ROLE_ENV}={role!r}, verwende 'all'")
+        return 'all'
+    return role
+
+
+# Jobs liegen in der Datenbank und ueberstehen so einen Neustart. Kein Job
+# laeuft doppelt (max_instances), verpasste Laeufe werden zu einem
+# zusammengefasst (coalesce) und innerhalb der Kulanzzeit nachgeholt.
+bg_scheduler = BackgroundScheduler(
+    daemon=True,
+    jobstores={'default': SQLiteJobStore()},
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300},
+)
+
+
+def lock_path():
+    """Sperrdatei neben der Datenbank -- erst bei ``run()`` ermittelt, nicht beim Import."""
+    return os.path.join(os.path.dirname(database.DB_PATH), LOCK_FILENAME)
+
+
+# Nur der Prozess mit der Sperre im Datenverzeichnis fuehrt die Jobs aus
+scheduler_leader = SchedulerLeader(lock_path)
+
+
+# ── Geplante Jobs ──────────────────────────────────────────────────────
+
+@timed('check')
+def run_check_job():
+    """Stock-Check mit anschliessendem Weckruf fuer den naechsten Uebertritt.
+
+    Der Intervall-Check bleibt als Abgleich fuer Buchungen in Grocy; die
+    Warnung selbst kommt am Tag des Uebertritts, nicht erst mit dem
+    naechsten Intervall. Neue Meldungen stellt ein eigener Auftrag zu --
+    ein langsamer Kanal haelt den Check nicht auf.
+    """
+    summary = run_check()
+    if summary and summary.get('alerts'):
+        submit_job('outbox_delivery', source='schedule')
+    schedule_wakeup(summary)
+    return summary
+
+
+def schedule_wakeup(summary):
+    """Plant den Check zum naechsten Schwellen-Uebertritt (date-Trigger)."""
+    if not scheduler_leader.is_leader:
+        return  # der Leader holt den Weckruf mit dem naechsten Abgleich nach
+    if bg_scheduler.get_job('grocy_check_wakeup'):
+        bg_scheduler.remove_job('grocy_check_wakeup', jobstore='default')
+    when = summary.get('next_wakeup') if summary else None
+    # Abgeschaltete Checks (Intervall 0) bleiben auch ohne Weckruf
+    if when is None or int(get_all_settings().get('check_interval_hours', 6)) <= 0:
+        return
+    bg_scheduler.add_job(queue_check, 'date', run_date=when,
+                         id='grocy_check_wakeup', replace_existing=True,
+                         misfire_grace_time=3600)
+    logger.info(f"Naechster Schwellen-Uebertritt: {when:%Y-%m-%d %H:%M}")
+
+
+def queue_check():
+    """Geplanter Check -- als Auftrag, siehe ``SCHEDULED_RUNS``."""
+    submit_job('check', source='schedule')
+
+
+def queue_caldav_sync():
+    """Geplanter CalDAV-Sync -- als Auftrag, siehe ``SCHEDULED_RUNS``."""
+    submit_job('caldav_sync', source='schedule')
+
+
+def queue_bring_sync():
+    """Geplanter Bring-Sync -- als Auftrag, siehe ``SCHEDULED_RUNS``."""
+    submit_job('bring_sync', source='schedule')
+
+
+def run_wakeup_resync():
+    """Verschiebt den Weckruf, wenn sich der Bestand in Grocy geaendert hat."""
+    try:
+        schedule_wakeup({'next_wakeup': next_wakeup()})
+    except Exception as e:
+        logger.error(f"Weckruf-Abgleich Fehler: {e}")
+
+
+@timed('receipt_watch')
+def run_receipt_watch():
+    """Wird vom Scheduler aufgerufen um den Kassenbon-Ordner zu scannen."""
+    try:
+        settings = get_all_settings()
+        folder = settings.get('receipt_watch_folder', '/app/receipts')
+        threshold = int(settings.get('receipt_match_threshold', 70))
+        with phase('grocy_fetch'):
+            grocy_products = snapshot_data('products', 'receipt_watch')
+        mappings = get_product_mappings_dict()
+        results = scan_receipt_folder(folder, grocy_products, mappings, threshold=threshold)
+        if results:
+            logger.info(f"Kassenbon-Scan: {len(results)} neue Bons verarbeitet")
+    except Exception as e:
+        logger.error(f"Kassenbon-Scan Fehler: {e}")
+
+
+@timed('dashboard_refresh')
+def run_dashboard_refresh():
+    """Rechnet Dashboard und Produktliste aus dem Grocy-Snapshot vor (``dashboard.py``)."""
+    try:
+        dashboard.refresh()
+    except Exception as e:
+        # Die alte Antwort bleibt stehen; ihr Alter zeigt die Oberflaeche
+        logger.error(f"Dashboard-Vorberechnung Fehler: {e}")
+        current_run().fail(e)
+
+
+def run_db_maintenance():
+    """Wird vom Scheduler aufgerufen: PRAGMA optimize, Vacuum, Integritaet."""
+    try:
+        purge_outbox()
+        purge_jobs()
+        purge_job_runs()
+        run_maintenance()
+    except Exception as e:
+        logger.error(f"Datenbank-Wartung Fehler: {e}")
+
+
+def run_outbox_delivery():
+    """Wird vom Scheduler aufgerufen: faellige Benachrichtigungen zustellen."""
+    try:
+        deliver_outbox()
+    except Exception as e:
+        logger.error(f"Outbox-Zustellung Fehler: {e}")
+
+
+# Stand der Einstellungen, mit dem die Jobs zuletzt geplant wurden
+_schedule_fingerprint = None
+
+
+def _settings_fingerprint(settings=None):
+    return hashlib.sha256(
+        json.dumps(settings or get_all_settings(), sort_keys=True).encode()).hexdigest()
+
+
+def watch_schedule_settings():
+    """Plant neu, wenn ein anderer Prozess die Einstellungen gespeichert hat.
+
+    Gespeichert wird in dem Prozess, der den Request bekommt -- der
+    Scheduler laeuft aber nur im Leader.
+    """
+    try:
+        if _settings_fingerprint() != _schedule_fingerprint:
+            logger.info("Einstellungen geaendert, Jobs werden neu geplant")
+            apply_schedules()
+    except Exception as e:
+        logger.error(f"Einstellungs-Abgleich Fehler: {e}")
+
+
+# ── Job-Verzeichnis ────────────────────────────────────────────────────
+#
+# Ein Eintrag je geplantem Job. ``trigger`` uebersetzt die Einstellungen in
+# die Argumente eines IntervalTrigger -- oder None, wenn der Job nicht laufen
+# soll. ``jitter`` (Sekunden) verteilt Jobs, die sonst gleichzeitig Grocy
+# abfragen wuerden; ``sofort`` startet einen neu angelegten Job gleich.
+
+JobSpec = namedtuple('JobSpec', 'id func trigger jitter sofort')
+
+
+def _check_trigger(settings):
+    hours = int(settings.get('check_interval_hours', 6))
+    return {'hours': hours} if hours > 0 else None
+
+
+def _resync_trigger(settings):
+    # Abgleich sofort und dann regelmaessig, damit der Weckruf auch nach
+    # Buchungen in Grocy stimmt
+    return {'minutes': RESYNC_INTERVAL_MINUTES} if _check_trigger(settings) else None
+
+
+def _minuten_wenn_aktiv(schalter, schluessel, standard):
+    def trigger(settings):
+        if settings.get(schalter, '0') != '1':
+            return None
+        minutes = int(settings.get(schluessel, standard))
+        return {'minutes': minutes} if minutes > 0 else None
+    return trigger
+
+
+def _dashboard_trigger(settings):
+    if not settings.get('grocy_url') or not settings.get('grocy_api_key'):
+        return None
+    return {'seconds': DASHBOARD_REFRESH_SECONDS}
+
+
+def _maintenance_trigger(settings):
+    hours = int(settings.get('db_maintenance_interval_hours', 24))
+    return {'hours': hours} if hours > 0 else None
+
+
+JOBS = [
+    JobSpec('grocy_check', queue_check, _check_trigger, 120, False),
+    JobSpec('grocy_check_resync', run_wakeup_resync, _resync_trigger, 60, True),
+    JobSpec('caldav_sync', queue_caldav_sync,
+            _minuten_wenn_aktiv('caldav_sync_enabled', 'caldav_sync_interval_minutes', 30),
+            30, False),
+    JobSpec('bring_sync', queue_bring_sync,
+            _minuten_wenn_aktiv('bring_sync_enabled', 'bring_sync_interval_minutes', 30),
+            30, False),
+    JobSpec('receipt_watch', run_receipt_watch,
+            _minuten_wenn_aktiv('receipt_watch_enabled', 'receipt_watch_interval_minutes', 5),
+            15, False),
+    JobSpec('dashboard_refresh', run_dashboard_refresh, _dashboard_trigger, 10, True),
+    JobSpec('db_maintenance', run_db_maintenance, _maintenance_trigger, 300, False),
+    JobSpec('outbox_delivery', run_outbox_delivery,
+            lambda settings: {'seconds': DELIVERY_INTERVAL_SECONDS}, 0, False),
+    JobSpec('settings_watch', watch_schedule_settings,
+            lambda settings: {'seconds': SETTINGS_WATCH_SECONDS}, 0, False),
+]
+
+
+def apply_schedules(settings=None):
+    """Gleicht die geplanten Jobs mit ``JOBS`` und den Einstellungen ab.
+
+    Nur Jobs, deren Intervall sich geaendert hat, werden neu geplant; alle
+    anderen behalten ihren naechsten Lauf -- auch den aus der Datenbank nach
+    einem Neustart. Bis 1.7.x plante jedes Speichern alle Jobs neu.
+    """
+    global _schedule_fingerprint
+    settings = settings or get_all_settings()
+    _schedule_fingerprint = _settings_fingerprint(settings)
+    for spec in JOBS:
+        _plane(spec, spec.trigger(settings))
+    # Jobs aus aelteren Versionen, die es nicht mehr gibt, aus der Datenbank raeumen
+    bekannt = {spec.id for spec in JOBS} | {'grocy_check_wakeup'}
+    for job in bg_scheduler.get_jobs():
+        if job.id not in bekannt:
+            bg_scheduler.remove_job(job.id)
+
+
+def _plane(spec, intervall):
+    job = bg_scheduler.get_job(spec.id)
+    if intervall is None:
+        if job is not None:
+            bg_scheduler.remove_job(spec.id)
+            logger.info(f"Job {spec.id} abgeschaltet")
+        return
+    soll = timedelta(**intervall)
+    jitter = spec.jitter or None
+    if (job is not None and job.func_ref == obj_to_ref(spec.func)
+            and isinstance(job.trigger, IntervalTrigger)
+            and job.trigger.interval == soll and job.trigger.jitter == jitter):
+        return
+    optionen = {'next_run_time': datetime.now()} if spec.sofort and job is None else {}
+    # Ein verpasster Lauf wird bis zu einem Intervall spaeter nachgeholt
+    bg_scheduler.add_job(spec.func, IntervalTrigger(jitter=jitter, **intervall),
+                         id=spec.id, replace_existing=True,
+                         misfire_grace_time=int(soll.total_seconds()), **optionen)
+    logger.info(f"Job {spec.id} geplant: alle {soll}")
+
+
+def start_scheduler():
+    """Startet Scheduler und Warteschlange -- Aufruf durch den Leader."""
+    bg_scheduler.start()
+    apply_schedules()
+    start_job_consumer()
+
+
+# ── Auftraege aus der Weboberflaeche ───────────────────────────────────
+
+class JobFailed(Exception):
+    """Ein Auftrag ist im Worker gescheitert; die Meldung kommt von dort."""
+
+
+_laufender_auftrag = threading.local()
+
+
+def report_phase(name, progress=None):
+    """Meldet Phase und Fortschritt (0..1) des Auftrags, der gerade laeuft.
+
+    Jede ``jobruns.phase`` eines Auftrags landet hier. Ausserhalb eines
+    Auftrags -- etwa im geplanten Job -- passiert nichts.
+    """
+    job_id = getattr(_laufender_auftrag, 'job_id', None)
+    if job_id is None:
+        return
+    try:
+        update_job_phase(job_id, name, progress)
+    except Exception as e:
+        logger.debug(f"Phase von Auftrag {job_id} nicht gespeichert: {e}")
+
+
+def _job_check(payload):
+    summary = run_check_job() or {}
+    wakeup = summary.get('next_wakeup')
+    return {'message': sprache.t('msg.check_done'),
+            'alerts': summary.get('alerts', 0),
+            'next_wakeup': wakeup.isoformat() if wakeup else None}
+
+
+def _job_caldav_sync(payload):
+    return {'message': sprache.t('msg.sync_done'), 'stats': CalDAVSync().sync_all()}
+
+
+def _job_bring_sync(payload):
+    try:
+        stats = BringSync().sync_all()
+    except BringSyncError as e:
+        add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
+        raise
+    except Exception as e:
+        logger.exception("Bring-Sync Fehler")
+        add_log_entry(None, 'bring_sync', 'Bring!', str(e), success=False)
+        raise
+    werte = {'added': stats['added'], 'updated': stats['updated'],
+             'removed': stats['removed'], 'errors': stats['errors']}
+    msg = sprache.t('log.bring_sync', **werte)
+    add_log_entry(None, 'bring_sync', 'Bring!', msg,
+                  success=stats['errors'] == 0,
+                  key='log.bring_sync', args=werte)
+    return {'message': msg, 'stats': stats}
+
+
+def _job_dashboard_refresh(payload):
+    dashboard.refresh()
+    return {}
+
+
+def _job_outbox_delivery(payload):
+    # None: ein anderer Aufruf in diesem Prozess leert die Outbox gerade
+    return deliver_outbox() or {}
+
+
+def _grocy_fuer_bons():
+    threshold = int(get_all_settings().get('receipt_match_threshold', 70))
+    return (snapshot_data('products', 'receipt'), get_product_mappings_dict(), threshold)
+
+
+def _job_receipt_upload(payload):
+    """Verarbeitet einen hochgeladenen Bon; Fehler landen als Bon mit Status ``error``."""
+    filepath = payload['filepath']
+    try:
+        with phase('grocy_fetch', 0.0):
+            grocy_products, mappings, threshold = _grocy_fuer_bons()
+        with phase('ocr', 0.25):
+            result = process_receipt(filepath, grocy_products, mappings, threshold=threshold)
+        with phase('db_write', 0.9):
+            receipt_id = save_receipt_with_items(
+                result['items'],
+                filename=os.path.basename(filepath),
+                filepath=filepath,
+                status=result['status'],
+                extraction_method=result['extraction_method'],
+                store_name=result['parsed']['store_name'] if result['parsed'] else None,
+                receipt_date=result['parsed']['receipt_date'] if result['parsed'] else None,
+                total_amount=result['parsed']['total_amount'] if result['parsed'] else None,
+                raw_text=result['raw_text'],
+                error_message=result['error_message'],
+            )
+        count('items', len(result['items']))
+        return {'ok': True, 'receipt_id': receipt_id, 'items_count': len(result['items'])}
+    except Exception as e:
+        logger.error(f"Fehler beim Verarbeiten des Kassenbons: {e}")
+        current_run().fail(e)
+        receipt_id = save_receipt(
+            filename=os.path.basename(filepath), filepath=filepath,
+            status='error', error_message=str(e),
+        )
+        return {'ok': False, 'error': str(e), 'receipt_id': receipt_id}
+
+
+def _job_receipt_reprocess(payload):
+    receipt_id = payload['receipt_id']
+    receipt = get_receipt(receipt_id)
+    with phase('grocy_fetch', 0.0):
+        grocy_products, mappings, threshold = _grocy_fuer_bons()
+    with phase('ocr', 0.25):
+        result = process_receipt(receipt['filepath'], grocy_products, mappings,
+                                 threshold=threshold)
+    with phase('db_write', 0.9):
+        reprocess_receipt_result(receipt_id, result['status'],
+                                 result.get('error_message'), result['items'])
+    count('items', len(result['items']))
+    return {'items_count': len(result['items'])}
+
+
+# Auftragsart -> Funktion(payload) -> JSON-faehiges Ergebnis
+JOB_HANDLERS = {
+    'check': _job_check,
+    'caldav_sync': _job_caldav_sync,
+    'bring_sync': _job_bring_sync,
+    'receipt_upload': _job_receipt_upload,
+    'receipt_reprocess': _job_receipt_reprocess,
+    'dashboard_refresh': _job_dashboard_refresh,
+    'outbox_delivery': _job_outbox_delivery,
+}
+
+
+# Geplante Laeufe dieser Arten gehen ueber die Warteschlange, nicht direkt
+# aus dem Scheduler: Nur dort gilt "ein Auftrag je Art". Sonst liefe der
+# geplante Check neben "Jetzt pruefen" und beide werteten denselben
+# ``alert_snapshot`` aus -- bei den Syncs dieselbe Zuordnungstabelle.
+# Ausgefuehrt wird wie bisher der Job des Schedulers (Schalter, Log-Eintrag).
+SCHEDULED_RUNS = {
+    'check': run_check_job,
+    'caldav_sync': run_caldav_sync,
+    'bring_sync': run_bring_sync,
+}
+
+
+def run_job(job):
+    """Fuehrt einen reservierten Auftrag aus und traegt das Ergebnis ein."""
+    source = job.get('source') or 'manual'
+    geplant = SCHEDULED_RUNS.get(job['kind']) if source == 'schedule' else None
+    handler = JOB_HANDLERS.get(job['kind'])
+    _laufender_auftrag.job_id = job['id']
+    try:
+        if geplant is None and handler is None:
+            raise ValueError(f"Unbekannte Auftragsart: {job['kind']}")
+        with job_run(job['kind'], source, on_phase=report_phase):
+            result = geplant() if geplant else handler(job['payload'])
+    except Exception as e:
+        logger.error(f"Auftrag {job['id']} ({job['kind']}) gescheitert: {e}")
+        finish_job(job['id'], error=e)
+        return
+    finally:
+        _laufender_auftrag.job_id = None
+    finish_job(job['id'], result=result)
+
+
+def process_queue(worker=None, limit=None):
+    """Arbeitet wartende Auftraege ab, bis keiner mehr da ist.
+
+    Returns:
+        Anzahl der bearbeiteten Auftraege.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    anzahl = 0
+    while limit is None or anzahl < limit:
+        job = claim_next_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        anzahl += 1
+    return anzahl
+
+
+_consumer_lock = threading.Lock()
+_consumer_thread = None
+_consumer_stop = threading.Event()
+# Weckt den Thread, wenn dieser Prozess selbst einen Auftrag abgelegt hat
+_consumer_wake = threading.Event()
+
+
+def _consume():
+    while not _consumer_stop.is_set():
+        try:
+            process_queue()
+        except Exception as e:
+            logger.error(f"Auftrags-Warteschlange Fehler: {e}")
+        _consumer_wake.wait(QUEUE_POLL_SECONDS)
+        _consumer_wake.clear()
+
+
+def start_job_consumer():
+    """Startet den Thread, der die Warteschlange abarbeitet (einmal je Prozess)."""
+    global _consumer_thread
+    with _consumer_lock:
+        if _consumer_thread is not None and _consumer_thread.is_alive():
+            return
+        _consumer_stop.clear()
+        _consumer_thread = threading.Thread(target=_consume, name='job-queue', daemon=True)
+        _consumer_thread.start()
+
+
+def submit_job(kind, payload=None, source='manual'):
+    """Legt einen Auftrag ab, ohne auf ihn zu warten.
+
+    Returns:
+        (job_id, neu) -- siehe ``database.enqueue_job``
+    """
+    job_id, neu = enqueue_job(kind, payload, source)
+    _consumer_wake.set()
+    return job_id, neu
+
+
+def job_view(job):
+    """Ein Auftrag, wie ihn die Oberflaeche sieht.
+
+    Ohne Payload: darin stehen etwa Dateipfade hochgeladener Bons.
+    """
+    return {k: job[k] for k in ('id', 'kind', 'status', 'phase', 'progress', 'result',
+                                'error', 'created_at', 'started_at', 'finished_at')}
+
+
+def execute_job(kind, payload=None, timeout=JOB_WAIT_SECONDS):
+    """Legt einen Auftrag ab, wartet auf ihn und liefert sein Ergebnis.
+
+    Auch im Leader geht der Auftrag ueber die Warteschlange -- sonst liefe
+    er an der Regel "ein Auftrag je Art" vorbei.
+
+    Raises:
+        JobFailed: der Auftrag ist gescheitert
+        TimeoutError: nach ``timeout`` Sekunden ohne Ergebnis (der Auftrag
+            laeuft im Worker weiter)
+    """
+    job_id, _ = submit_job(kind, payload)
+    return wait_for_job(job_id, timeout)
+
+
+def wait_for_job(job_id, timeout=JOB_WAIT_SECONDS):
+    """Wartet auf einen abgelegten Auftrag (siehe ``execute_job``)."""
+    frist = time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        if job['status'] == 'done':
+            return job['result']
+        if job['status'] == 'failed':
+            raise JobFailed(job['error'])
+        if time.monotonic() >= frist:
+            break
+        time.sleep(0.25)
+    raise TimeoutError(f"Auftrag {job_id} ({job['kind']}) laeuft nach {timeout}s noch")
+
+
+# ── Eigener Prozess: python -m worker ──────────────────────────────────
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    database.init_db()
+    stop = threading.Event()
+
+    def beenden(signum, frame):
+        logger.info("Worker wird beendet")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, beenden)
+    signal.signal(signal.SIGINT, beenden)
+
+    # Jeder Worker arbeitet Auftraege ab, nur der Leader plant Jobs
+    start_job_consumer()
+    scheduler_leader.run(start_scheduler)
+    logger.info(f"Worker {os.getpid()} bereit")
+    stop.wait()
+
+    _consumer_stop.set()
+    if bg_scheduler.running:
+        bg_scheduler.shutdown(wait=False)
+    scheduler_leader.release()
+
+
+if __name__ == '__main__':
+    # Ueber den Modulnamen starten: Die Jobs in der Datenbank verweisen auf
+    # "worker:...", nicht auf "__main__:..."
+    from worker import main as _main
+    _main()
@@ -27,11 +27,13 @@ fi
 echo "Starte Caddy Reverse Proxy..."
 caddy start --config /etc/caddy/Caddyfile --adapter caddyfile
 
-# Gunicorn starten (Flask-App)
+# Gunicorn starten (Flask-App); gthread wegen der Live-Meldungen (/api/events)
 echo "Starte Grocylink..."
 exec gunicorn \
     --bind 127.0.0.1:5000 \
     --workers "${GUNICORN_WORKERS:-2}" \
+    --worker-class gthread \
+    --threads "${GUNICORN_THREADS:-16}" \
     --timeout 120 \
     --access-logfile - \
     --error-logfile - \
@@ -28,11 +28,25 @@ fi
 mkdir -p /app/data/receipts
 mkdir -p /app/receipts 2>/dev/null || true
 
-# Gunicorn starten (Flask-App)
+# Eigener Worker-Prozess fuer Scheduler und Auftraege (ohne HTTP)
+if [ "${GROCYLINK_ROLE:-all}" = "worker" ]; then
+    echo "Starte Grocylink-Worker..."
+    exec python -m worker
+fi
+
+# Gunicorn starten (Flask-App). Die Hintergrund-Jobs laufen nur in dem
+# Prozess, der die Sperre /app/data/scheduler.lock haelt -- mit --preload
+# ist das der Master, ohne ein Worker; stirbt er, uebernimmt ein anderer.
+# Mit GROCYLINK_ROLE=web bedient Gunicorn nur HTTP, die Jobs laufen in
+# einem Container mit GROCYLINK_ROLE=worker auf demselben Volume.
+# gthread: Die Live-Meldungen (/api/events) halten je offenem Tab einen
+# Thread; mit reinen Sync-Workern blockierte schon ein Tab einen Prozess.
 echo "Starte Grocylink..."
 exec gunicorn \
     --bind 0.0.0.0:5000 \
     --workers "${GUNICORN_WORKERS:-2}" \
+    --worker-class gthread \
+    --threads "${GUNICORN_THREADS:-16}" \
     --timeout 120 \
     --access-logfile - \
     --error-logfile - \